@@ -2,9 +2,16 @@ from google.adk.agents import Agent
 
 from agents.evaluation_agent import evaluate_agent
 from agents.presentation_agent import generate_presentation_from_topic
+from utils.common.metrics import configure_json_logging, metrics
+from utils.config import METRICS_JSON_LOGS, METRICS_PORT
 
-def create_presentation(topic: str) -> dict:
-    return generate_presentation_from_topic(topic)
+if METRICS_JSON_LOGS:
+    configure_json_logging()
+if METRICS_PORT:
+    metrics.serve(METRICS_PORT)
+
+def create_presentation(topic: str, fresh: bool = False) -> dict:
+    return generate_presentation_from_topic(topic, fresh=fresh)
 
 def evaluate_exam(file_path: str) -> dict:
     if file_path is None:
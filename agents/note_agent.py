@@ -1,29 +1,64 @@
-from utils.common.db import NoteDataBaseService
-from utils.common.rag_service import GeminiRAGService
-
-Store=NoteDataBaseService()
-
-def generate_notes_prompt():
-        prompt = f"""
-Create a list of 10 concise bullet points about the topic: in the above text.
-Respond in JSON format as a simple array of strings.
-Example:
-[
-  "Bullet point 1",
-  "Bullet point 2",
-  ...
-  "Bullet point 10"
-]
-Only return the JSON array. No extra explanations or markdown.
+import argparse
+import sys
+from typing import List, Optional
+
+from utils.config import GEMINI_MAX_CONCURRENCY, NOTE_INDEX_WORKERS
+from utils.notes.note_service import NoteExtractionService
+
+"""
+Note Agent
+
+Command-line entry point for bullet-point note extraction. Documents (files or directories of .txt/.md
+files) are processed by `NoteExtractionService`; their points are stored per topic in `bullet_points`
+(data/notes.db) and every finished document is checkpointed, so re-running the same command after an
+interruption only processes the remaining or changed documents.
+
+Functions:
+    - generate_notes_prompt(): Returns the bullet-point prompt sent with each document.
+    - extract_notes(file_path): Generates (without storing) the bullet points for one document.
+    - main(argv): CLI.
+
+Usage:
+    python -m agents.note_agent ./notes/earth.txt
+    python -m agents.note_agent ./corpus --index-workers 8 --max-concurrency 4
 """
-        return prompt
 
-FilePath=input("Enter the file path of the document")
 
-gemini=GeminiRAGService(
-    file_path=FilePath
-)
+def generate_notes_prompt() -> str:
+    return NoteExtractionService.build_notes_prompt()
+
+
+def extract_notes(file_path: str) -> List[str]:
+    return NoteExtractionService.extract_notes(file_path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Extract bullet-point notes from documents into data/notes.db.")
+    parser.add_argument("sources", nargs="+", help="document files or directories")
+    parser.add_argument("--index-workers", type=int, default=NOTE_INDEX_WORKERS,
+                        help="documents loaded and embedded at once")
+    parser.add_argument("--max-concurrency", type=int, default=GEMINI_MAX_CONCURRENCY,
+                        help="Gemini calls in flight")
+    parser.add_argument("--retry-failed", action="store_true", help="retry documents that failed in earlier runs")
+    args = parser.parse_args(argv)
+
+    counts = {"success": 0, "skipped": 0, "error": 0}
+    try:
+        for result in NoteExtractionService.iter_extract_notes(
+                args.sources, args.index_workers, args.max_concurrency, args.retry_failed
+        ):
+            counts[result["status"]] += 1
+            if result["status"] == "success":
+                print(f"✔ {result['file']}: {result['points']} points ({result['topic']})")
+            elif result["status"] == "error":
+                print(f"✘ {result['file']}: {result['error']}")
+    except KeyboardInterrupt:
+        print("Interrupted; finished documents are checkpointed and will be skipped next run.")
+        return 130
+    finally:
+        print(f"Done: {counts['success']} extracted, {counts['skipped']} skipped, {counts['error']} failed.")
+    return 1 if counts["error"] else 0
+
 
-prompt=generate_notes_prompt()
-response=gemini.get_answer(prompt)
-print(response)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
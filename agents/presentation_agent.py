@@ -1,12 +1,20 @@
-import os
+import asyncio
 import json
 import re
+import uuid
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
-from utils.common.cloudinary_service import CloudinaryService
-from utils.common.gemini_service import GeminiService
-from utils.presentation.image_search_service import ImageSearchService
-from utils.presentation.presentation_service import PPTXService
+from utils.common.json_stream import iter_json_array
+from utils.common.metrics import metrics
+from utils.common.service_registry import services
+from utils.config import (
+    DECK_CACHE_ENABLED,
+    PRESENTATION_IMAGE_BATCH,
+    PRESENTATION_STREAMING,
+    PRESENTATION_WORKERS
+)
 
 """
 AI-Powered Presentation Generator with Image Integration
@@ -14,26 +22,47 @@ AI-Powered Presentation Generator with Image Integration
 This module automates the end-to-end creation of visually appealing PowerPoint presentations 
 based on a topic string, using:
 - Google's Gemini API for content generation
-- Wikimedia Commons search (via ImageSearchService) for fetching relevant images
+- Wikimedia Commons search (via ImageSearchService) for fetching relevant images, after a
+  nearest-neighbour lookup of each slide's image prompt in the local image library
 - python-pptx for slide creation
 - Cloudinary for file hosting and auto-deletion
 
 The module includes utilities for:
     - Generating structured JSON slide content using a prompt-based Gemini call
     - Fetching and embedding slide-relevant images using keyword-based search
-    - Converting the JSON response into a PowerPoint file (.pptx)
-    - Uploading the file to Cloudinary and returning a shareable link
+      (all slide images are fetched concurrently on ImageSearchService's worker pool; in streaming
+      mode image fetches start while the deck is generated, in batched groups of
+      PRESENTATION_IMAGE_BATCH slides)
+    - Converting the JSON response into a PowerPoint file (.pptx), built in memory
+    - Uploading the in-memory file to Cloudinary and returning a shareable link
 
-Dependencies:
+Dependencies (built lazily on first use through `utils.common.service_registry.services`):
     - GeminiService (for prompt-based text generation)
     - ImageSearchService (for relevant slide image search)
     - PPTXService (for presentation creation)
     - CloudinaryService (for upload & auto-delete)
 
+With `DECK_CACHE_ENABLED=1`, decks are stored in the `SemanticDeckCache`, and a request whose topic is close
+enough to an earlier one (e.g. "Photosynthesis" / "photosynthesis in plants") is rebuilt from the cached slides
+and cached images, skipping Gemini; pass `fresh=True` to force a new generation.
+
+Every deck is timed as a `presentation` span, and its llm / image / render / upload stages record their own
+spans in `utils.common.metrics`, so a slow deck can be attributed to the stage that caused it.
+
 Functions:
     - build_presentation_prompt(topic): Constructs a formatted prompt for Gemini to generate slides with image prompts.
     - simplify_image_prompt(prompt): Extracts key keywords from verbose image prompts for better search results.
-    - generate_presentation_from_topic(topic): Full pipeline to create, save, upload, and return a presentation.
+    - artifact_id(topic): Unique, URL-safe id for one request's uploaded deck.
+    - generate_presentation_from_topic(topic, stream, fresh): Full pipeline to create, save, upload, and return a presentation.
+    - generate_presentations(topics, max_workers, stream, fresh): Runs several pipelines on a thread pool.
+    - agenerate_presentation_from_topic(topic, stream, fresh) / agenerate_presentations(topics, max_concurrency, stream, fresh):
+      Async variants that keep the blocking pipeline off the event loop.
+
+Concurrency:
+    Every request works on its own slide dicts and in-memory images/deck, and uploads under its own
+    `artifact_id`, so any number of requests (including ones for the same topic) can run at once.
+    The shared clients are thread-safe; images for all in-flight decks share ImageSearchService's pool,
+    so size `IMAGE_FETCH_WORKERS` for `PRESENTATION_WORKERS` concurrent decks.
 """
 
 
@@ -69,57 +98,215 @@ def simplify_image_prompt(prompt: str) -> str:
     return " ".join([word for word, _ in common]) or "technology diagram"
 
 
-gemini = GeminiService()
-cloudinary = CloudinaryService()
-pptx = PPTXService()
-image_search = ImageSearchService()
+SERVICES = ("gemini", "cloudinary", "pptx", "image_search")
+
+
+def __getattr__(name):
+    # Module-level service clients are built on first access through the registry
+    if name in SERVICES:
+        return services.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _image_query(index: int, slide: dict):
+    image_prompt = slide.get("image_prompt")
+    if not image_prompt:
+        return None
+
+    simplified_prompt = simplify_image_prompt(image_prompt)
+    print(f"Slide {index} image prompt: '{image_prompt}' ➜ '{simplified_prompt}'")
+    slide["image_query"] = simplified_prompt
+    return simplified_prompt
+
+
+def _generate_slides(prompt: str) -> list:
+    response_text = services.get("gemini").get_response(prompt)
+    cleaned = re.sub(r"^```json|```$", "", response_text, flags=re.IGNORECASE).strip()
+    slides = json.loads(cleaned)
+
+    for i, slide in enumerate(slides):
+        _image_query(i, slide)
+    return _attach_images(slides)
+
+
+def _attach_images(slides: list) -> list:
+    jobs = [slide for slide in slides if slide.get("image_query")]
+    images = services.get("image_search").fetch_images_bytes(
+        [slide["image_query"] for slide in jobs],
+        prompts=[slide.get("image_prompt") for slide in jobs]
+    )
+    for slide, image_data in zip(jobs, images):
+        slide["image_data"] = image_data
+    return slides
+
+
+def _cached_deck(topic: str):
+    """
+    Returns the deck cache match for `topic` with its images attached, or None.
+    Images are fetched by their stored `image_query` / `image_prompt`, normally straight from
+    the image cache or the local image library.
+    """
+    if not DECK_CACHE_ENABLED:
+        return None
+    try:
+        match = services.get("deck_cache").lookup(topic)
+    except Exception as e:
+        print(f"Deck cache lookup failed: {e}")
+        return None
+    if match is None:
+        return None
+
+    print(f"Reusing cached deck for '{match['topic']}' (similarity {match['similarity']})")
+    _attach_images(match["slides"])
+    return match
+
+
+def _remember_deck(topic: str, slides: list) -> None:
+    if not DECK_CACHE_ENABLED:
+        return
+    try:
+        services.get("deck_cache").store(topic, slides)
+    except Exception as e:
+        print(f"Could not cache deck for '{topic}': {e}")
+
+
+def _generate_slides_streaming(prompt: str, batch_size: int = PRESENTATION_IMAGE_BATCH) -> list:
+    """
+    Parses slides out of the streamed Gemini response and submits image fetches while
+    the rest of the deck is still being generated, overlapping image I/O with generation.
+    Completed slides are grouped `batch_size` at a time into one `fetch_images_bytes` call,
+    so streamed decks keep the batched title lookup and library embedding; a query already
+    submitted for an earlier slide of the deck is not fetched again.
+    """
+    slides = []
+    pending = []  # (slide index, slide) for every slide with an image query
+    submitted = {}  # query -> (future, position)
+    group = []  # slides whose query has not been submitted yet (duplicates are merged on submit)
+    image_search = services.get("image_search")
+
+    def submit_group():
+        queries = list(dict.fromkeys(slide["image_query"] for _, slide in group))
+        prompt_for = {}
+        for _, slide in group:
+            prompt_for.setdefault(slide["image_query"], slide.get("image_prompt"))
+        future = image_search.submit_images_bytes(queries, [prompt_for[query] for query in queries])
+        for position, query in enumerate(queries):
+            submitted[query] = (future, position)
+        group.clear()
+
+    for i, slide in enumerate(iter_json_array(services.get("gemini").stream_response(prompt))):
+        slides.append(slide)
+        query = _image_query(i, slide)
+        if not query:
+            continue
+        pending.append((i, slide))
+        if query not in submitted:
+            group.append((i, slide))
+            if len(group) >= max(1, batch_size):
+                submit_group()
+    if group:
+        submit_group()
+
+    for i, slide in pending:
+        future, position = submitted[slide["image_query"]]
+        try:
+            slide["image_data"] = future.result()[position]
+        except Exception as e:
+            print(f"Image fetch failed for slide {i}: {e}")
+            slide["image_data"] = None
+    return slides
+
+
+def artifact_id(topic: str) -> str:
+    slug = re.sub(r"\W+", "_", topic).strip("_")[:60] or "presentation"
+    return f"{slug}_{uuid.uuid4().hex[:12]}"
 
 
-def generate_presentation_from_topic(topic: str) -> dict:
+@metrics.timed_stage("presentation")
+def generate_presentation_from_topic(
+        topic: str,
+        stream: bool = PRESENTATION_STREAMING,
+        fresh: bool = False
+) -> dict:
+    """
+    `fresh=True` skips the semantic deck cache and always generates new slides.
+    """
     if not topic:
         return {"status": "error", "error": "Topic is required"}
 
     try:
-        image_dir = "/home/pranav/PycharmProjects/BrainBox/img"
-        os.makedirs(image_dir, exist_ok=True)
-
-        prompt = build_presentation_prompt(topic)
-        response_text = gemini.get_response(prompt)
-        cleaned = re.sub(r"^```json|```$", "", response_text, flags=re.IGNORECASE).strip()
-        slides = json.loads(cleaned)
-
-        for i, slide in enumerate(slides):
-            image_prompt = slide.get("image_prompt")
-            if image_prompt:
-                simplified_prompt = simplify_image_prompt(image_prompt)
-                print(f"Slide {i} image prompt: '{image_prompt}' ➜ '{simplified_prompt}'")
-
-                image_path = os.path.join(image_dir, f"slide_image_{i}.jpg")
-                try:
-                    image_search.fetch_image(simplified_prompt, image_path)
-                    slide["image_path"] = image_path
-                except Exception as e:
-                    print(f"Image fetch failed for slide {i}: {e}")
-                    slide["image_path"] = None
-
-        file_name = f"{topic.replace(' ', '_')}.pptx"
-        local_path = os.path.join("/tmp", file_name)
-        pptx.create_presentation(topic, slides, local_path)
-
-        url, public_id = cloudinary.upload_file(local_path, public_id=topic.replace(" ", "_"))
+        match = None if fresh else _cached_deck(topic)
+        if match is not None:
+            slides = match["slides"]
+        else:
+            prompt = build_presentation_prompt(topic)
+            if stream:
+                slides = _generate_slides_streaming(prompt)
+            else:
+                slides = _generate_slides(prompt)
 
+        # Images and the deck stay in memory end to end
+        deck = services.get("pptx").create_presentation_bytes(topic, slides)
         for slide in slides:
-            image_path = slide.get("image_path")
-            if image_path and os.path.exists(image_path):
-                os.remove(image_path)
-        os.rmdir(image_dir)
+            slide.pop("image_data", None)
+        if match is None:
+            _remember_deck(topic, slides)
 
-        return {
+        request_id = artifact_id(topic)
+        uploaded = services.get("cloudinary").upload_file(deck, public_id=request_id)
+        if not uploaded:
+            raise RuntimeError("Upload of the presentation failed")
+        url, public_id = uploaded
+
+        metrics.inc("presentations_total", status="success")
+        result = {
             "status": "success",
             "topic": topic,
+            "request_id": request_id,
             "slides": slides,
             "presentation_url": url
         }
+        if match is not None:
+            result["cached_from"] = {"topic": match["topic"], "similarity": match["similarity"]}
+        return result
 
     except Exception as e:
+        metrics.inc("presentations_total", status="error")
         return {"status": "error", "error": str(e)}
+
+
+def generate_presentations(
+        topics: List[str],
+        max_workers: int = PRESENTATION_WORKERS,
+        stream: bool = PRESENTATION_STREAMING,
+        fresh: bool = False
+) -> List[dict]:
+    """
+    Generates one presentation per topic with up to `max_workers` pipelines
+    in flight. Results are returned in input order.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="presentation") as pool:
+        return list(pool.map(lambda topic: generate_presentation_from_topic(topic, stream, fresh), topics))
+
+
+async def agenerate_presentation_from_topic(
+        topic: str,
+        stream: bool = PRESENTATION_STREAMING,
+        fresh: bool = False
+) -> dict:
+    return await asyncio.to_thread(generate_presentation_from_topic, topic, stream, fresh)
+
+
+async def agenerate_presentations(
+        topics: List[str],
+        max_concurrency: int = PRESENTATION_WORKERS,
+        stream: bool = PRESENTATION_STREAMING,
+        fresh: bool = False
+) -> List[dict]:
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(topic: str) -> dict:
+        async with semaphore:
+            return await agenerate_presentation_from_topic(topic, stream, fresh)
+
+    return await asyncio.gather(*(run(topic) for topic in topics))
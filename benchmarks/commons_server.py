@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, quote, urlparse
+
+"""
+Local Wikimedia Commons Stand-in
+
+A threaded HTTP server answering the two kinds of requests `ImageSearchService` makes:
+    - MediaWiki API queries (`/w/api.php`): search generator + imageinfo, and imageinfo for known titles
+    - Image downloads (`/images/<title>`): a JPEG of configurable size, or a thumbnail of it downscaled to
+      `?width=` (the `thumburl` returned when `iiurlwidth` is requested), as Commons serves them
+
+Classes:
+    - FakeCommonsServer: Context manager running the server on a free local port.
+
+Usage:
+    with FakeCommonsServer(latency=0.1, image_size=(2400, 1600)) as commons:
+        ImageSearchService(search_url=commons.api_url, cache=None)
+
+Notes:
+    - `latency` is added to every request, so per-host concurrency limits behave as against the real API.
+    - The JPEG is rendered once with Pillow and served for every title; each thumbnail width is rendered once.
+    - `image_bytes_served` counts image payload bytes, so full-size and size-targeted fetches can be compared.
+"""
+
+
+def _render_jpeg(width: int, height: int) -> bytes:
+    from PIL import Image
+
+    # A gradient compresses like a photo rather than a flat colour
+    gradient = Image.linear_gradient("L").resize((width, height))
+    image = Image.merge("RGB", (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), gradient))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _render_thumbnail(image_bytes: bytes, width: int) -> bytes:
+    from PIL import Image
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        if width >= image.width:
+            return image_bytes  # Commons never upscales a thumbnail
+        height = max(1, round(image.height * width / image.width))
+        thumbnail = image.resize((width, height), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    thumbnail.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _imageinfo(self, title: str, params: dict) -> list:
+        url = f"{self.server.base_url}/images/{quote(title)}"
+        info = {"url": url}
+        if "iiurlwidth" in params:
+            info["thumburl"] = f"{url}?width={params['iiurlwidth'][0]}"
+        return [info]
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        self.server.count(parsed.path)
+
+        if parsed.path.startswith("/images/"):
+            width = params.get("width", [""])[0]
+            body = self.server.thumbnail(int(width)) if width.isdigit() else self.server.image_bytes
+            self.server.count_bytes(len(body))
+            self._send(200, "image/jpeg", body)
+            return
+
+        if parsed.path != "/w/api.php":
+            self._send(404, "text/plain", b"not found")
+            return
+
+        pages = {}
+        if params.get("generator") == ["search"]:
+            words = params.get("gsrsearch", [""])[0].replace("filetype:bitmap", "").split()
+            title = f"File:{'_'.join(words) or 'Blank'}.jpg"
+            pages["1"] = {"index": 1, "title": title, "imageinfo": self._imageinfo(title, params)}
+        elif "titles" in params:
+            for i, title in enumerate(params["titles"][0].split("|")):
+                pages[str(i + 1)] = {"title": title, "imageinfo": self._imageinfo(title, params)}
+
+        body = json.dumps({"query": {"pages": pages}} if pages else {}).encode("utf-8")
+        self._send(200, "application/json", body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float, image_bytes: bytes):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.image_bytes = image_bytes
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.requests = {"api": 0, "images": 0}
+        self.image_bytes_served = 0
+        self._thumbnails = {}  # width -> JPEG bytes
+        self._lock = threading.Lock()
+
+    def count(self, path: str) -> None:
+        with self._lock:
+            self.requests["images" if path.startswith("/images/") else "api"] += 1
+
+    def count_bytes(self, size: int) -> None:
+        with self._lock:
+            self.image_bytes_served += size
+
+    def thumbnail(self, width: int) -> bytes:
+        with self._lock:
+            cached = self._thumbnails.get(width)
+        if cached is None:
+            cached = _render_thumbnail(self.image_bytes, max(1, width))
+            with self._lock:
+                self._thumbnails[width] = cached
+        return cached
+
+
+class FakeCommonsServer:
+    def __init__(self, latency: float = 0.1, image_size: tuple = (2400, 1600)):
+        self.latency = latency
+        self.image_size = image_size
+        self._server = None
+        self._thread = None
+
+    @property
+    def api_url(self) -> str:
+        return f"{self._server.base_url}/w/api.php"
+
+    @property
+    def requests(self) -> dict:
+        return dict(self._server.requests)
+
+    @property
+    def image_bytes_served(self) -> int:
+        return self._server.image_bytes_served
+
+    def start(self) -> "FakeCommonsServer":
+        self._server = _Server(self.latency, _render_jpeg(*self.image_size))
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-commons", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeCommonsServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+__all__ = ["FakeCommonsServer"]
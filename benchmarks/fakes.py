@@ -0,0 +1,138 @@
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
+
+"""
+Benchmark Stand-ins
+
+Local replacements for the external services used by the presentation and evaluation pipelines,
+so benchmarks measure this code base rather than the network.
+
+Classes:
+    - FakeGeminiClient: Mimics the `genai.Client` surface used by `GeminiService` (`models.generate_content`,
+      `models.generate_content_stream`, `aio.models.generate_content`) with configurable latency and
+      canned JSON answers.
+    - FakeUploader: Mimics `CloudinaryService.upload_file` / `aupload_file` with configurable latency.
+
+Functions:
+    - canned_response(prompt, slide_count): Returns a well-formed JSON answer for a presentation or
+      evaluation prompt.
+
+Usage:
+    client = FakeGeminiClient(latency=0.8, slide_count=12)
+    services.override("gemini", GeminiService(client=client, limiter=TokenBucket(1_000_000)))
+    services.override("cloudinary", FakeUploader(latency=0.3))
+"""
+
+IMAGE_SUBJECTS = [
+    "volcano", "glacier", "satellite", "circuit", "forest", "telescope", "bridge", "river",
+    "microscope", "desert", "reactor", "harbor", "canyon", "turbine", "library", "coral"
+]
+
+
+def canned_response(prompt: str, slide_count: int = 10) -> str:
+    rng = random.Random(prompt)
+    if "presentation" in prompt:
+        slides = [
+            {
+                "title": f"Slide {i + 1}",
+                "bullet_points": [f"Point {j + 1} of slide {i + 1}" for j in range(rng.randint(3, 6))],
+                "image_prompt": f"A photo of a {rng.choice(IMAGE_SUBJECTS)} and a {rng.choice(IMAGE_SUBJECTS)}"
+            }
+            for i in range(slide_count)
+        ]
+        return json.dumps(slides, indent=2)
+
+    return json.dumps({
+        "evaluation": "Answers are mostly correct; explanations could be more detailed.",
+        "score": rng.randint(40, 95)
+    })
+
+
+def _response(text: str, prompt: str) -> SimpleNamespace:
+    # Roughly 4 characters per token, like the real tokenizer on English text
+    prompt_tokens = max(1, len(prompt) // 4)
+    output_tokens = max(1, len(text) // 4)
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+    )
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._client = client
+
+    def generate_content(self, model: str, contents: str, config=None):
+        self._client.calls += 1
+        time.sleep(self._client.latency)
+        return _response(canned_response(contents, self._client.slide_count), contents)
+
+    def generate_content_stream(self, model: str, contents: str, config=None) -> Iterator[SimpleNamespace]:
+        self._client.calls += 1
+        text = canned_response(contents, self._client.slide_count)
+        size = self._client.stream_chunk_chars
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        # Spread the same total latency over the chunks, with time-to-first-chunk up front
+        time.sleep(self._client.latency * 0.2)
+        per_chunk = self._client.latency * 0.8 / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            time.sleep(per_chunk)
+            response = _response(chunk, contents if i == 0 else "")
+            yield response
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: "FakeGeminiClient"):
+        self._client = client
+
+    async def generate_content(self, model: str, contents: str, config=None):
+        self._client.calls += 1
+        await asyncio.sleep(self._client.latency)
+        return _response(canned_response(contents, self._client.slide_count), contents)
+
+
+class FakeGeminiClient:
+    def __init__(self, latency: float = 0.5, slide_count: int = 10, stream_chunk_chars: int = 200):
+        self.latency = latency
+        self.slide_count = slide_count
+        self.stream_chunk_chars = stream_chunk_chars
+        self.calls = 0
+
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+
+class FakeUploader:
+    def __init__(self, latency: float = 0.2, base_url: str = "https://uploads.invalid/presentations"):
+        self.latency = latency
+        self.base_url = base_url
+        self.uploads = 0
+        self.uploaded_bytes = 0
+
+    def upload_file(self, file: Union[str, BinaryIO], public_id: Optional[str] = None) -> Tuple[str, str]:
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                size = len(f.read())
+        else:
+            file.seek(0)
+            size = len(file.read())
+
+        time.sleep(self.latency)
+        self.uploads += 1
+        self.uploaded_bytes += size
+        public_id = public_id or f"temp_{self.uploads}"
+        return f"{self.base_url}/{public_id}.pptx", f"presentations/{public_id}"
+
+    async def aupload_file(self, file: Union[str, BinaryIO], public_id: Optional[str] = None) -> Tuple[str, str]:
+        return await asyncio.to_thread(self.upload_file, file, public_id)
+
+
+__all__ = ["FakeGeminiClient", "FakeUploader", "canned_response"]
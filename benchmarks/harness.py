@@ -0,0 +1,125 @@
+import functools
+import inspect
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+"""
+Benchmark Harness
+
+Helpers for timing pipeline stages and measuring memory while a scenario runs.
+
+Classes:
+    - StageRecorder: Thread-safe collection of per-stage durations with summary statistics.
+
+Functions:
+    - timed(recorder, stage, fn): Wraps a sync, async or generator function so each call is recorded under `stage`.
+    - instrument(obj, stages): Replaces methods on one service instance with timed wrappers.
+    - patched(owner, name, value): Temporarily replaces an attribute (e.g. a staticmethod on a class).
+    - track_memory(): Context manager yielding a dict filled with the tracemalloc peak (MB) on exit.
+
+Notes:
+    - Stage durations are wall-clock per call; stages that run concurrently (image fetches in streaming
+      mode, section evaluations) can add up to more than the scenario's wall time.
+    - tracemalloc slows allocation-heavy code, so timings and memory are measured in separate passes by `run.py`.
+"""
+
+
+class StageRecorder:
+    def __init__(self):
+        self._durations: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._durations.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self._durations.items()}
+
+        summary = {}
+        for stage, values in durations.items():
+            ordered = sorted(values)
+            summary[stage] = {
+                "calls": len(values),
+                "total_s": round(sum(values), 4),
+                "mean_ms": round(statistics.fmean(values) * 1000, 2),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2)
+            }
+        return summary
+
+
+def timed(recorder: StageRecorder, stage: str, fn: Callable) -> Callable:
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                recorder.record(stage, time.perf_counter() - start)
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from fn(*args, **kwargs)
+            finally:
+                recorder.record(stage, time.perf_counter() - start)
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            recorder.record(stage, time.perf_counter() - start)
+    return wrapper
+
+
+def instrument(obj, recorder: StageRecorder, stages: Dict[str, str]):
+    """
+    Shadows each bound method named in `stages` ({method: stage}) with a timed
+    wrapper on this instance only. Returns `obj` for chaining.
+    """
+    for method, stage in stages.items():
+        setattr(obj, method, timed(recorder, stage, getattr(obj, method)))
+    return obj
+
+
+@contextmanager
+def patched(owner, name: str, value):
+    original = owner.__dict__[name]
+    setattr(owner, name, value)
+    try:
+        yield
+    finally:
+        setattr(owner, name, original)
+
+
+@contextmanager
+def track_memory():
+    result = {}
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield result
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        result["peak_memory_mb"] = round(peak / (1024 * 1024), 2)
+        if not already_tracing:
+            tracemalloc.stop()
+
+
+__all__ = ["StageRecorder", "instrument", "patched", "timed", "track_memory"]
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+"""
+Pipeline Benchmarks
+
+Runs the presentation and exam evaluation pipelines end to end against local stand-ins (fake Gemini client,
+local Commons server, fake uploader) and reports per-stage timings, throughput and peak memory.
+
+Scenarios:
+    - presentation: `generate_presentation_from_topic` for each deck size, in batch and streaming mode.
+      Stages: llm, image_search, render, upload, end_to_end.
+    - throughput: `generate_presentations` at 1, 2, 4 ... PRESENTATION_WORKERS workers (same topic for every
+      deck), reporting decks/s and scaling efficiency against the single-worker run.
+    - exams: `evaluate_exam_from_file` over a batch of exam scripts one by one, then the same batch through
+      `evaluate_exams`. Stages: extract, llm, db_write, end_to_end.
+
+Functions:
+    - run_presentation(deck_size, stream, args, commons): Benchmarks one deck size / mode.
+    - run_throughput(args, commons): Benchmarks concurrent deck generation at each worker count.
+    - run_exams(args, workdir): Benchmarks sequential and batch exam evaluation.
+    - compare(current, baseline): Prints the change of every scenario against an earlier results file.
+    - main(argv): Command line entry point.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenario presentation --deck-sizes 8 20 --llm-latency 1.5
+    python -m benchmarks.run --compare benchmarks/results/20250101-120000.json
+
+Notes:
+    - Results are written to `benchmarks/results/<UTC timestamp>.json` (or `--output`), including the
+      `utils.common.metrics` counters (Gemini tokens, retries, cache hits) of each scenario.
+    - Timings and memory come from separate passes, because tracemalloc slows allocation-heavy code.
+    - The on-disk image cache and the Gemini response cache are disabled unless `--image-cache` is given,
+      so every run measures cold fetches. The local image library and the semantic deck cache are always
+      disabled, so every slide image comes from the Commons stand-in.
+    - The presentation scenario reports `commons_image_bytes`, the image payload served by the stand-in;
+      it serves downscaled thumbnails for size-targeted requests, as Commons does.
+"""
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+UNLIMITED_RPM = 1_000_000
+
+
+def _configure_environment(args) -> None:
+    # Must run before any project module reads utils.config
+    os.environ["IMAGE_CACHE_ENABLED"] = "1" if args.image_cache else "0"
+    os.environ["GEMINI_CACHE_ENABLED"] = "0"
+    # A local image library or deck cache would answer requests without touching the stand-in services
+    os.environ["IMAGE_LIBRARY_ENABLED"] = "0"
+    os.environ["DECK_CACHE_ENABLED"] = "0"
+
+
+def _exam_script(questions: int, answer_chars: int) -> str:
+    answer = ("The answer explains the underlying mechanism with an example and a short derivation. " *
+              (answer_chars // 86 + 1))[:answer_chars]
+    return "\n\n".join(f"Q{i + 1}. Explain concept {i + 1}.\n{answer}" for i in range(questions))
+
+
+def _write_exams(directory: str, count: int, long_every: int) -> List[str]:
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        long_script = long_every and (i + 1) % long_every == 0
+        # Long scripts exceed EXAM_PER_QUESTION_THRESHOLD and take the per-question path
+        text = _exam_script(20, 1000) if long_script else _exam_script(5, 350)
+        path = os.path.join(directory, f"exam_{i:04d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+
+def _gemini(recorder, args, slide_count: int):
+    from benchmarks.fakes import FakeGeminiClient
+    from benchmarks.harness import instrument
+    from utils.common.gemini_service import GeminiService
+    from utils.common.rate_limiter import TokenBucket
+
+    client = FakeGeminiClient(latency=args.llm_latency, slide_count=slide_count)
+    gemini = GeminiService(client=client, limiter=TokenBucket(UNLIMITED_RPM))
+    return instrument(gemini, recorder, {
+        "get_response": "llm",
+        "stream_response": "llm",
+        "batch_get_responses": "llm"
+    })
+
+
+def _install_presentation_services(recorder, args, commons, deck_size: int):
+    from benchmarks.fakes import FakeUploader
+    from benchmarks.harness import instrument
+    from utils.common.service_registry import services
+    from utils.presentation.image_search_service import ImageSearchService
+    from utils.presentation.presentation_service import PPTXService
+
+    # Production pool sizes: the image pool is shared by every in-flight deck
+    image_search = ImageSearchService(search_url=commons.api_url)
+    services.override("gemini", _gemini(recorder, args, deck_size))
+    services.override("image_search", instrument(image_search, recorder, {
+        "fetch_images_bytes": "image_search",
+        "fetch_image_bytes": "image_search"
+    }))
+    services.override("pptx", instrument(PPTXService(), recorder, {"create_presentation_bytes": "render"}))
+    services.override("cloudinary", instrument(FakeUploader(latency=args.upload_latency), recorder, {
+        "upload_file": "upload"
+    }))
+    return image_search
+
+
+def run_presentation(deck_size: int, stream: bool, args, commons) -> dict:
+    from agents.presentation_agent import generate_presentation_from_topic
+    from benchmarks.harness import StageRecorder, timed, track_memory
+    from utils.common.metrics import metrics
+
+    metrics.reset()
+    recorder = StageRecorder()
+    image_search = _install_presentation_services(recorder, args, commons, deck_size)
+    generate = timed(recorder, "end_to_end", generate_presentation_from_topic)
+
+    requests_before = commons.requests
+    bytes_before = commons.image_bytes_served
+    errors = 0
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        result = generate(f"Benchmark topic {deck_size} {i}", stream=stream)
+        errors += result["status"] != "success"
+    wall = time.perf_counter() - started
+    requests_after = commons.requests
+    bytes_after = commons.image_bytes_served
+
+    with track_memory() as memory:
+        generate_presentation_from_topic(f"Benchmark topic {deck_size} memory", stream=stream)
+    image_search.shutdown(wait=True)
+
+    return {
+        "name": f"presentation[{'stream' if stream else 'batch'},{deck_size} slides]",
+        "iterations": args.iterations,
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(args.iterations / wall, 3) if wall > 0 else 0.0,
+        "errors": errors,
+        "commons_requests": {k: requests_after[k] - requests_before[k] for k in requests_after},
+        "commons_image_bytes": bytes_after - bytes_before,
+        "stages": recorder.summary(),
+        "counters": metrics.snapshot()["counters"],
+        **memory
+    }
+
+
+def run_throughput(args, commons) -> List[dict]:
+    """
+    Runs `generate_presentations` at each worker count with the same number of decks per worker
+    (all for the same topic, which exercises artifact isolation). Scaling efficiency is the throughput
+    relative to `workers` times the single-worker throughput; 1.0 is perfectly linear.
+    """
+    from agents.presentation_agent import generate_presentations
+    from benchmarks.harness import StageRecorder, track_memory
+    from utils.common.metrics import metrics
+
+    results = []
+    baseline = None
+    for workers in args.concurrency:
+        metrics.reset()
+        recorder = StageRecorder()
+        image_search = _install_presentation_services(recorder, args, commons, args.deck_sizes[0])
+        topics = ["Benchmark throughput topic"] * (workers * args.iterations)
+
+        started = time.perf_counter()
+        outcomes = generate_presentations(topics, max_workers=workers, stream=True)
+        wall = time.perf_counter() - started
+
+        with track_memory() as memory:
+            generate_presentations(topics[:workers], max_workers=workers, stream=True)
+        image_search.shutdown(wait=True)
+
+        throughput = len(topics) / wall if wall > 0 else 0.0
+        baseline = baseline or throughput / workers
+        request_ids = {outcome.get("request_id") for outcome in outcomes if outcome["status"] == "success"}
+        results.append({
+            "name": f"throughput[{workers} workers,{args.deck_sizes[0]} slides]",
+            "iterations": len(topics),
+            "wall_s": round(wall, 3),
+            "throughput_per_s": round(throughput, 3),
+            "scaling_efficiency": round(throughput / (workers * baseline), 3) if baseline else 0.0,
+            "distinct_artifacts": len(request_ids),
+            "errors": sum(outcome["status"] != "success" for outcome in outcomes),
+            "stages": recorder.summary(),
+            "counters": metrics.snapshot()["counters"],
+            **memory
+        })
+    return results
+
+
+def run_exams(args, workdir: str) -> List[dict]:
+    from benchmarks.harness import StageRecorder, instrument, patched, timed, track_memory
+    from utils.common.db import ExamDataBaseService
+    from utils.common.metrics import metrics
+    from utils.common.service_registry import services
+    from utils.evaluation.evaluation_service import ExamEvaluationService
+
+    results = []
+    for mode in ("sequential", "batch"):
+        metrics.reset()
+        recorder = StageRecorder()
+        services.override("gemini", _gemini(recorder, args, slide_count=0))
+        database = ExamDataBaseService(os.path.join(workdir, f"exams_{mode}.db"))
+        services.override("exam_database", instrument(database, recorder, {
+            "store_exam_values": "db_write",
+            "store_exam_values_bulk": "db_write"
+        }))
+        # Fresh files per mode, so neither run is served from the extraction cache
+        paths = _write_exams(os.path.join(workdir, mode), args.exam_count, args.long_exam_every)
+
+        started = time.perf_counter()
+        if mode == "sequential":
+            extract = staticmethod(timed(recorder, "extract", ExamEvaluationService.extract_text))
+            evaluate = timed(recorder, "end_to_end", ExamEvaluationService.evaluate_exam_from_file)
+            with patched(ExamEvaluationService, "extract_text", extract):
+                outcomes = [evaluate(path) for path in paths]
+            errors = sum(outcome["status"] != "success" for outcome in outcomes)
+        else:
+            # Extraction runs in worker processes here, so only the LLM and DB stages are visible
+            summary = timed(recorder, "end_to_end", ExamEvaluationService.evaluate_exams)(paths)
+            errors = summary["failed"]
+        wall = time.perf_counter() - started
+
+        memory_paths = _write_exams(os.path.join(workdir, f"{mode}_memory"), args.exam_count, args.long_exam_every)
+        with track_memory() as memory:
+            if mode == "sequential":
+                for path in memory_paths:
+                    ExamEvaluationService.evaluate_exam_from_file(path)
+            else:
+                ExamEvaluationService.evaluate_exams(memory_paths)
+        database.close()
+
+        results.append({
+            "name": f"exams[{mode},{args.exam_count} scripts]",
+            "iterations": args.exam_count,
+            "wall_s": round(wall, 3),
+            "throughput_per_s": round(args.exam_count / wall, 3) if wall > 0 else 0.0,
+            "errors": errors,
+            "stages": recorder.summary(),
+            "counters": metrics.snapshot()["counters"],
+            **memory
+        })
+    return results
+
+
+def _percent(new: float, old: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(current: dict, baseline: dict) -> None:
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    print(f"\nCompared with run of {baseline.get('timestamp', '?')}:")
+    for scenario in current["scenarios"]:
+        old = previous.get(scenario["name"])
+        if old is None:
+            print(f"  {scenario['name']}: no baseline")
+            continue
+        print(
+            f"  {scenario['name']}: wall {_percent(scenario['wall_s'], old['wall_s'])}, "
+            f"throughput {_percent(scenario['throughput_per_s'], old['throughput_per_s'])}, "
+            f"peak memory {_percent(scenario['peak_memory_mb'], old['peak_memory_mb'])}"
+        )
+        for stage, stats in scenario["stages"].items():
+            old_stats = old["stages"].get(stage)
+            if old_stats:
+                print(f"      {stage:<13} mean {stats['mean_ms']:>9.1f} ms ({_percent(stats['mean_ms'], old_stats['mean_ms'])})")
+
+
+def _print_scenario(scenario: dict) -> None:
+    print(
+        f"{scenario['name']}: {scenario['wall_s']:.2f}s, {scenario['throughput_per_s']:.2f}/s, "
+        f"peak {scenario['peak_memory_mb']:.1f} MB, {scenario['errors']} error(s)"
+        + (f", scaling efficiency {scenario['scaling_efficiency']:.2f}" if "scaling_efficiency" in scenario else "")
+    )
+    for stage, stats in scenario["stages"].items():
+        print(
+            f"    {stage:<13} calls {stats['calls']:>4}  mean {stats['mean_ms']:>9.1f} ms  "
+            f"p95 {stats['p95_ms']:>9.1f} ms  total {stats['total_s']:>8.2f} s"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the presentation and exam pipelines offline.")
+    parser.add_argument(
+        "--scenario", nargs="+", choices=["presentation", "throughput", "exams"],
+        default=["presentation", "throughput", "exams"]
+    )
+    parser.add_argument("--deck-sizes", nargs="+", type=int, default=[8, 20])
+    parser.add_argument("--iterations", type=int, default=3, help="decks per deck size and mode")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=None,
+                        help="worker counts for the throughput scenario (default: 1, 2, ... PRESENTATION_WORKERS)")
+    parser.add_argument("--exam-count", type=int, default=20)
+    parser.add_argument("--long-exam-every", type=int, default=5, help="every Nth script is long (0 = none)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake Gemini call")
+    parser.add_argument("--commons-latency", type=float, default=0.05, help="seconds per fake Commons request")
+    parser.add_argument("--upload-latency", type=float, default=0.2, help="seconds per fake upload")
+    parser.add_argument("--image-size", nargs=2, type=int, default=[2400, 1600], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--image-cache", action="store_true", help="keep the on-disk image cache enabled")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    _configure_environment(args)
+    from benchmarks.commons_server import FakeCommonsServer
+    from utils.config import PRESENTATION_WORKERS
+
+    if args.concurrency is None:
+        args.concurrency = sorted({1, *(2 ** i for i in range(PRESENTATION_WORKERS.bit_length())), PRESENTATION_WORKERS})
+        args.concurrency = [workers for workers in args.concurrency if workers <= PRESENTATION_WORKERS]
+
+    scenarios = []
+    workdir = tempfile.mkdtemp(prefix="brainbox-bench-")
+    try:
+        if "presentation" in args.scenario or "throughput" in args.scenario:
+            with FakeCommonsServer(latency=args.commons_latency, image_size=tuple(args.image_size)) as commons:
+                if "presentation" in args.scenario:
+                    for deck_size in args.deck_sizes:
+                        for stream in (False, True):
+                            scenarios.append(run_presentation(deck_size, stream, args, commons))
+                            _print_scenario(scenarios[-1])
+                if "throughput" in args.scenario:
+                    for scenario in run_throughput(args, commons):
+                        scenarios.append(scenario)
+                        _print_scenario(scenario)
+        if "exams" in args.scenario:
+            for scenario in run_exams(args, workdir):
+                scenarios.append(scenario)
+                _print_scenario(scenario)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    timestamp = datetime.now(timezone.utc)
+    results = {
+        "timestamp": timestamp.isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "scenarios": scenarios
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{timestamp.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import gc
+import weakref
+
+import pytest
+
+pytest.importorskip("cloudinary")
+
+from utils.common import cloudinary_service as cloudinary_module
+from utils.common.cloudinary_service import CloudinaryConfig, CloudinaryService
+from utils.common.db import AssetExpiryDataBaseService
+
+
+def make_service(tmp_path, start_sweeper=True, **config):
+    config = CloudinaryConfig(cloud_name="demo", api_key="key", api_secret="secret", **config)
+    return CloudinaryService(
+        config,
+        expiry_queue=AssetExpiryDataBaseService(str(tmp_path / "assets.db")),
+        start_sweeper=start_sweeper
+    )
+
+
+def sweepers():
+    return [thread for thread in cloudinary_module.threading.enumerate() if thread.name == "cloudinary-expiry-sweeper"]
+
+
+def test_services_share_one_sweeper(tmp_path):
+    services = [make_service(tmp_path, sweep_interval=3600) for _ in range(3)]
+    try:
+        assert len(sweepers()) == 1
+    finally:
+        services[0].stop_sweeper()
+
+
+def test_rejected_deletions_are_dropped_after_max_attempts(tmp_path, monkeypatch):
+    calls = []
+
+    def delete_resources(public_ids, resource_type):
+        calls.append(list(public_ids))
+        return {"deleted": {public_id: "deleted" if public_id == "ok" else "not_allowed" for public_id in public_ids}}
+
+    monkeypatch.setattr(cloudinary_module.cloudinary.api, "delete_resources", delete_resources)
+    service = make_service(tmp_path, max_delete_attempts=2)
+    service.stop_sweeper()
+    service.expiry_queue.schedule_expiry("ok", 0)
+    service.expiry_queue.schedule_expiry("stuck", 0)
+
+    assert service.sweep_expired(now=1) == 1
+    assert service.expiry_queue.pending_count() == 1
+    service.sweep_expired(now=1)
+    assert service.expiry_queue.pending_count() == 0
+    assert calls == [["ok", "stuck"], ["stuck"]]
+
+
+def test_uploads_do_not_start_a_disabled_sweeper(tmp_path):
+    service = make_service(tmp_path, start_sweeper=False)
+    service._schedule_deletion("deck")
+
+    assert sweepers() == []
+    assert service.expiry_queue.pending_count() == 1
+
+
+def test_sweeper_does_not_keep_its_service_alive(tmp_path):
+    starter = weakref.ref(make_service(tmp_path, sweep_interval=3600))
+    gc.collect()
+
+    try:
+        assert starter() is None
+        assert len(sweepers()) == 1
+    finally:
+        make_service(tmp_path, start_sweeper=False).stop_sweeper()  # sweepers are keyed by database path
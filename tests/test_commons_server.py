@@ -0,0 +1,24 @@
+from io import BytesIO
+from urllib.request import urlopen
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from benchmarks.commons_server import FakeCommonsServer
+
+
+def test_thumbnail_urls_serve_downscaled_images():
+    with FakeCommonsServer(latency=0, image_size=(1200, 800)) as commons:
+        base = commons.api_url.replace("/w/api.php", "/images/File%3AVolcano.jpg")
+        with urlopen(base) as response:
+            full = response.read()
+        with urlopen(f"{base}?width=300") as response:
+            thumbnail = response.read()
+
+        assert Image.open(BytesIO(full)).size == (1200, 800)
+        assert Image.open(BytesIO(thumbnail)).size == (300, 200)
+        assert commons.image_bytes_served == len(full) + len(thumbnail)
+        assert len(thumbnail) < len(full)
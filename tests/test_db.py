@@ -0,0 +1,53 @@
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.common.db import AssetExpiryDataBaseService, ExamDataBaseService
+
+
+def test_connections_are_closed_when_their_threads_exit(tmp_path):
+    database = ExamDataBaseService(str(tmp_path / "question.db"))
+    database.store_exam_values("main.txt", {"evaluation": "ok", "score": 1})
+
+    for _ in range(3):  # executors recreated per call, as in the batch pipelines
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda i: database.store_exam_values(f"exam{i}.txt", {"score": i}), range(8)))
+    gc.collect()
+
+    assert len(database._connections) == 1  # only the main thread's connection is still open
+    assert len(database.get_exam_results("exam3.txt")) == 3
+    database.close()
+
+
+def test_each_thread_gets_its_own_connection(tmp_path):
+    database = ExamDataBaseService(str(tmp_path / "question.db"))
+    seen = []
+    barrier = threading.Barrier(3)
+
+    def connect():
+        seen.append(database.connection)
+        barrier.wait()  # keep all three threads alive at once
+
+    threads = [threading.Thread(target=connect) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(conn) for conn in seen}) == 3
+    database.close()
+
+
+def test_rejected_assets_are_dropped_after_max_attempts(tmp_path):
+    queue = AssetExpiryDataBaseService(str(tmp_path / "assets.db"))
+    queue.schedule_expiry("stuck", 0)
+    queue.schedule_expiry("flaky", 0)
+
+    assert queue.record_failures(["stuck", "flaky"], max_attempts=3) == []
+    assert queue.record_failures(["stuck"], max_attempts=3) == []
+    assert queue.record_failures(["stuck", "flaky"], max_attempts=3) == ["stuck"]
+
+    assert [row[0] for row in queue.get_due_assets(now=1)] == ["flaky"]
+    queue.schedule_expiry("flaky", 0)  # rescheduling starts the count again
+    assert queue.record_failures(["flaky"], max_attempts=2) == []
+    queue.close()
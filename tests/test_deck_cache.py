@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from utils.presentation import deck_cache as deck_cache_module
+from utils.presentation.deck_cache import SemanticDeckCache
+
+VECTORS = {
+    "photosynthesis": [1.0, 0.0, 0.0],
+    "photosynthesis in plants": [0.95, 0.05, 0.0],
+    "volcanoes": [0.0, 1.0, 0.0],
+}
+
+
+def embed(topic):
+    return VECTORS[SemanticDeckCache.normalize_topic(topic)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(deck_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return SemanticDeckCache(db_path=str(tmp_path / "decks.db"), threshold=0.9, ttl_seconds=100, embed=embed)
+
+
+SLIDES = [{"title": "Light", "image_query": "leaf", "image_data": b"jpeg", "image_path": "/tmp/x.jpg"}]
+
+
+def test_exact_and_similar_topics_hit(cache):
+    cache.store("Photosynthesis", SLIDES)
+
+    exact = cache.lookup("photosynthesis!")
+    assert exact["similarity"] == 1.0
+    assert exact["slides"] == [{"title": "Light", "image_query": "leaf"}]  # image bytes are never stored
+
+    similar = cache.lookup("Photosynthesis in plants")
+    assert similar["topic"] == "Photosynthesis"
+    assert similar["similarity"] >= 0.9
+
+    assert cache.lookup("Volcanoes") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_entries_expire_for_a_read_only_reader(cache, clock):
+    cache.store("Photosynthesis", SLIDES)
+    assert cache.lookup("Photosynthesis in plants") is not None  # builds the in-memory matrix
+
+    clock[0] += 101
+    assert cache.lookup("Photosynthesis in plants") is None
+    assert cache.lookup("Photosynthesis") is None
+
+
+def test_least_recently_used_decks_are_evicted(tmp_path, clock):
+    cache = SemanticDeckCache(db_path=str(tmp_path / "decks.db"), ttl_seconds=100, max_entries=1, embed=embed)
+    cache.store("Photosynthesis", SLIDES)
+    clock[0] += 1
+    cache.store("Volcanoes", SLIDES)
+
+    assert cache.lookup("Photosynthesis") is None
+    assert cache.lookup("Volcanoes") is not None
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+
+import pytest
+
+from utils.common.db import ExamDataBaseService
+from utils.common.service_registry import services
+from utils.evaluation.evaluation_service import ExamEvaluationService
+from utils.evaluation.text_extraction import text_extractor
+
+
+def labels(sections):
+    return [label for label, _ in sections]
+
+
+class TestSplitIntoSections:
+    def test_splits_at_explicit_question_headings(self):
+        script = "Name: Ada\nQ1. Define a cell.\nA cell is...\nQuestion 2: Explain osmosis.\nWater moves..."
+        sections = ExamEvaluationService.split_into_sections(script)
+
+        assert labels(sections) == ["Question 1", "Question 2"]
+        assert sections[0][1].startswith("Name: Ada")  # preamble stays with the first question
+        assert sections[1][1].startswith("Question 2")
+
+    def test_numbered_lists_and_decimals_inside_answers_do_not_split(self):
+        script = (
+            "Q1 List the stages of mitosis.\n"
+            "1. Prophase\n2) Metaphase\n3. Anaphase\n"
+            "Q2 What is pi to two places?\n"
+            "3.14 is the answer.\n"
+        )
+        sections = ExamEvaluationService.split_into_sections(script)
+
+        assert labels(sections) == ["Question 1", "Question 2"]
+        assert "2) Metaphase" in sections[0][1]
+        assert "3.14" in sections[1][1]
+
+    def test_repeated_or_lower_numbers_stay_in_the_current_question(self):
+        script = "Q1 First.\nanswer\nQ2 Second.\nQ1 was about cells, so\nmore answer\nQ3 Third.\nanswer"
+        sections = ExamEvaluationService.split_into_sections(script)
+
+        assert labels(sections) == ["Question 1", "Question 2", "Question 3"]
+        assert "Q1 was about cells" in sections[1][1]
+
+    def test_words_starting_with_q_are_not_headings(self):
+        script = "Quantum tunnelling\n\nQuestions remain open.\n\nQ1 only one heading"
+        assert labels(ExamEvaluationService.split_into_sections(script)) == ["Section 1"]
+
+    def test_falls_back_to_paragraph_parts_without_two_headings(self):
+        script = "\n\n".join(["a" * 40, "b" * 40, "c" * 40])
+        sections = ExamEvaluationService.split_into_sections(script, max_chars=90)
+
+        assert labels(sections) == ["Section 1", "Section 2"]
+        assert sections[0][1] == "a" * 40 + "\n\n" + "b" * 40
+        assert sections[1][1] == "c" * 40
+
+    def test_single_newline_scripts_are_split_at_line_breaks(self):
+        lines = [f"line {i:03d} " + "x" * 30 for i in range(100)]  # PyPDF2-style text, no blank lines
+        sections = ExamEvaluationService.split_into_sections("\n".join(lines), max_chars=200)
+
+        assert len(sections) > 1
+        assert all(len(text) <= 200 for _, text in sections)
+        assert "\n".join(text for _, text in sections).split("\n") == lines  # no line is cut
+
+    def test_lines_longer_than_the_limit_are_cut(self):
+        sections = ExamEvaluationService.split_into_sections("y" * 250, max_chars=100)
+
+        assert [len(text) for _, text in sections] == [100, 100, 50]
+
+
+class TestAggregateSections:
+    def test_averages_scored_sections_and_reports_failures(self):
+        sections = [("Question 1", ""), ("Question 2", ""), ("Question 3", "")]
+        responses = [
+            '```json\n{"evaluation": "good", "score": 80}\n```',
+            RuntimeError("quota"),
+            '{"evaluation": "ok", "score": 60}'
+        ]
+        result = ExamEvaluationService.aggregate_sections(sections, responses)
+
+        assert result["score"] == 70
+        assert [q["score"] for q in result["questions"]] == [80, None, 60]
+        assert "1 section(s) could not be evaluated" in result["evaluation"]
+
+    def test_raises_when_every_section_failed(self):
+        with pytest.raises(RuntimeError):
+            ExamEvaluationService.aggregate_sections([("Question 1", "")], ["not json"])
+
+
+class CountingGemini:
+    """Fake Gemini client that records the peak number of concurrent calls."""
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_response(self, prompt):
+        with self._lock:
+            self.active += 1
+            self.calls += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return json.dumps({"evaluation": "fine", "score": 50})
+
+    def batch_get_responses(self, prompts, return_exceptions=False):
+        raise AssertionError("the batch pipeline must not start a nested fan-out")
+
+
+@pytest.fixture
+def gemini(tmp_path):
+    fake = CountingGemini()
+    services.override("gemini", fake)
+    database = ExamDataBaseService(str(tmp_path / "question.db"))
+    services.override("exam_database", database)
+    yield fake
+    database.close()
+    services.reset("gemini")
+    services.reset("exam_database")
+
+
+def test_batch_sections_share_one_concurrency_budget(tmp_path, gemini, monkeypatch):
+    monkeypatch.setattr("utils.evaluation.evaluation_service.EXAM_PER_QUESTION_THRESHOLD", 10)
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"exam{i}.txt"
+        text = "\n".join(f"Q{n} answer {n}" for n in range(1, 6))
+        path.write_text(text)
+        text_extractor.store(str(path), text)
+        paths.append(str(path))
+
+    result = ExamEvaluationService.evaluate_exams(paths, extract_workers=1, max_concurrency=3)
+
+    assert result["succeeded"] == 4
+    assert gemini.calls == 20  # 4 scripts x 5 questions
+    assert gemini.peak <= 3
+    assert all(len(r["evaluation"]["questions"]) == 5 for r in result["results"])
+
+
+def test_batch_results_are_stored_before_success_is_reported(tmp_path, gemini, monkeypatch):
+    monkeypatch.setattr("utils.evaluation.evaluation_service.EXAM_STORE_BATCH_SIZE", 2)
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"exam{i}.txt"
+        path.write_text(f"short answer {i}")
+        text_extractor.store(str(path), path.read_text())
+        paths.append(str(path))
+
+    database = services.get("exam_database")
+    results = ExamEvaluationService.iter_evaluate_exams(paths, extract_workers=1, max_concurrency=2)
+    first = next(results)
+    assert first["status"] == "success"
+    assert database.get_exam_results(first["file"])  # stored before it was reported
+    results.close()
+
+    reported = [first["file"]]
+    stored = [path for path in paths if database.get_exam_results(path)]
+    assert set(reported) <= set(stored)
+    assert 2 <= len(stored) <= 5  # the first chunk plus whatever finished before close()
+
+
+def test_evaluations_are_kept_when_a_store_fails(tmp_path, gemini, monkeypatch):
+    monkeypatch.setattr("utils.evaluation.evaluation_service.EXAM_STORE_BATCH_SIZE", 2)
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"exam{i}.txt"
+        path.write_text(f"short answer {i}")
+        text_extractor.store(str(path), path.read_text())
+        paths.append(str(path))
+
+    database = services.get("exam_database")
+    store = database.store_exam_values_bulk
+    attempts = []
+
+    def flaky_store(rows):
+        attempts.append(len(rows))
+        if len(attempts) == 1:
+            raise RuntimeError("database is locked")
+        store(rows)
+
+    monkeypatch.setattr(database, "store_exam_values_bulk", flaky_store)
+    with pytest.raises(RuntimeError):
+        list(ExamEvaluationService.iter_evaluate_exams(paths, extract_workers=1, max_concurrency=2))
+
+    assert attempts == [2, 2]  # the failed chunk is stored again on the way out
+    assert all(database.get_exam_results(path) for path in paths)
@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from utils.common.gemini_service import GeminiService
+from utils.common.rate_limiter import TokenBucket
+
+
+class LoopBoundAio:
+    """Async fake that, like an httpx-backed client, only works on the loop it was first used on."""
+    def __init__(self):
+        self.loop = None
+        self.models = self
+
+    async def generate_content(self, model, contents, config=None):
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        elif self.loop is not loop:
+            raise RuntimeError("Event loop is closed")
+        await asyncio.sleep(0)
+        return SimpleNamespace(text=f" {contents.upper()} ", usage_metadata=None)
+
+
+@pytest.fixture
+def service():
+    client = SimpleNamespace(aio=LoopBoundAio(), models=None)
+    return GeminiService(cache=None, limiter=TokenBucket(rate_per_minute=60000, burst=1000), client=client)
+
+
+def test_repeated_batches_reuse_one_loop(service):
+    assert service.batch_get_responses(["a", "b"]) == ["A", "B"]
+    assert service.batch_get_responses(["c"]) == ["C"]
+
+
+def test_async_callers_on_other_loops_share_the_client(service):
+    assert asyncio.run(service.aget_response("x")) == "X"
+    assert asyncio.run(service.abatch_get_responses(["y", "z"])) == ["Y", "Z"]
+    assert service.batch_get_responses(["w"]) == ["W"]
+
+
+def test_batch_from_inside_a_running_loop(service):
+    async def caller():
+        return service.batch_get_responses(["q"])
+
+    assert asyncio.run(caller()) == ["Q"]
@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import wait
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("PIL")
+
+from utils.presentation.image_search_service import ImageSearchService
+
+
+class NoMatches:
+    def match_many(self, texts):
+        return [None] * len(texts)
+
+
+@pytest.fixture
+def service():
+    service = ImageSearchService(max_workers=2, cache=None, library=NoMatches())
+    lookups = []
+
+    def search(query):
+        lookups.append(query)
+        time.sleep(0.01)
+        return f"File:{query}.jpg", f"https://upload.example/{query}.jpg"
+
+    service._search_image_url = search
+    service._title_image_urls = lambda titles: {title: f"https://upload.example/{title[5:]}" for title in titles}
+    service.download_image_bytes = lambda url, query: query.encode("utf-8")
+    service.lookups = lookups
+    yield service
+    service.shutdown(wait=False)
+
+
+def test_more_groups_than_workers_all_finish(service):
+    groups = [[f"q{g}-{i}" for i in range(3)] for g in range(5)]
+
+    futures = [service.submit_images_bytes(group) for group in groups]
+    done, not_done = wait(futures, timeout=5)
+
+    assert not not_done
+    assert [future.result() for future in futures] == [[q.encode("utf-8") for q in group] for group in groups]
+
+
+def test_groups_scheduled_on_the_image_pool_run_inline(service):
+    futures = [service.executor.submit(service.fetch_images_bytes, ["a", "b", "c"]) for _ in range(4)]
+    done, not_done = wait(futures, timeout=5)
+
+    assert not not_done
+    assert all(future.result() == [b"a", b"b", b"c"] for future in futures)
+
+
+def test_group_lookups_still_fan_out_on_the_image_pool(service):
+    threads = set()
+    search = service._search_image_url
+
+    def recording_search(query):
+        threads.add(threading.current_thread().name)
+        return search(query)
+
+    service._search_image_url = recording_search
+    assert service.submit_images_bytes(["x", "y", "x"]).result(timeout=5) == [b"x", b"y", b"x"]
+
+    assert sorted(service.lookups) == ["x", "y"]  # duplicates are looked up once
+    assert all(name.startswith("image-fetch") for name in threads)
@@ -0,0 +1,23 @@
+import subprocess
+
+from utils.common import import_budget as import_budget_module
+from utils.common.import_budget import measure_import
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       300 |        300 |   utils.config
+import time:      5000 |       5000 |   utils.common.db
+import time:       200 |        500 |   utils.common
+import time:       100 |        100 |   utils
+import time:      1000 |       9000 | utils.common.db_tools
+"""
+
+
+def test_parents_are_skipped_but_prefix_named_siblings_are_kept(monkeypatch):
+    monkeypatch.setattr(
+        import_budget_module.subprocess, "run",
+        lambda *args, **kwargs: subprocess.CompletedProcess(args, 0, stdout="", stderr=IMPORTTIME)
+    )
+    measurement = measure_import("utils.common.db_tools", runs=1)
+
+    assert measurement["total_ms"] == 9.0
+    assert [name for name, _ in measurement["slowest"]] == ["utils.common.db", "utils.config"]
@@ -0,0 +1,44 @@
+import pytest
+
+from utils.common.json_stream import JSONArrayStreamParser, iter_json_array
+
+
+def test_elements_are_yielded_as_soon_as_they_complete():
+    parser = JSONArrayStreamParser()
+
+    assert parser.feed('```json\n[{"title": "A", "bul') == []
+    assert parser.feed('lets": ["x"]}, {"title"') == [{"title": "A", "bullets": ["x"]}]
+    assert parser.feed(': "B, [not] the end"}') == [{"title": "B, [not] the end"}]
+    assert parser.feed("]\n```") == []
+    assert parser.finished
+
+
+def test_single_character_chunks():
+    text = '[{"a": 1}, ["b", "c"], "d"]'
+
+    assert list(iter_json_array(text)) == [{"a": 1}, ["b", "c"], "d"]
+
+
+def test_text_after_the_array_is_ignored_but_drained():
+    consumed = []
+
+    def chunks():
+        for chunk in ['[{"a": 1}]', " trailing ", "[{\"b\": 2}]"]:
+            consumed.append(chunk)
+            yield chunk
+
+    assert list(iter_json_array(chunks())) == [{"a": 1}]
+    assert len(consumed) == 3
+
+
+def test_missing_array_raises():
+    with pytest.raises(ValueError, match="did not contain"):
+        list(iter_json_array(["Sorry, I can't help with that."]))
+
+
+def test_truncated_array_raises_after_complete_elements():
+    items = iter_json_array(['[{"a": 1}, {"b":'])
+
+    assert next(items) == {"a": 1}
+    with pytest.raises(ValueError, match="before the JSON array was closed"):
+        next(items)
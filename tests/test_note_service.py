@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from utils.common.db import NoteDataBaseService
+from utils.common.service_registry import services
+from utils.notes.note_service import NoteExtractionService
+
+
+class FakeRAG:
+    """Stands in for GeminiRAGService: answers with a bullet derived from the file content."""
+    def __init__(self, file_path):
+        with open(file_path) as f:
+            self.content = f.read().strip()
+
+    def get_answer(self, prompt):
+        if self.content == "bad":
+            return "Sorry, I can't help with that."
+        return f'```json\n["{self.content}", "{self.content}"]\n```'
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    db = NoteDataBaseService(str(tmp_path / "notes.db"))
+    services.override("note_database", db)
+    monkeypatch.setattr(NoteExtractionService, "build_rag", staticmethod(FakeRAG))
+    yield db
+    db.close()
+    services.reset("note_database")
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def run(source, **kwargs):
+    return NoteExtractionService.extract_notes_batch(source, index_workers=2, max_concurrency=2, **kwargs)
+
+
+class TestParseBulletPoints:
+    def test_plain_array(self):
+        assert NoteExtractionService.parse_bullet_points('["a", "b"]') == ["a", "b"]
+
+    def test_fenced_array_is_cleaned_and_deduplicated(self):
+        response = '```json\n[" a ", "b", "a", ""]\n```'
+        assert NoteExtractionService.parse_bullet_points(response) == ["a", "b"]
+
+    def test_array_surrounded_by_text(self):
+        assert NoteExtractionService.parse_bullet_points('Here you go: ["x"] Enjoy!') == ["x"]
+
+    @pytest.mark.parametrize("response", ["no array here", '{"a": 1}', "[]"])
+    def test_invalid_responses_raise(self, response):
+        with pytest.raises(ValueError):
+            NoteExtractionService.parse_bullet_points(response)
+
+
+class TestBatchExtraction:
+    def test_stores_points_and_skips_finished_documents(self, tmp_path, database):
+        write(str(tmp_path / "docs" / "one.txt"), "first")
+        write(str(tmp_path / "docs" / "two.md"), "second")
+
+        result = run(str(tmp_path / "docs"))
+        assert (result["succeeded"], result["skipped"], result["failed"]) == (2, 0, 0)
+        assert database.get_notes("one") == ["first"]
+
+        rerun = run(str(tmp_path / "docs"))
+        assert (rerun["succeeded"], rerun["skipped"]) == (0, 2)
+
+    def test_changed_document_does_not_delete_same_topic_of_other_documents(self, tmp_path, database):
+        first = str(tmp_path / "a" / "intro.txt")
+        second = str(tmp_path / "b" / "intro.txt")
+        write(first, "from a")
+        write(second, "from b")
+        run(str(tmp_path))
+
+        write(first, "from a, edited")
+        result = run(str(tmp_path))
+
+        assert (result["succeeded"], result["skipped"]) == (1, 1)
+        assert database.get_document_notes(first) == ["from a, edited"]
+        assert database.get_document_notes(second) == ["from b"]
+        assert sorted(database.get_notes("intro")) == ["from a, edited", "from b"]
+
+    def test_failed_documents_are_retried_only_on_request(self, tmp_path, database):
+        path = str(tmp_path / "docs" / "broken.txt")
+        write(path, "bad")
+        assert run(str(tmp_path / "docs"))["failed"] == 1
+        assert run(str(tmp_path / "docs"))["skipped"] == 1
+
+        write(path, "bad")  # same content, still failing
+        assert run(str(tmp_path / "docs"), retry_failed=True)["failed"] == 1
+
+        write(path, "fixed")
+        result = run(str(tmp_path / "docs"))
+        assert result["succeeded"] == 1
+        assert database.get_document_notes(os.path.abspath(path)) == ["fixed"]
+
+    def test_missing_path_is_reported(self, database):
+        result = run(["/does/not/exist.txt"])
+        assert result["failed"] == 1
+        assert result["errors"][0]["error"] == "Invalid or missing file path."
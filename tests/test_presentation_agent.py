@@ -0,0 +1,58 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pytest
+
+pytest.importorskip("google.adk")
+pytest.importorskip("requests")
+pytest.importorskip("PIL")
+
+from agents.presentation_agent import _generate_slides_streaming
+from utils.common.service_registry import services
+from utils.presentation.image_search_service import ImageSearchService
+
+SUBJECTS = ["volcano", "glacier", "ocean", "desert", "forest", "canyon", "river", "island", "volcano", "tundra"]
+
+
+class NoMatches:
+    def match_many(self, texts):
+        return [None] * len(texts)
+
+
+class StreamingGemini:
+    def stream_response(self, prompt):
+        deck = json.dumps([
+            {"title": f"Slide {i}", "image_prompt": f"{subject} {subject} landscape"}
+            for i, subject in enumerate(SUBJECTS)
+        ])
+        for start in range(0, len(deck), 40):
+            yield deck[start:start + 40]
+
+
+@pytest.fixture
+def image_search():
+    image_search = ImageSearchService(max_workers=2, cache=None, library=NoMatches())
+    image_search._search_image_url = lambda query: (time.sleep(0.01) or f"File:{query}.jpg", f"https://x/{query}")
+    image_search._title_image_urls = lambda titles: {title: f"https://x/{title}" for title in titles}
+    image_search.download_image_bytes = lambda url, query: query.encode("utf-8")
+    services.override("image_search", image_search)
+    services.override("gemini", StreamingGemini())
+    yield image_search
+    services.reset("image_search")
+    services.reset("gemini")
+    image_search.shutdown(wait=False)
+
+
+def test_concurrent_streamed_decks_on_a_small_image_pool_finish(image_search):
+    decks = ThreadPoolExecutor(max_workers=3)
+    futures = [decks.submit(_generate_slides_streaming, "prompt", 3) for _ in range(3)]
+    done, not_done = wait(futures, timeout=10)
+    decks.shutdown(wait=False)
+
+    assert not not_done
+    for future in futures:
+        slides = future.result()
+        assert [slide["image_data"] for slide in slides] == [
+            f"{subject} landscape".encode("utf-8") for subject in SUBJECTS
+        ]
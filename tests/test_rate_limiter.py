@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from utils.common import rate_limiter as rate_limiter_module
+from utils.common.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+    return clock
+
+
+def test_burst_is_free_then_calls_are_spaced_at_the_rate(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=3)  # one token per second
+
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == pytest.approx([1.0, 1.0])
+
+
+def test_tokens_refill_up_to_the_burst(clock):
+    bucket = TokenBucket(rate_per_minute=120, burst=2)  # two tokens per second
+    bucket.acquire()
+    bucket.acquire()
+
+    clock.now += 60  # idle for a minute: refill is capped at the burst
+    for _ in range(2):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == pytest.approx([0.5])
+
+
+def test_waiting_callers_are_served_in_arrival_order(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=1)
+    bucket.acquire()
+
+    # Reservations made before anyone sleeps queue up one interval apart
+    assert [bucket._reserve() for _ in range(3)] == pytest.approx([1.0, 2.0, 3.0])
+
+
+def test_async_acquire_waits_without_blocking(clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(rate_limiter_module.asyncio, "sleep", fake_sleep)
+    bucket = TokenBucket(rate_per_minute=30, burst=1)  # one token every two seconds
+
+    async def run():
+        await bucket.aacquire()
+        await bucket.aacquire()
+
+    asyncio.run(run())
+    assert slept == pytest.approx([2.0])
+    assert clock.sleeps == []
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(rate_per_minute=0)
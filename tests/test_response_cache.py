@@ -0,0 +1,68 @@
+import pytest
+
+from utils.common import response_cache as response_cache_module
+from utils.common.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(response_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(db_path=str(tmp_path / "cache.db"), ttl_seconds=100, max_entries=2)
+
+
+def test_keys_depend_on_model_prompt_and_config():
+    key = ResponseCache.make_key("gemini-2.0-flash", "Explain tides.", {"temperature": 0.2})
+
+    assert key == ResponseCache.make_key("gemini-2.0-flash", "Explain tides.", {"temperature": 0.2})
+    assert key != ResponseCache.make_key("gemini-1.5-flash", "Explain tides.", {"temperature": 0.2})
+    assert key != ResponseCache.make_key("gemini-2.0-flash", "Explain tides!", {"temperature": 0.2})
+    assert key != ResponseCache.make_key("gemini-2.0-flash", "Explain tides.", {"temperature": 0.9})
+
+
+def test_hit_miss_and_stats(cache):
+    assert cache.get("a") is None
+    cache.set("a", "model", "reply")
+
+    assert cache.get("a") == "reply"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.set("a", "model", "reply")
+
+    clock[0] += 100
+    assert cache.get("a") == "reply"
+    clock[0] += 1
+    assert cache.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted(cache, clock):
+    cache.set("a", "model", "first")
+    clock[0] += 1
+    cache.set("b", "model", "second")
+    clock[0] += 1
+    assert cache.get("a") == "first"  # "b" is now the least recently used
+
+    clock[0] += 1
+    cache.set("c", "model", "third")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "first"
+    assert cache.get("c") == "third"
+    assert cache.stats()["entries"] == 2
+
+
+def test_clear_removes_every_entry(cache):
+    cache.set("a", "model", "reply")
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
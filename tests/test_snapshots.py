@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from utils.common.snapshots import current_snapshot, write_snapshot
+
+
+def write_text(text):
+    def write(directory):
+        with open(os.path.join(directory, "manifest.json"), "w") as f:
+            f.write(text)
+    return write
+
+
+def read_current(root):
+    with open(os.path.join(current_snapshot(root), "manifest.json")) as f:
+        return f.read()
+
+
+def test_no_snapshot_yet(tmp_path):
+    assert current_snapshot(str(tmp_path / "index")) is None
+
+
+def test_each_save_publishes_a_new_snapshot(tmp_path):
+    root = str(tmp_path / "index")
+    first = write_snapshot(root, write_text("v1"))
+    assert read_current(root) == "v1"
+
+    second = write_snapshot(root, write_text("v2"))
+    assert second != first
+    assert read_current(root) == "v2"
+    assert os.path.isdir(first)  # a reader that resolved the old pointer can still load it
+
+    write_snapshot(root, write_text("v3"))
+    assert not os.path.exists(first)
+    assert read_current(root) == "v3"
+
+
+def test_failed_write_keeps_the_current_snapshot(tmp_path):
+    root = str(tmp_path / "index")
+    write_snapshot(root, write_text("v1"))
+
+    def broken(directory):
+        write_text("partial")(directory)
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        write_snapshot(root, broken)
+    assert read_current(root) == "v1"
+    assert len([name for name in os.listdir(root) if name.startswith("snapshot-")]) == 1
+
+
+def test_legacy_layout_is_loaded_then_replaced(tmp_path):
+    root = tmp_path / "index"
+    root.mkdir()
+    (root / "manifest.json").write_text("legacy")
+    (root / "index.faiss").write_text("vectors")
+
+    assert current_snapshot(str(root), "manifest.json") == str(root)
+
+    write_snapshot(str(root), write_text("v1"))
+    assert read_current(str(root)) == "v1"
+    assert not (root / "manifest.json").exists()
+    assert not (root / "index.faiss").exists()
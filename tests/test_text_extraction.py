@@ -0,0 +1,47 @@
+import sys
+import types
+
+import pytest
+
+from utils.evaluation.text_extraction import TextExtractor
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+
+@pytest.fixture
+def readers(monkeypatch):
+    opened = []
+
+    class PdfReader:
+        def __init__(self, stream):
+            opened.append(stream.name)
+            self.pages = [FakePage(f"page {i}") for i in range(3)]
+
+    monkeypatch.setitem(sys.modules, "PyPDF2", types.SimpleNamespace(PdfReader=PdfReader))
+    return opened
+
+
+def test_small_pdfs_are_parsed_once(tmp_path, readers):
+    path = tmp_path / "exam.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    extractor = TextExtractor(parallel_page_threshold=40, max_workers=4)
+
+    assert extractor.extract(str(path)) == "page 0\npage 1\npage 2\n"
+    assert readers == [str(path)]
+    assert extractor._pool is None  # no worker processes for a small file
+
+
+def test_unchanged_files_come_from_the_cache(tmp_path, readers):
+    path = tmp_path / "exam.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    extractor = TextExtractor()
+
+    extractor.extract(str(path), parallel=False)
+    extractor.extract(str(path), parallel=False)
+    assert len(readers) == 1
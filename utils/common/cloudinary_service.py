@@ -1,15 +1,17 @@
 import cloudinary
+import cloudinary.api
 import cloudinary.uploader
 import logging
 import asyncio
-from typing import Optional, Tuple
+import os
+import threading
+import time
+from typing import BinaryIO, List, Optional, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from utils.config import (
-    CLOUDINARY_API_KEY,
-    CLOUDINARY_API_SECRET,
-    CLOUDINARY_CLOUD_NAME
-)
+from utils.common.db import AssetExpiryDataBaseService
+from utils.common.metrics import metrics
+from utils.config import require
 
 """
 Cloudinary Upload Module
@@ -17,24 +19,31 @@ Cloudinary Upload Module
 This module provides functionality for uploading files to Cloudinary with automatic scheduled deletion.
 
 The `CloudinaryService` class manages:
-    - Uploading files to Cloudinary
+    - Uploading files to Cloudinary (blocking or off the event loop)
+    - Chunked uploads for files above a size threshold
+    - Retrying failed uploads with exponential backoff
     - Generating secure URLs and public IDs
     - Scheduling automatic deletion of files after a specified time interval
 
 Configuration is handled via the `CloudinaryConfig` dataclass.
 
 Classes:
-    - CloudinaryConfig: Holds configuration parameters like credentials, folder name, and deletion delay.
+    - CloudinaryConfig: Holds configuration parameters like credentials, folder name, deletion delay,
+      sweep interval, delete attempts, chunking threshold and retry / concurrency limits.
     - CloudinaryService: Main service class for uploading and deleting files asynchronously.
 
 Functions:
     - _configure_cloudinary(): Initializes Cloudinary with provided credentials.
-    - _schedule_file_deletion(public_id, delay_minutes): Schedules deletion of a file after a delay.
-    - upload_file(local_path, public_id=None): Uploads a file to Cloudinary and schedules its deletion.
+    - _schedule_deletion(public_id): Records the file's expiry in the persistent expiry queue.
+    - sweep_expired(now=None): Bulk-deletes every due file through the Admin API (up to 100 per call).
+    - stop_sweeper(): Stops the process-wide background sweeper thread.
+    - upload_file(file, public_id=None): Uploads a file (path or in-memory file object) to Cloudinary and schedules its deletion.
+    - aupload_file(file, public_id=None): Same as `upload_file`, but runs the upload in a worker thread.
+    - aupload_files(files): Uploads several (file, public_id) pairs concurrently.
 
 Workflow:
     1. Configure Cloudinary with API credentials.
-    2. Upload a file to the specified Cloudinary folder.
+    2. Upload a file to the specified Cloudinary folder (`upload_large` in chunks above `large_file_threshold`).
     3. Get the file’s secure URL and public ID.
     4. Automatically schedule deletion after a delay (default: 5 minutes).
     5. Return the secure URL and public ID for downstream use.
@@ -47,10 +56,19 @@ Usage:
     )
     service = CloudinaryService(config)
     url, public_id = service.upload_file("path/to/file.pdf")
+    url, public_id = service.upload_file(BytesIO(deck_bytes), public_id="deck")
+    results = await service.aupload_files([(deck_a, "deck_a"), (deck_b, "deck_b")])
 
 Notes:
     - Only raw files are supported for upload (resource_type="raw").
-    - Deletion is handled asynchronously using `asyncio.create_task`.
+    - Pending deletions are stored in SQLite (`data/assets.db`), so they survive restarts. A single
+      daemon thread per process (however many services are built) sweeps due files every
+      `sweep_interval` seconds; no task is held per file. The sweeper keeps the `sweep_interval` and
+      `max_delete_attempts` of the service that started it, but no reference to that service. A service built
+      with `start_sweeper=False` never starts one (not even on upload); call `sweep_expired()` to sweep.
+    - Files Cloudinary refuses to delete are retried on later sweeps and dropped from the queue after
+      `max_delete_attempts` refusals. Failed API calls (network errors) do not count as refusals.
+    - Upload failures are logged and reported as `None` rather than raised.
 
 """
 
@@ -62,18 +80,54 @@ class CloudinaryConfig:
     api_secret: str
     upload_folder: str = "presentations"
     auto_delete_delay: int = 5  # minutes
+    large_file_threshold: int = 20 * 1024 * 1024  # bytes; larger files use chunked upload_large
+    chunk_size: int = 6 * 1024 * 1024  # bytes per upload_large chunk
+    max_retries: int = 3
+    retry_backoff: float = 1.0  # seconds, doubled on every retry
+    max_concurrent_uploads: int = 4
+    sweep_interval: int = 30  # seconds between expiry sweeps
+    max_delete_attempts: int = 5  # rejected deletions before an asset is dropped from the queue
+
+
+def _file_size(file: Union[str, BinaryIO]) -> int:
+    if isinstance(file, str):
+        return os.path.getsize(file)
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
 
 
 class CloudinaryService:
-    def __init__(self, config: Optional[CloudinaryConfig] = None):
+    DELETE_BATCH_SIZE = 100  # Admin API limit for delete_resources
+
+    # One sweeper thread per expiry queue database, shared by every instance in the process. The thread holds
+    # only the queue and the sweep settings of the service that started it, never the service itself.
+    _sweepers = {}  # db path -> (thread, stop event)
+    _sweepers_lock = threading.Lock()
+
+    def __init__(
+            self,
+            config: Optional[CloudinaryConfig] = None,
+            expiry_queue: Optional[AssetExpiryDataBaseService] = None,
+            start_sweeper: bool = True
+    ):
         self.logger = logging.getLogger(__name__)
-        self.config = config or CloudinaryConfig(
-            cloud_name=CLOUDINARY_CLOUD_NAME,
-            api_key=CLOUDINARY_API_KEY,
-            api_secret=CLOUDINARY_API_SECRET
-        )
+        if config is None:
+            cloud_name, api_key, api_secret = require(
+                "CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"
+            )
+            config = CloudinaryConfig(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret)
+        self.config = config
         self._configure_cloudinary()
 
+        self.expiry_queue = expiry_queue or AssetExpiryDataBaseService()
+        self.start_sweeper = start_sweeper
+        if start_sweeper:
+            # Picks up expiries left pending by a previous process
+            self._ensure_sweeper()
+
     def _configure_cloudinary(self) -> None:
         cloudinary.config(
             cloud_name=self.config.cloud_name,
@@ -81,41 +135,193 @@ class CloudinaryService:
             api_secret=self.config.api_secret
         )
 
-    async def _schedule_file_deletion(self, public_id: str, delay_minutes: int) -> None:
+    def _ensure_sweeper(self) -> None:
+        key = self.expiry_queue.db_path
+        with self._sweepers_lock:
+            running = self._sweepers.get(key)
+            if running is not None and running[0].is_alive():
+                return
+            stop = threading.Event()
+            sweeper = threading.Thread(
+                target=self._sweep_loop,
+                args=(self.expiry_queue, self.config.sweep_interval, self.config.max_delete_attempts, stop),
+                name="cloudinary-expiry-sweeper",
+                daemon=True
+            )
+            self._sweepers[key] = (sweeper, stop)
+            sweeper.start()
+
+    @classmethod
+    def _sweep_loop(
+            cls,
+            expiry_queue: AssetExpiryDataBaseService,
+            interval: float,
+            max_attempts: int,
+            stop: threading.Event
+    ) -> None:
+        logger = logging.getLogger(__name__)
+        while not stop.is_set():
+            try:
+                cls._sweep(expiry_queue, max_attempts)
+            except Exception as e:
+                logger.error(f"Error while sweeping expired files: {str(e)}")
+            stop.wait(interval)
+
+    def stop_sweeper(self) -> None:
+        """
+        Stops the process-wide sweeper of this service's expiry queue.
+        """
+        with self._sweepers_lock:
+            running = self._sweepers.pop(self.expiry_queue.db_path, None)
+        if running is not None:
+            sweeper, stop = running
+            stop.set()
+            if sweeper is not threading.current_thread():
+                sweeper.join()
+
+    def sweep_expired(self, now: Optional[float] = None) -> int:
+        """
+        Deletes every asset whose expiry has passed, in batches of up to
+        DELETE_BATCH_SIZE public ids per Admin API call. Returns the number of
+        assets removed from the queue; failed batches stay queued for the next sweep.
+        An asset Cloudinary refuses to delete is dropped from the queue after
+        `max_delete_attempts` sweeps.
+        """
+        return self._sweep(self.expiry_queue, self.config.max_delete_attempts, now)
+
+    @classmethod
+    def _sweep(cls, expiry_queue: AssetExpiryDataBaseService, max_attempts: int, now: Optional[float] = None) -> int:
+        logger = logging.getLogger(__name__)
+        now = time.time() if now is None else now
+        removed = 0
+        attempted = set()  # each asset is tried at most once per sweep
+        while True:
+            due = [row for row in expiry_queue.get_due_assets(now) if row[0] not in attempted]
+            if not due:
+                return removed
+
+            by_type = {}
+            for public_id, resource_type in due:
+                by_type.setdefault(resource_type, []).append(public_id)
+                attempted.add(public_id)
+
+            swept = 0
+            for resource_type, public_ids in by_type.items():
+                for start in range(0, len(public_ids), cls.DELETE_BATCH_SIZE):
+                    batch = public_ids[start:start + cls.DELETE_BATCH_SIZE]
+                    try:
+                        with metrics.span("expiry_delete", resource_type=resource_type):
+                            result = cloudinary.api.delete_resources(batch, resource_type=resource_type)
+                    except Exception as e:
+                        logger.error(f"Error during scheduled deletion of {len(batch)} files: {str(e)}")
+                        continue
+
+                    # "not_found" means the asset is already gone, which is just as final
+                    statuses = result.get("deleted", {})
+                    done = [public_id for public_id in batch if statuses.get(public_id) in ("deleted", "not_found")]
+                    expiry_queue.remove_assets(done)
+                    metrics.inc("expired_assets_deleted_total", len(done))
+                    swept += len(done)
+                    logger.info(f"Deleted {len(done)}/{len(batch)} expired files")
+
+                    rejected = [public_id for public_id in batch if public_id not in done]
+                    if rejected:
+                        dropped = expiry_queue.record_failures(rejected, max_attempts)
+                        if dropped:
+                            metrics.inc("expired_assets_dropped_total", len(dropped))
+                            logger.warning(
+                                f"Gave up deleting {len(dropped)} files after "
+                                f"{max_attempts} attempts: {', '.join(dropped)}"
+                            )
+
+            removed += swept
+            if swept == 0:
+                return removed
+
+    def _schedule_deletion(self, public_id: str) -> None:
+        expires_at = time.time() + self.config.auto_delete_delay * 60
+        self.expiry_queue.schedule_expiry(public_id, expires_at, resource_type="raw")
+        if self.start_sweeper:
+            self._ensure_sweeper()
+
+    @metrics.timed_stage("upload")
+    def _upload(self, file: Union[str, BinaryIO], public_id: str) -> dict:
+        options = {
+            "resource_type": "raw",
+            "public_id": public_id,
+            "folder": self.config.upload_folder
+        }
+        size = _file_size(file)
+        metrics.inc("upload_bytes_total", size)
+
+        for attempt in range(self.config.max_retries + 1):
+            if not isinstance(file, str):
+                file.seek(0)
+            try:
+                if size > self.config.large_file_threshold:
+                    return cloudinary.uploader.upload_large(file, chunk_size=self.config.chunk_size, **options)
+                return cloudinary.uploader.upload(file, **options)
+            except Exception as e:
+                if attempt == self.config.max_retries:
+                    raise
+                metrics.inc("upload_retries_total")
+                delay = self.config.retry_backoff * (2 ** attempt)
+                self.logger.warning(
+                    f"Upload of {public_id} failed ({e}); retry {attempt + 1}/{self.config.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def upload_file(self, file: Union[str, BinaryIO], public_id: Optional[str] = None) -> Tuple[str, str]:
         try:
-            await asyncio.sleep(delay_minutes * 60)
-            result = cloudinary.uploader.destroy(public_id)
-            if result.get('result') == 'ok':
-                self.logger.info(f"Successfully deleted file: {public_id}")
-            else:
-                self.logger.error(f"Failed to delete file: {public_id}")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            final_public_id = public_id or f"temp_{timestamp}"
+
+            result = self._upload(file, final_public_id)
+
+            secure_url = result.get("secure_url", "")
+            full_public_id = result.get("public_id", "")
+
+            self._schedule_deletion(full_public_id)
+
+            return secure_url, full_public_id
+
         except Exception as e:
-            self.logger.error(f"Error during scheduled deletion of {public_id}: {str(e)}")
+            name = file if isinstance(file, str) else getattr(file, "name", "<in-memory file>")
+            self.logger.error(f"Error uploading file {name}: {str(e)}")
+            return None
 
-    def upload_file(self, local_path: str, public_id: Optional[str] = None) -> Tuple[str, str]:
+    async def aupload_file(self, file: Union[str, BinaryIO], public_id: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Uploads without blocking the event loop; the blocking SDK call (and its
+        retries) run in a worker thread.
+        """
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             final_public_id = public_id or f"temp_{timestamp}"
 
-            result = cloudinary.uploader.upload(
-                local_path,
-                resource_type="raw",
-                public_id=final_public_id,
-                folder=self.config.upload_folder
-            )
+            result = await asyncio.to_thread(self._upload, file, final_public_id)
 
             secure_url = result.get("secure_url", "")
             full_public_id = result.get("public_id", "")
 
-            asyncio.create_task(
-                self._schedule_file_deletion(
-                    full_public_id,
-                    self.config.auto_delete_delay
-                )
-            )
+            self._schedule_deletion(full_public_id)
 
             return secure_url, full_public_id
 
         except Exception as e:
-            self.logger.error(f"Error uploading file {local_path}: {str(e)}")
+            name = file if isinstance(file, str) else getattr(file, "name", "<in-memory file>")
+            self.logger.error(f"Error uploading file {name}: {str(e)}")
             return None
+
+    async def aupload_files(self, files: List[Tuple[Union[str, BinaryIO], Optional[str]]]) -> List[Optional[Tuple[str, str]]]:
+        """
+        Uploads several (file, public_id) pairs with at most `max_concurrent_uploads`
+        in flight. Results are returned in input order (None for failed uploads).
+        """
+        semaphore = asyncio.Semaphore(max(1, self.config.max_concurrent_uploads))
+
+        async def run(file, public_id):
+            async with semaphore:
+                return await self.aupload_file(file, public_id)
+
+        return await asyncio.gather(*(run(file, public_id) for file, public_id in files))
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import threading
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain.chains import RetrievalQA
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.document_loaders import TextLoader
+from langchain_community.vectorstores import FAISS
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from utils.common.embedding_registry import EmbeddingRegistry
+from utils.common.index_store import FaissIndexStore
+from utils.common.pdf_parser_service import DocumentProcessor
+from utils.common.snapshots import current_snapshot, write_snapshot
+from utils.config import CORPUS_INDEX_DIR, EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL, require
+
+"""
+Gemini Corpus RAG Service
+
+This module provides retrieval augmented generation over a whole corpus of documents held in a single,
+incrementally maintained FAISS index.
+
+Unlike `GeminiRAGService`, which is bound to one text file, the corpus index can grow and shrink:
+adding a document embeds only that document's chunks, and removing one deletes only its chunks.
+Per-document chunk ids are tracked in a manifest stored next to the index.
+
+Classes:
+    - GeminiCorpusRAGService: Persistent multi-document RAG index queried with Gemini.
+
+Functions:
+    - add_document(path, save=False): Embeds and adds one text or PDF document (re-indexes it if its content
+      changed); pass `save=True` or call `save()` to persist.
+    - add_documents(paths): Adds several documents and saves the index once.
+    - remove_document(path, save=False): Deletes a document's chunks from the index.
+    - documents(): Lists the indexed documents with their chunk counts.
+    - save(): Atomically publishes the index and manifest as a new snapshot.
+    - get_answer(query, k): Answers a query using chunks retrieved from the whole corpus.
+
+Usage:
+    corpus = GeminiCorpusRAGService()
+    corpus.add_documents(["/path/to/notes.txt", "/path/to/chapter.pdf"])
+    reply = corpus.get_answer("Summarise the chapter on plate tectonics.")
+
+Notes:
+    - PDFs are streamed page by page through `DocumentProcessor.iter_chunks`; all other files are read as UTF-8 text.
+      Chunks are embedded and added to the index in batches of `EMBEDDING_BATCH_SIZE` as they are produced, so a
+      document's chunk list and vectors are never held in memory all at once.
+    - Documents are identified by absolute path; unchanged documents are skipped on re-add.
+    - Saving writes the whole index, so it is not done per document by default; batch adds with
+      `add_documents` (or several `add_document` calls followed by one `save()`).
+    - The index directory holds versioned snapshots behind a `CURRENT` pointer (see `utils.common.snapshots`),
+      so a concurrent load or a crash mid-save always finds a complete index.
+"""
+
+
+class GeminiCorpusRAGService:
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(
+            self,
+            index_dir: str = CORPUS_INDEX_DIR,
+            embedding_model: str = EMBEDDING_MODEL,
+            chunk_size: int = 1000,
+            chunk_overlap: int = 200
+    ):
+        os.environ["GOOGLE_API_KEY"] = require("GEMINI_API_KEY")
+
+        self.index_dir = index_dir
+        self.embedding_model = embedding_model
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+        self.embeddings = EmbeddingRegistry.get(self.embedding_model)
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        self.pdf_processor = DocumentProcessor(chunk_size=chunk_size, overlap=chunk_overlap)
+        self.llm = ChatGoogleGenerativeAI(
+            model="gemini-1.5-flash",
+            temperature=0.3
+        )
+
+        self._lock = threading.RLock()
+        self.db: Optional[FAISS] = None
+        self.manifest: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self) -> None:
+        snapshot = current_snapshot(self.index_dir, self.MANIFEST_FILE)
+        if snapshot is None:
+            return
+        manifest_path = os.path.join(snapshot, self.MANIFEST_FILE)
+
+        with open(manifest_path) as f:
+            stored = json.load(f)
+        settings = [self.embedding_model, self.chunk_size, self.chunk_overlap]
+        if stored.get("settings") != settings:
+            raise ValueError(
+                f"Corpus index at {self.index_dir} was built with {stored.get('settings')}, not {settings}"
+            )
+
+        self.manifest = stored.get("documents", {})
+        if self.manifest:
+            self.db = FAISS.load_local(snapshot, self.embeddings, allow_dangerous_deserialization=True)
+
+    @staticmethod
+    def document_id(path: str) -> str:
+        return os.path.abspath(path)
+
+    def _iter_chunks(self, path: str) -> Iterator[str]:
+        if os.path.splitext(path)[1].lower() == ".pdf":
+            texts = self.pdf_processor.iter_chunks(path)
+        else:
+            docs = TextLoader(path, encoding="utf-8").load()
+            texts = (chunk.page_content for chunk in self.text_splitter.split_documents(docs))
+        return (text for text in texts if text)
+
+    def add_document(self, path: str, save: bool = False) -> int:
+        """
+        Embeds and indexes one document, one batch of chunks at a time. Returns
+        the number of chunks added (0 when the same content is already indexed).
+        """
+        doc_id = self.document_id(path)
+        content_hash = FaissIndexStore.file_hash(path)
+
+        with self._lock:
+            existing = self.manifest.get(doc_id)
+            if existing and existing["content_hash"] == content_hash:
+                return 0
+
+        id_prefix = f"{hashlib.sha1(doc_id.encode('utf-8')).hexdigest()[:16]}:{content_hash[:16]}"
+        chunks = self._iter_chunks(path)
+        ids = []
+        try:
+            while True:
+                texts = list(islice(chunks, EMBEDDING_BATCH_SIZE))
+                if not texts:
+                    break
+                # Embedding runs outside the lock; only the index insert is serialised
+                vectors = self.embeddings.embed_documents(texts)
+                batch_ids = [f"{id_prefix}:{i}" for i in range(len(ids), len(ids) + len(texts))]
+                metadatas = [
+                    {"source": doc_id, "content_hash": content_hash, "chunk": i}
+                    for i in range(len(ids), len(ids) + len(texts))
+                ]
+                with self._lock:
+                    if not ids and doc_id in self.manifest:
+                        self.remove_document(path, save=False)
+                    if self.db is None:
+                        self.db = FAISS.from_embeddings(
+                            list(zip(texts, vectors)), self.embeddings, metadatas=metadatas, ids=batch_ids
+                        )
+                    else:
+                        self.db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=batch_ids)
+                    ids.extend(batch_ids)
+        except BaseException:
+            # Leave no half-indexed document behind
+            with self._lock:
+                if ids and self.db is not None:
+                    self.db.delete(ids)
+            raise
+
+        with self._lock:
+            if not ids and doc_id in self.manifest:
+                self.remove_document(path, save=False)
+            self.manifest[doc_id] = {"content_hash": content_hash, "chunk_ids": ids}
+            if save:
+                self.save()
+        return len(ids)
+
+    def add_documents(self, paths: Iterable[str]) -> Dict[str, int]:
+        added = {}
+        for path in paths:
+            added[path] = self.add_document(path, save=False)
+        self.save()
+        return added
+
+    def remove_document(self, path: str, save: bool = False) -> int:
+        """
+        Deletes a document's chunks from the index. Returns the number of chunks removed.
+        """
+        doc_id = self.document_id(path)
+        with self._lock:
+            entry = self.manifest.pop(doc_id, None)
+            if entry is None:
+                return 0
+
+            ids = entry["chunk_ids"]
+            if ids and self.db is not None:
+                self.db.delete(ids)
+            if save:
+                self.save()
+            return len(ids)
+
+    def documents(self) -> List[dict]:
+        with self._lock:
+            return [
+                {"source": doc_id, "chunks": len(entry["chunk_ids"])}
+                for doc_id, entry in self.manifest.items()
+            ]
+
+    def save(self) -> None:
+        def write(directory: str) -> None:
+            if self.db is not None:
+                self.db.save_local(directory)
+            with open(os.path.join(directory, self.MANIFEST_FILE), "w") as f:
+                json.dump({
+                    "settings": [self.embedding_model, self.chunk_size, self.chunk_overlap],
+                    "documents": self.manifest
+                }, f)
+
+        with self._lock:
+            write_snapshot(self.index_dir, write)
+
+    def get_answer(self, query: str, k: int = 4) -> str:
+        """
+        Get answer from RAG system for the provided query, searching the whole corpus.
+        """
+        with self._lock:
+            if self.db is None:
+                raise RuntimeError("The corpus index is empty; add documents first.")
+            retriever = self.db.as_retriever(search_kwargs={"k": k})
+
+        qa_chain = RetrievalQA.from_chain_type(
+            llm=self.llm,
+            chain_type="stuff",
+            retriever=retriever
+        )
+        result = qa_chain.invoke(query)
+        return result['result']
+
+
+__all__ = ["GeminiCorpusRAGService"]
@@ -1,64 +1,331 @@
 import sqlite3
 import os
+import threading
+import weakref
 
+from utils.common.metrics import metrics
 
-class ExamDataBaseService:
-    def __init__(self, db_name="question.db"):
+
+class _ConnectionHolder:
+    """
+    Thread-local owner of a connection; when its thread exits the holder is
+    released and a finalizer closes the connection.
+    """
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _release_connection(conn: sqlite3.Connection, connections: set, lock: threading.Lock) -> None:
+    with lock:
+        connections.discard(conn)
+    conn.close()
+
+
+class SQLiteDataBaseService:
+    """
+    Keeps one open connection per thread (WAL journaling, tuned pragmas)
+    instead of reconnecting on every call. Subclasses create their schema
+    in `create_tables`, which runs once before the first query. A thread's
+    connection is closed when the thread exits, so short-lived worker pools
+    do not leak handles.
+    """
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-16000",  # ~16 MB page cache
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
+
+    def __init__(self, db_name):
         self.project_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
         self.db_path = os.path.join(self.project_folder, db_name)
 
+        self._local = threading.local()
+        self._connections = set()
+        self._lock = threading.Lock()
+        self._schema_lock = threading.RLock()
+        self._schema_ready = False
+        self._creating_schema = False
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            holder = _ConnectionHolder(conn)
+            self._local.holder = holder
+            with self._lock:
+                self._connections.add(conn)
+            weakref.finalize(holder, _release_connection, conn, self._connections, self._lock)
+        conn = holder.conn
+
+        if not self._schema_ready:
+            # Other threads wait here; the creating thread re-enters via create_tables
+            with self._schema_lock:
+                if not self._schema_ready and not self._creating_schema:
+                    self._creating_schema = True
+                    try:
+                        self.create_tables()
+                        self._schema_ready = True
+                    finally:
+                        self._creating_schema = False
+        return conn
+
+    def create_tables(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class ExamDataBaseService(SQLiteDataBaseService):
+    def __init__(self, db_name="question.db"):
+        super().__init__(db_name)
+
+    def create_tables(self):
+        self.create_exam_table()
+
     def create_exam_table(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS exam_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                exam_file TEXT NOT NULL,
-                evaluation TEXT NOT NULL,
-                score INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        with self.connection as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS exam_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    exam_file TEXT NOT NULL,
+                    evaluation TEXT NOT NULL,
+                    score INTEGER,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_exam_results_file_timestamp ON exam_results (exam_file, timestamp)"
             )
-        ''')
-        conn.commit()
 
+    @metrics.timed_stage("db_write", table="exam_results")
     def store_exam_values(self, file_path, evaluation_result):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO exam_results (exam_file, evaluation, score) VALUES (?, ?, ?)",
-            (file_path, evaluation_result.get("evaluation", ""), evaluation_result.get("score"))
-        )
-        conn.commit()
+        with self.connection as conn:
+            conn.execute(
+                "INSERT INTO exam_results (exam_file, evaluation, score) VALUES (?, ?, ?)",
+                (file_path, evaluation_result.get("evaluation", ""), evaluation_result.get("score"))
+            )
+
+    @metrics.timed_stage("db_write", table="exam_results")
+    def store_exam_values_bulk(self, rows):
+        """
+        Stores many (file_path, evaluation_result) pairs in one transaction.
+        """
+        with self.connection as conn:
+            conn.executemany(
+                "INSERT INTO exam_results (exam_file, evaluation, score) VALUES (?, ?, ?)",
+                [(file_path, result.get("evaluation", ""), result.get("score")) for file_path, result in rows]
+            )
+
+    @metrics.timed_stage("db_read", table="exam_results")
+    def get_exam_results(self, file_path):
+        """
+        Returns (evaluation, score, timestamp) rows for one exam file, newest first.
+        """
+        return self.connection.execute(
+            "SELECT evaluation, score, timestamp FROM exam_results WHERE exam_file = ? ORDER BY timestamp DESC",
+            (file_path,)
+        ).fetchall()
 
 
-class NoteDataBaseService:
+class NoteDataBaseService(SQLiteDataBaseService):
     def __init__(self, db_name="notes.db"):
-        self.project_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
-        self.db_path = os.path.join(self.project_folder, db_name)
+        super().__init__(db_name)
+
+    def create_tables(self):
+        self.create_note_table()
+        self.create_checkpoint_table()
 
     def create_note_table(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.connection as conn:
+            conn.execute('''
+                    CREATE TABLE IF NOT EXISTS bullet_points (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        topic TEXT NOT NULL,
+                        point TEXT NOT NULL,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        file_path TEXT
+                    )
+                ''')
+            # Tables created before points were tied to their source document
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(bullet_points)")}
+            if "file_path" not in columns:
+                conn.execute("ALTER TABLE bullet_points ADD COLUMN file_path TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bullet_points_topic ON bullet_points (topic)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bullet_points_file_path ON bullet_points (file_path)")
 
-        cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bullet_points (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    topic TEXT NOT NULL,
-                    point TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    @metrics.timed_stage("db_write", table="bullet_points")
+    def store_note_values(self, topic, point):
+        with self.connection as conn:
+            conn.execute(
+                "INSERT INTO bullet_points (topic, point) VALUES (?, ?)",
+                (topic, point)
+            )
+
+    @metrics.timed_stage("db_write", table="bullet_points")
+    def store_note_values_bulk(self, topic, points):
+        """
+        Stores all bullet points of one note in a single transaction.
+        """
+        with self.connection as conn:
+            conn.executemany(
+                "INSERT INTO bullet_points (topic, point) VALUES (?, ?)",
+                [(topic, point) for point in points]
+            )
+
+    @metrics.timed_stage("db_read", table="bullet_points")
+    def get_notes(self, topic):
+        return [
+            row[0] for row in self.connection.execute(
+                "SELECT point FROM bullet_points WHERE topic = ? ORDER BY id",
+                (topic,)
+            )
+        ]
+
+    @metrics.timed_stage("db_read", table="bullet_points")
+    def get_document_notes(self, file_path):
+        return [
+            row[0] for row in self.connection.execute(
+                "SELECT point FROM bullet_points WHERE file_path = ? ORDER BY id",
+                (file_path,)
+            )
+        ]
+
+    def create_checkpoint_table(self):
+        with self.connection as conn:
+            conn.execute('''
+                    CREATE TABLE IF NOT EXISTS note_checkpoints (
+                        file_path TEXT PRIMARY KEY,
+                        content_hash TEXT NOT NULL,
+                        topic TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        points INTEGER NOT NULL DEFAULT 0,
+                        error TEXT,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+
+    @metrics.timed_stage("db_read", table="note_checkpoints")
+    def get_checkpoints(self):
+        """
+        Returns {file_path: (content_hash, status)} for every document seen so far.
+        """
+        return {
+            row[0]: (row[1], row[2]) for row in self.connection.execute(
+                "SELECT file_path, content_hash, status FROM note_checkpoints"
+            )
+        }
+
+    @metrics.timed_stage("db_write", table="bullet_points")
+    def store_notes_checkpointed(self, file_path, content_hash, topic, points):
+        """
+        Stores one document's bullet points and marks it done in the same
+        transaction, so an interrupted run never leaves half-stored notes.
+        Earlier points of the same document (a changed or retried file) are
+        replaced; points of other documents with the same topic are kept.
+        """
+        with self.connection as conn:
+            conn.execute("DELETE FROM bullet_points WHERE file_path = ?", (file_path,))
+            conn.executemany(
+                "INSERT INTO bullet_points (topic, point, file_path) VALUES (?, ?, ?)",
+                [(topic, point, file_path) for point in points]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO note_checkpoints (file_path, content_hash, topic, status, points, error) "
+                "VALUES (?, ?, ?, 'done', ?, NULL)",
+                (file_path, content_hash, topic, len(points))
+            )
+
+    @metrics.timed_stage("db_write", table="note_checkpoints")
+    def mark_note_failed(self, file_path, content_hash, topic, error):
+        with self.connection as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO note_checkpoints (file_path, content_hash, topic, status, points, error) "
+                "VALUES (?, ?, ?, 'failed', 0, ?)",
+                (file_path, content_hash, topic, error)
+            )
+
+
+class AssetExpiryDataBaseService(SQLiteDataBaseService):
+    """
+    Durable queue of hosted assets and the time (unix seconds) after which
+    they should be deleted. Survives restarts, unlike in-process timers.
+    """
+    def __init__(self, db_name="assets.db"):
+        super().__init__(db_name)
+
+    def create_tables(self):
+        self.create_expiry_table()
+
+    def create_expiry_table(self):
+        with self.connection as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS asset_expiry (
+                    public_id TEXT PRIMARY KEY,
+                    resource_type TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0
                 )
             ''')
-        conn.commit()
+            # Tables created before rejected deletions were counted
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(asset_expiry)")}
+            if "attempts" not in columns:
+                conn.execute("ALTER TABLE asset_expiry ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_asset_expiry_expires_at ON asset_expiry (expires_at)")
 
+    @metrics.timed_stage("db_write", table="asset_expiry")
+    def schedule_expiry(self, public_id, expires_at, resource_type="raw"):
+        with self.connection as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO asset_expiry (public_id, resource_type, expires_at, attempts) VALUES (?, ?, ?, 0)",
+                (public_id, resource_type, expires_at)
+            )
 
-    def store_note_values(self,topic,point):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO bullet_points (topic, point) VALUES (?, ?)",
-            (topic, point)
-        )
-        conn.commit()
+    @metrics.timed_stage("db_read", table="asset_expiry")
+    def get_due_assets(self, now, limit=1000):
+        """
+        Returns (public_id, resource_type) rows whose expiry has passed, oldest first.
+        """
+        return self.connection.execute(
+            "SELECT public_id, resource_type FROM asset_expiry WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+            (now, limit)
+        ).fetchall()
 
+    @metrics.timed_stage("db_write", table="asset_expiry")
+    def remove_assets(self, public_ids):
+        with self.connection as conn:
+            conn.executemany(
+                "DELETE FROM asset_expiry WHERE public_id = ?",
+                [(public_id,) for public_id in public_ids]
+            )
 
+    @metrics.timed_stage("db_write", table="asset_expiry")
+    def record_failures(self, public_ids, max_attempts):
+        """
+        Counts one more rejected deletion for each asset and drops the assets that
+        have now failed `max_attempts` times. Returns the dropped public ids.
+        """
+        dropped = []
+        with self.connection as conn:
+            for public_id in public_ids:
+                conn.execute("UPDATE asset_expiry SET attempts = attempts + 1 WHERE public_id = ?", (public_id,))
+                row = conn.execute("SELECT attempts FROM asset_expiry WHERE public_id = ?", (public_id,)).fetchone()
+                if row is not None and row[0] >= max_attempts:
+                    conn.execute("DELETE FROM asset_expiry WHERE public_id = ?", (public_id,))
+                    dropped.append(public_id)
+        return dropped
 
+    def pending_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM asset_expiry").fetchone()[0]
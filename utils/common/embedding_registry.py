@@ -0,0 +1,76 @@
+import threading
+from typing import Dict, Iterable
+
+from utils.config import EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL, EMBEDDING_NUM_THREADS
+
+"""
+Shared Embedding Model Registry
+
+This module keeps one lazily loaded HuggingFace embedding model per model name for the whole process,
+so every RAG instance (and any other embedder) reuses the same sentence-transformers weights instead
+of loading its own copy.
+
+Classes:
+    - EmbeddingRegistry: Process-wide, thread-safe cache of `HuggingFaceEmbeddings` instances.
+
+Functions:
+    - get(model_name): Returns the shared embeddings for `model_name`, loading it on first use.
+    - warm_up(model_names): Loads models and runs one encode ahead of time (e.g. at server startup).
+    - loaded_models(): Names of the models currently held in memory.
+
+Configuration:
+    - EMBEDDING_MODEL: default model name (sentence-transformers/all-MiniLM-L6-v2).
+    - EMBEDDING_BATCH_SIZE: batch size passed to `encode`.
+    - EMBEDDING_NUM_THREADS: torch intra-op thread limit (0 leaves the torch default).
+
+Usage:
+    embeddings = EmbeddingRegistry.get()
+    vectors = embeddings.embed_documents(["first chunk", "second chunk"])
+"""
+
+
+class EmbeddingRegistry:
+    _models: Dict[str, object] = {}
+    _lock = threading.Lock()
+    _threads_configured = False
+
+    @classmethod
+    def _configure_threads(cls) -> None:
+        if cls._threads_configured:
+            return
+        if EMBEDDING_NUM_THREADS > 0:
+            import torch
+            torch.set_num_threads(EMBEDDING_NUM_THREADS)
+        cls._threads_configured = True
+
+    @classmethod
+    def get(cls, model_name: str = EMBEDDING_MODEL):
+        model = cls._models.get(model_name)
+        if model is not None:
+            return model
+
+        with cls._lock:
+            model = cls._models.get(model_name)
+            if model is None:
+                # Deferred so importing the RAG layer does not pull in torch / transformers
+                from langchain_huggingface import HuggingFaceEmbeddings
+
+                cls._configure_threads()
+                model = HuggingFaceEmbeddings(
+                    model_name=model_name,
+                    encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE}
+                )
+                cls._models[model_name] = model
+        return model
+
+    @classmethod
+    def warm_up(cls, model_names: Iterable[str] = (EMBEDDING_MODEL,)) -> None:
+        for model_name in model_names:
+            cls.get(model_name).embed_query("warm up")
+
+    @classmethod
+    def loaded_models(cls) -> list:
+        return list(cls._models)
+
+
+__all__ = ["EmbeddingRegistry"]
@@ -1,53 +1,308 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+import httpx
 from google import genai
-from utils.config import GEMINI_API_KEY
+from google.genai import errors
+from utils.common.metrics import metrics
+from utils.common.rate_limiter import TokenBucket
+from utils.common.response_cache import ResponseCache
+from utils.config import (
+    GEMINI_BACKOFF_BASE,
+    GEMINI_CACHE_ENABLED,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MAX_RETRIES,
+    GEMINI_REQUESTS_PER_MINUTE,
+    require
+)
 
 """
 Gemini Language Model Service
 
 This module provides an interface to Google's Gemini API for generating natural language responses.
 
-The `GeminiService` class initializes a Gemini client using an API key and provides a method to interact with the model.
+The `GeminiService` class initializes a Gemini client using an API key and provides synchronous, async
+and batched methods to interact with the model.
 
 Classes:
     - GeminiService: Wrapper around the Google Gemini API for prompt-based text generation.
 
 Functions:
-    - __init__(): Initializes the Gemini API client using the provided API key from config.
-    - get_response(prompt, model): Sends a prompt to the Gemini model and returns the generated response text.
+    - __init__(cache, limiter): Initializes the Gemini API client using the provided API key from config.
+    - get_response(prompt, model, config, bypass_cache): Sends a prompt to the Gemini model and returns the generated response text.
+    - aget_response(prompt, model, config, bypass_cache): Async variant of `get_response`.
+    - stream_response(prompt, model, config, bypass_cache): Yields the response text chunk by chunk as it is generated.
+    - abatch_get_responses(prompts, model, config, max_concurrency, return_exceptions): Runs many prompts
+      concurrently and returns their responses in input order.
+    - batch_get_responses(...): Blocking wrapper around `abatch_get_responses`; runs the batch on the
+      service's background event loop.
 
 Usage:
     service = GeminiService()
     reply = service.get_response("Explain how transformers work.")
+    replies = service.batch_get_responses(["Define entropy.", "Define enthalpy."])
 
 Parameters:
     - prompt (str): The input text or query to send to the Gemini model.
     - model (str): Optional. The Gemini model version to use (default: "gemini-2.0-flash").
+    - config: Optional. Generation config passed through to the API; part of the cache key.
+    - bypass_cache (bool): Optional. Skip the cache lookup and refresh the stored answer.
 
 Returns:
     - str: The cleaned textual response generated by the Gemini model.
 
 Raises:
-    - RuntimeError: If any exception occurs during API communication.
+    - RuntimeError: If the API call still fails after retries (or fails with a non-retryable error).
 
 Configuration:
     The API key must be provided via `GEMINI_API_KEY` in the config module (`utils.config`).
+    Set `GEMINI_CACHE_ENABLED=1` to serve repeated (model, prompt, config) requests from the
+    persistent `ResponseCache`; `cache.stats()` reports the hit rate.
+    All calls in the process share a token bucket sized by `GEMINI_REQUESTS_PER_MINUTE`. Rate-limit (429),
+    server (5xx) and transport errors are retried up to `GEMINI_MAX_RETRIES` times with exponential
+    backoff plus jitter; batches run at most `GEMINI_MAX_CONCURRENCY` requests at once.
 
 Note:
+    - The async client's HTTP session is bound to the loop it was first used on, so every `client.aio` call
+      runs on one long-lived background loop owned by the service; coroutines awaited from other loops are
+      handed over to it. Response cache reads and writes run in worker threads, off the event loop.
     - This implementation assumes basic usage with a single-turn prompt.
     - Extend `get_response` if multi-turn conversational behavior is required.
+    - Every API call is timed as an `llm` span; requests, retries, cache hits and token usage
+      (from `usage_metadata`) are counted in `utils.common.metrics`.
 """
 
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_default_limiter = TokenBucket(GEMINI_REQUESTS_PER_MINUTE)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def _backoff_delay(attempt: int) -> float:
+    return GEMINI_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, GEMINI_BACKOFF_BASE)
+
 
 class GeminiService:
-    def __init__(self):
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
-
-    def get_response(self, prompt: str, model: str = "gemini-2.0-flash") -> str:
-        try:
-            response = self.client.models.generate_content(
-                model=model,
-                contents=prompt
-            )
-            return response.text.strip()
-        except Exception as e:
-            raise RuntimeError(f"Gemini API error: {e}")
+    def __init__(
+            self,
+            cache: Optional[ResponseCache] = None,
+            limiter: Optional[TokenBucket] = None,
+            client: Any = None
+    ):
+        # `client` lets callers supply any object with the genai.Client `models` / `aio.models` interface
+        self.client = client or genai.Client(api_key=require("GEMINI_API_KEY"))
+        if cache is None and GEMINI_CACHE_ENABLED:
+            cache = ResponseCache()
+        self.cache = cache
+        self.limiter = limiter or _default_limiter
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+    def _aio_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Returns the background event loop all `client.aio` calls run on, starting it on first use.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=loop.run_forever, name="gemini-aio", daemon=True)
+                self._loop_thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def _on_aio_loop(self, coro):
+        loop = self._aio_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def _cached(self, prompt: str, model: str, config: Any, bypass_cache: bool):
+        """
+        Returns (cache_key, cached_text); both are None when caching is off.
+        """
+        if self.cache is None:
+            return None, None
+        cache_key = self.cache.make_key(model, prompt, config)
+        if bypass_cache:
+            return cache_key, None
+        cached = self.cache.get(cache_key)
+        metrics.inc("gemini_cache_total", result="miss" if cached is None else "hit")
+        return cache_key, cached
+
+    @staticmethod
+    def _record_failure(error: Exception, model: str, attempt: int) -> bool:
+        """
+        Counts a failed attempt and returns True when it should be retried.
+        """
+        retry = _is_retryable(error) and attempt < GEMINI_MAX_RETRIES
+        if retry:
+            metrics.inc("gemini_retries_total", model=model)
+        else:
+            metrics.inc("gemini_requests_total", model=model, status="error")
+        return retry
+
+    @staticmethod
+    def _record_success(response: Any, model: str) -> None:
+        metrics.inc("gemini_requests_total", model=model, status="ok")
+        metrics.record_token_usage(getattr(response, "usage_metadata", None), model)
+
+    def _generate(self, prompt: str, model: str, config: Any) -> str:
+        with metrics.span("llm", model=model):
+            for attempt in range(GEMINI_MAX_RETRIES + 1):
+                self.limiter.acquire()
+                try:
+                    response = self.client.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=config
+                    )
+                    self._record_success(response, model)
+                    return response.text.strip()
+                except Exception as e:
+                    if not self._record_failure(e, model, attempt):
+                        raise RuntimeError(f"Gemini API error: {e}")
+                    time.sleep(_backoff_delay(attempt))
+
+    async def _agenerate(self, prompt: str, model: str, config: Any) -> str:
+        with metrics.span("llm", model=model):
+            for attempt in range(GEMINI_MAX_RETRIES + 1):
+                await self.limiter.aacquire()
+                try:
+                    response = await self.client.aio.models.generate_content(
+                        model=model,
+                        contents=prompt,
+                        config=config
+                    )
+                    self._record_success(response, model)
+                    return response.text.strip()
+                except Exception as e:
+                    if not self._record_failure(e, model, attempt):
+                        raise RuntimeError(f"Gemini API error: {e}")
+                    await asyncio.sleep(_backoff_delay(attempt))
+
+    def get_response(
+            self,
+            prompt: str,
+            model: str = "gemini-2.0-flash",
+            config: Any = None,
+            bypass_cache: bool = False
+    ) -> str:
+        cache_key, cached = self._cached(prompt, model, config, bypass_cache)
+        if cached is not None:
+            return cached
+
+        text = self._generate(prompt, model, config)
+
+        if cache_key is not None:
+            self.cache.set(cache_key, model, text)
+        return text
+
+    async def aget_response(
+            self,
+            prompt: str,
+            model: str = "gemini-2.0-flash",
+            config: Any = None,
+            bypass_cache: bool = False
+    ) -> str:
+        cache_key, cached = await asyncio.to_thread(self._cached, prompt, model, config, bypass_cache)
+        if cached is not None:
+            return cached
+
+        text = await self._on_aio_loop(self._agenerate(prompt, model, config))
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.set, cache_key, model, text)
+        return text
+
+    def stream_response(
+            self,
+            prompt: str,
+            model: str = "gemini-2.0-flash",
+            config: Any = None,
+            bypass_cache: bool = False
+    ) -> Iterator[str]:
+        """
+        Yields the response text in chunks as Gemini generates it. A cached
+        answer is yielded as a single chunk; a completed stream is cached.
+        """
+        cache_key, cached = self._cached(prompt, model, config, bypass_cache)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        with metrics.span("llm", model=model, streaming=True):
+            for attempt in range(GEMINI_MAX_RETRIES + 1):
+                self.limiter.acquire()
+                usage = None
+                try:
+                    for chunk in self.client.models.generate_content_stream(
+                            model=model,
+                            contents=prompt,
+                            config=config
+                    ):
+                        # The last chunk carries the totals for the whole response
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        text = chunk.text or ""
+                        if text:
+                            parts.append(text)
+                            yield text
+                    metrics.inc("gemini_requests_total", model=model, status="ok")
+                    metrics.record_token_usage(usage, model)
+                    break
+                except Exception as e:
+                    # Only retry while nothing has been handed to the caller yet
+                    if parts or not self._record_failure(e, model, attempt):
+                        if parts:
+                            metrics.inc("gemini_requests_total", model=model, status="error")
+                        raise RuntimeError(f"Gemini API error: {e}")
+                    time.sleep(_backoff_delay(attempt))
+
+        if cache_key is not None:
+            self.cache.set(cache_key, model, "".join(parts).strip())
+
+    async def abatch_get_responses(
+            self,
+            prompts: List[str],
+            model: str = "gemini-2.0-flash",
+            config: Any = None,
+            max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+            return_exceptions: bool = False
+    ) -> List[Any]:
+        """
+        Runs all prompts with at most `max_concurrency` in flight and returns the
+        responses in input order. With `return_exceptions=True` a failed prompt
+        yields its RuntimeError in place instead of failing the whole batch.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(prompt: str) -> str:
+            async with semaphore:
+                return await self.aget_response(prompt, model=model, config=config)
+
+        return await asyncio.gather(*(run(p) for p in prompts), return_exceptions=return_exceptions)
+
+    def batch_get_responses(
+            self,
+            prompts: List[str],
+            model: str = "gemini-2.0-flash",
+            config: Any = None,
+            max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+            return_exceptions: bool = False
+    ) -> List[Any]:
+        loop = self._aio_loop()
+        if threading.current_thread() is self._loop_thread:
+            raise RuntimeError("batch_get_responses would block the Gemini event loop; await abatch_get_responses")
+
+        # Works from plain threads and from inside other event loops alike, without creating a new loop
+        coro = self.abatch_get_responses(prompts, model, config, max_concurrency, return_exceptions)
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
@@ -0,0 +1,118 @@
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+from utils.config import IMPORT_BUDGET_MS
+
+"""
+Import-Time Budget
+
+This module measures the cold-start import time of a module in a fresh interpreter (`python -X importtime`)
+and checks it against a budget, so regressions such as a heavy SDK imported at module level are caught early.
+
+Functions:
+    - measure_import(module, runs): Imports `module` in `runs` fresh interpreters and returns the fastest
+      run as {"module", "total_ms", "slowest": [(name, cumulative_ms), ...]}.
+    - check_import_budget(module, budget_ms, runs): Returns (within_budget, measurement).
+    - main(argv): Command line entry point; exits with status 1 when any module is over budget.
+
+Usage:
+    python -m utils.common.import_budget agents.agent agents.presentation_agent --budget-ms 1500
+
+Notes:
+    - Runs are executed from the repository root, so the same `.env` and package layout as the app are used.
+    - The fastest of several runs is reported to reduce noise from disk caches and other processes.
+"""
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def _parse_importtime(stderr: str) -> List[tuple]:
+    """
+    Parses `-X importtime` lines ("import time: self [us] | cumulative | imported package")
+    into (module, self_us, cumulative_us) tuples.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return rows
+
+
+def measure_import(module: str, runs: int = 3, top: int = 10) -> dict:
+    best = None
+    for _ in range(max(1, runs)):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True
+        )
+        if completed.returncode != 0:
+            tail = "\n".join(line for line in completed.stderr.splitlines() if not line.startswith("import time:"))
+            raise RuntimeError(f"Importing {module} failed:\n{tail[-2000:]}")
+
+        rows = _parse_importtime(completed.stderr)
+        total_us = next((cumulative for name, _, cumulative in reversed(rows) if name == module), None)
+        if total_us is None:
+            total_us = sum(self_us for _, self_us, _ in rows)
+        if best is None or total_us < best[0]:
+            best = (total_us, rows)
+
+    total_us, rows = best
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)
+    # Skip the measured module itself and its parent packages, which only repeat the total
+    slowest = [
+        (name, cumulative / 1000) for name, _, cumulative in slowest
+        if name != module and not module.startswith(name + ".")
+    ]
+    return {
+        "module": module,
+        "total_ms": total_us / 1000,
+        "slowest": slowest[:top]
+    }
+
+
+def check_import_budget(module: str, budget_ms: float = IMPORT_BUDGET_MS, runs: int = 3):
+    measurement = measure_import(module, runs)
+    return measurement["total_ms"] <= budget_ms, measurement
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check cold-start import time against a budget.")
+    parser.add_argument("modules", nargs="*", default=["agents.agent"])
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    over_budget = False
+    for module in args.modules:
+        try:
+            measurement = measure_import(module, args.runs, args.top)
+        except RuntimeError as e:
+            print(e)
+            over_budget = True
+            continue
+
+        within = measurement["total_ms"] <= args.budget_ms
+        over_budget = over_budget or not within
+        status = "OK" if within else "OVER BUDGET"
+        print(f"{module}: {measurement['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms) {status}")
+        for name, cumulative_ms in measurement["slowest"]:
+            print(f"    {cumulative_ms:9.1f} ms  {name}")
+
+    return 1 if over_budget else 0
+
+
+__all__ = ["check_import_budget", "measure_import", "main"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from langchain_community.vectorstores import FAISS
+
+from utils.config import FAISS_INDEX_DIR, FAISS_INDEX_MAX_ENTRIES
+
+"""
+FAISS Index Store
+
+This module persists FAISS vector stores on disk so documents that were already embedded can be
+queried again without re-splitting or re-embedding them.
+
+Each index lives in its own directory named after a key derived from
+(document content hash, embedding model, chunk_size, chunk_overlap), so any change to the file or
+to the chunking / embedding parameters resolves to a different index.
+
+Classes:
+    - FaissIndexStore: Loads, saves and prunes persisted FAISS indexes.
+
+Functions:
+    - file_hash(path): SHA-256 of a file's contents, read in blocks.
+    - key_for(content_hash, embedding_model, chunk_size, chunk_overlap): Builds the index key.
+    - load(key, embeddings): Returns the stored FAISS index, or None when it does not exist.
+    - save(key, db, source): Atomically persists an index and drops stale indexes of the same source.
+
+Notes:
+    - Indexes are written to a temp directory and renamed into place, so readers never load a
+      half-written index.
+    - Only indexes written by this store are loaded (`allow_dangerous_deserialization` is required
+      by LangChain for the pickled docstore).
+"""
+
+
+class FaissIndexStore:
+    META_FILE = "source.json"
+
+    def __init__(self, root: str = FAISS_INDEX_DIR, max_indexes: int = FAISS_INDEX_MAX_ENTRIES):
+        self.root = root
+        self.max_indexes = max_indexes
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key_for(content_hash: str, embedding_model: str, chunk_size: int, chunk_overlap: int) -> str:
+        payload = json.dumps([content_hash, embedding_model, chunk_size, chunk_overlap])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def load(self, key: str, embeddings) -> Optional[FAISS]:
+        path = self.path_for(key)
+        if not os.path.isdir(path):
+            return None
+
+        try:
+            db = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        except Exception as e:
+            print(f"Discarding unreadable index {key}: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        os.utime(path)  # mark as recently used
+        return db
+
+    def save(self, key: str, db: FAISS, source: Optional[str] = None) -> str:
+        path = self.path_for(key)
+        tmp_path = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+        try:
+            db.save_local(tmp_path)
+            with open(os.path.join(tmp_path, self.META_FILE), "w") as f:
+                json.dump({"source": os.path.abspath(source) if source else None}, f)
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process saved the same index first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+
+        self._prune(keep=key, source=source)
+        return path
+
+    def _source_of(self, path: str) -> Optional[str]:
+        try:
+            with open(os.path.join(path, self.META_FILE)) as f:
+                return json.load(f).get("source")
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self, keep: str, source: Optional[str]) -> None:
+        source = os.path.abspath(source) if source else None
+        indexes = []
+        for name in os.listdir(self.root):
+            path = self.path_for(name)
+            if name.startswith(".") or name == keep or not os.path.isdir(path):
+                continue
+            if source and self._source_of(path) == source:
+                # An older version of the same document
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            indexes.append((os.path.getmtime(path), path))
+
+        excess = len(indexes) + 1 - self.max_indexes
+        for _, path in sorted(indexes)[:max(0, excess)]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+__all__ = ["FaissIndexStore"]
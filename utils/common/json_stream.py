@@ -0,0 +1,80 @@
+import json
+from typing import Any, Iterable, Iterator, List
+
+"""
+Incremental JSON Array Parser
+
+This module parses a JSON array that arrives in arbitrary text chunks (e.g. a streamed LLM response)
+and yields each top-level element as soon as it is complete.
+
+Anything before the opening `[` (such as a ```json fence) and after the closing `]` is ignored.
+
+Classes:
+    - JSONArrayStreamParser: Push-style parser; `feed(chunk)` returns the elements completed by that chunk.
+
+Functions:
+    - iter_json_array(chunks): Pull-style wrapper yielding elements from an iterable of text chunks.
+
+Usage:
+    for slide in iter_json_array(gemini.stream_response(prompt)):
+        handle(slide)
+
+Note:
+    - Elements are expected to be objects, arrays or strings; bare numbers at the end of a chunk
+      could be emitted before all of their digits have arrived.
+"""
+
+
+class JSONArrayStreamParser:
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self.started = False
+        self.finished = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        if self.finished:
+            return []
+
+        self._buffer += chunk
+        if not self.started:
+            start = self._buffer.find("[")
+            if start < 0:
+                self._buffer = ""
+                return []
+            self._buffer = self._buffer[start + 1:]
+            self.started = True
+
+        items = []
+        while True:
+            rest = self._buffer.lstrip(" \t\r\n,")
+            if not rest:
+                self._buffer = ""
+                break
+            if rest[0] == "]":
+                self._buffer = ""
+                self.finished = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(rest)
+            except json.JSONDecodeError:
+                self._buffer = rest  # element not complete yet
+                break
+            items.append(item)
+            self._buffer = rest[end:]
+        return items
+
+
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    parser = JSONArrayStreamParser()
+    # Keep draining after the closing bracket so the producer can finish (e.g. cache the response)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+    if not parser.started:
+        raise ValueError("Response did not contain a JSON array")
+    if not parser.finished:
+        raise ValueError("Response ended before the JSON array was closed")
+
+
+__all__ = ["JSONArrayStreamParser", "iter_json_array"]
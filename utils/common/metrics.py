@@ -0,0 +1,276 @@
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+"""
+Metrics and Timing Spans
+
+This module is the instrumentation surface shared by all services: timing spans around pipeline stages,
+counters for retries / failures / cache hits / tokens, and histograms of stage durations.
+
+Metrics are kept in memory and can be exported in the Prometheus text exposition format (for scraping) or as
+a JSON snapshot. Every finished span is also emitted as a structured JSON log record on the
+`brainbox.metrics` logger.
+
+Classes:
+    - MetricsRegistry: Thread-safe store of labelled counters and histograms.
+    - JsonFormatter: logging.Formatter rendering records (and their `fields`) as one JSON object per line.
+
+Functions:
+    - inc(name, value=1, **labels): Increments a counter.
+    - observe(name, value, **labels): Records a histogram sample.
+    - span(stage, **labels): Context manager timing one stage; failures are counted and re-raised.
+    - timed_stage(stage, **labels): Decorator wrapping a sync, async or generator function in a span.
+    - record_token_usage(usage_metadata, model): Adds Gemini prompt / output token counts.
+    - render_prometheus(): Returns all metrics in the Prometheus text format.
+    - snapshot(): Returns all metrics as a JSON-serializable dict.
+    - serve(port): Serves `render_prometheus()` on http://0.0.0.0:<port>/metrics from a daemon thread.
+    - configure_json_logging(level): Sends span logs to stderr as JSON lines.
+
+Metrics:
+    - stage_duration_seconds{stage,...}     histogram of span durations
+    - stage_failures_total{stage,...}       spans that raised
+    - gemini_requests_total{model,status}, gemini_retries_total{model}, gemini_cache_total{result}
+    - gemini_prompt_tokens_total{model}, gemini_output_tokens_total{model}
+    - image_fetch_retries_total, image_cache_total{result}, image_library_total{result}
+    - upload_retries_total, upload_bytes_total, expired_assets_deleted_total,
+      expired_assets_dropped_total
+    - notes_documents_total{status}
+
+Usage:
+    from utils.common.metrics import metrics
+
+    with metrics.span("render", slides=len(slides)):
+        ...
+    print(metrics.render_prometheus())
+
+Notes:
+    - Spans nest freely; each records its own duration, so a deck's end-to-end span can be compared with its
+      llm / image / render / upload spans.
+"""
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+logger = logging.getLogger("brainbox.metrics")
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException as e:
+            if not isinstance(e, GeneratorExit):
+                status = "error"
+                self.inc("stage_failures_total", stage=stage, **labels)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe("stage_duration_seconds", duration, stage=stage, **labels)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("span", extra={"fields": {
+                    "event": "span",
+                    "stage": stage,
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 2),
+                    **labels
+                }})
+
+    def timed_stage(self, stage: str, **labels):
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(stage, **labels):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            if inspect.isgeneratorfunction(fn):
+                @functools.wraps(fn)
+                def generator_wrapper(*args, **kwargs):
+                    with self.span(stage, **labels):
+                        yield from fn(*args, **kwargs)
+                return generator_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, **labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_token_usage(self, usage_metadata: Any, model: str) -> None:
+        if usage_metadata is None:
+            return
+        prompt_tokens = getattr(usage_metadata, "prompt_token_count", None) or 0
+        output_tokens = getattr(usage_metadata, "candidates_token_count", None) or 0
+        if prompt_tokens:
+            self.inc("gemini_prompt_tokens_total", prompt_tokens, model=model)
+        if output_tokens:
+            self.inc("gemini_output_tokens_total", output_tokens, model=model)
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.sum, h.count) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        lines = []
+        for name in sorted(counters):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+        for name in sorted(histograms):
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": h.count,
+                        "sum": round(h.sum, 6),
+                        "mean": round(h.sum / h.count, 6) if h.count else 0.0,
+                        "buckets": dict(zip([*map(str, self.buckets), "+Inf"], h.counts))
+                    }
+                    for key, h in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """
+        Starts a background HTTP endpoint exposing `/metrics` for scraping.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        with self._lock:
+            if self._server is None:
+                self._server = ThreadingHTTPServer((host, port), Handler)
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            return self._server
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_json_logging(level: int = logging.INFO) -> logging.Handler:
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return handler
+
+
+metrics = MetricsRegistry()
+
+__all__ = ["JsonFormatter", "MetricsRegistry", "configure_json_logging", "metrics"]
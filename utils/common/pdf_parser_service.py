@@ -1,12 +1,10 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-import pandas as pd
 import re
+from typing import Iterable, Iterator
 
 """
 DocumentParser Class:
 
-This class provides functionality to parse a PDF document and divide its content into manageable chunks for further processing. 
+This class provides functionality to parse a PDF document and divide its content into manageable chunks for further processing.
 It uses the RecursiveCharacterTextSplitter from LangChain and the PyPDFLoader for loading and processing the PDF.
 
 Attributes:
@@ -18,17 +16,34 @@ Methods:
     pdf_loader(path):
         Loads the content of the PDF file from the specified path and returns the combined text.
 
-    clean_text(texts):
-        Clean the texts using regex
+    iter_pages(path):
+        Lazily yields the text of each PDF page.
+
+    iter_chunks(path):
+        Streams cleaned chunks page by page. Only the current page and the unfinished tail chunk
+        of the previous page are held in memory, so memory stays flat regardless of page count.
+
+    clean_chunk(text) / clean_text(texts):
+        Clean one chunk / a list of chunks using precompiled regex patterns
 
     chunk_creator():
         Divides the loaded document text into chunks based on the class's chunk size and overlap.
 
+    to_dataframe(chunks):
+        Optional sink collecting any chunk iterable into a pandas DataFrame.
+
+Notes:
+    LangChain is imported when a processor is created or a PDF is loaded, not when this module is imported.
+
 Usage:
-    Create an instance of the class with appropriate parameters and call the `chunkCreator` method to parse and divide a PDF into chunks.
+    Create an instance of the class with appropriate parameters and call `iter_chunks` to consume chunks lazily
+    (e.g. straight into an embedder), or `chunk_creator` / `to_dataframe` when a DataFrame is needed.
 
 """
 
+NON_ALPHANUMERIC = re.compile(r"[^a-zA-Z0-9\s]")
+WHITESPACE = re.compile(r"\s+")
+
 
 class DocumentProcessor:
     def __init__(
@@ -39,8 +54,16 @@ class DocumentProcessor:
         self.chunk_size = chunk_size
         self.overlap = overlap
 
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.overlap,
+            length_function=len,
+        )
+
     @staticmethod
     async def pdf_loader(file_path):
+        from langchain_community.document_loaders import PyPDFLoader
         try:
             loader = PyPDFLoader(file_path)
             pages = []
@@ -54,31 +77,64 @@ class DocumentProcessor:
         except Exception as e:
             raise RuntimeError(f"An error occurred while loading the document: {e}")
 
+    @staticmethod
+    def iter_pages(file_path) -> Iterator[str]:
+        from langchain_community.document_loaders import PyPDFLoader
+        try:
+            for page in PyPDFLoader(file_path).lazy_load():
+                yield page.page_content
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found at path: {file_path}")
+        except Exception as e:
+            raise RuntimeError(f"An error occurred while loading the document: {e}")
+
+    def iter_chunks(self, file_path) -> Iterator[str]:
+        # The last chunk of each page is carried into the next page so chunks
+        # (and their overlap) continue across page boundaries.
+        carry = ""
+        for page_text in self.iter_pages(file_path):
+            text = f"{carry}\n{page_text}" if carry else page_text
+            chunks = self.text_splitter.split_text(text)
+            if not chunks:
+                continue
+            carry = chunks.pop()
+            for chunk in chunks:
+                cleaned = self.clean_chunk(chunk)
+                if cleaned:
+                    yield cleaned
+
+        if carry:
+            cleaned = self.clean_chunk(carry)
+            if cleaned:
+                yield cleaned
+
+    @staticmethod
+    def clean_chunk(chunk):
+        cleaned_chunk = NON_ALPHANUMERIC.sub("", chunk)
+        return WHITESPACE.sub(" ", cleaned_chunk).strip()
+
     @staticmethod
     def clean_text(texts):
         cleaned_chunks = []
         for chunk in texts:
             try:
-                cleaned_chunk = re.sub(r"[^a-zA-Z0-9\s]", "", chunk)
-                cleaned_chunk = re.sub(r"\s+", " ", cleaned_chunk).strip()
-                cleaned_chunks.append(cleaned_chunk)
+                cleaned_chunks.append(DocumentProcessor.clean_chunk(chunk))
             except Exception as e:
                 print(f"An error occurred while cleaning a chunk: {e}")
                 cleaned_chunks.append(chunk)
         return cleaned_chunks
 
+    @staticmethod
+    def to_dataframe(chunks: Iterable[str]):
+        import pandas as pd
+        return pd.DataFrame(list(chunks), columns=["CHUNKS"])
+
     # Method to divide the PDF into chunks
     def chunk_creator(self, texts):
         try:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.overlap,
-                length_function=len,
-            )
-
-            chunks = text_splitter.split_text(texts)
+            chunks = self.text_splitter.split_text(texts)
             cleaned_chunks = self.clean_text(chunks)
-            chunks_data_frame = pd.DataFrame(cleaned_chunks, columns=["CHUNKS"])
+            chunks_data_frame = self.to_dataframe(cleaned_chunks)
             return chunks_data_frame
         except Exception as e:
             raise RuntimeError(f"An error occurred while processing the document: {e}")
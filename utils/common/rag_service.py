@@ -4,8 +4,9 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import TextLoader
 
 from langchain_google_genai import ChatGoogleGenerativeAI
-from utils.config import GEMINI_API_KEY
-from langchain_huggingface import HuggingFaceEmbeddings
+from utils.common.embedding_registry import EmbeddingRegistry
+from utils.common.index_store import FaissIndexStore
+from utils.config import EMBEDDING_MODEL, require
 
 import os
 
@@ -17,12 +18,15 @@ to answer questions over a given document corpus.
 
 The `GeminiRAGService` class loads documents, splits them into chunks, generates embeddings, 
 stores them in a FAISS vectorstore, and queries them using Google's Gemini model via LangChain.
+Built indexes are persisted through `FaissIndexStore`, so a document that was already embedded with the
+same model and chunking is loaded from disk instead of being re-embedded.
 
 Classes:
     - GeminiRAGService: Full end-to-end RAG system powered by Gemini and FAISS.
 
 Functions:
-    - __init__(file_path, embedding_model): Initializes document loading, embedding, FAISS storage, retriever, and Gemini model.
+    - __init__(file_path, embedding_model, chunk_size, chunk_overlap, index_store): Initializes document loading,
+      embedding, FAISS storage (or loads the persisted index), retriever, and Gemini model.
     - get_answer(query): Answers a user query using RAG pipeline.
 
 Usage:
@@ -32,6 +36,8 @@ Usage:
 Parameters:
     - file_path (str): The path to the document file to load and process.
     - embedding_model (str): Optional. The HuggingFace model to use for embeddings (default: "sentence-transformers/all-MiniLM-L6-v2").
+    - chunk_size (int) / chunk_overlap (int): Optional. Splitter settings (default: 1000 / 200).
+    - index_store (FaissIndexStore): Optional. Where indexes are persisted (default: `FAISS_INDEX_DIR`).
 
 Returns:
     - str: The generated answer based on the provided query and document content.
@@ -41,25 +47,47 @@ Configuration:
 
 Note:
     - This implementation uses FAISS for local vector storage.
+    - Embedding models come from the process-wide `EmbeddingRegistry`, so all instances share one copy
+      of the weights; call `EmbeddingRegistry.warm_up()` at startup to pay the load cost up front.
     - Document is chunked before embedding for better retrieval performance.
-    - Extend the class to load multiple files or add persistence to FAISS if required.
+    - Indexes are keyed by (file content hash, embedding model, chunk_size, chunk_overlap); editing the
+      file produces a new key and the stale index for that file is dropped.
 """
 
 
 class GeminiRAGService:
-    def __init__(self, file_path: str, embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
+    def __init__(
+            self,
+            file_path: str,
+            embedding_model: str = EMBEDDING_MODEL,
+            chunk_size: int = 1000,
+            chunk_overlap: int = 200,
+            index_store: FaissIndexStore = None
+    ):
+        os.environ["GOOGLE_API_KEY"] = require("GEMINI_API_KEY")
 
         self.file_path = file_path
         self.embedding_model = embedding_model
+        self.index_store = index_store or FaissIndexStore()
+        self.index_key = self.index_store.key_for(
+            FaissIndexStore.file_hash(self.file_path),
+            self.embedding_model,
+            chunk_size,
+            chunk_overlap
+        )
 
-        # Load and process documents
-        self.docs = self.load_documents()
-        self.chunks = self.split_documents()
-
-        # Embedding and vector store
-        self.embeddings = HuggingFaceEmbeddings(model_name=self.embedding_model)
-        self.db = FAISS.from_documents(self.chunks, self.embeddings)
+        # Embedding and vector store (reuse the persisted index when the document is unchanged)
+        self.embeddings = EmbeddingRegistry.get(self.embedding_model)
+        self.docs = None
+        self.chunks = None
+        self.db = self.index_store.load(self.index_key, self.embeddings)
+
+        if self.db is None:
+            # Load and process documents
+            self.docs = self.load_documents()
+            self.chunks = self.split_documents(chunk_size, chunk_overlap)
+            self.db = FAISS.from_documents(self.chunks, self.embeddings)
+            self.index_store.save(self.index_key, self.db, source=self.file_path)
 
         # Retriever and LLM
         self.retriever = self.db.as_retriever()
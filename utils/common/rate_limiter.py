@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+from typing import Optional
+
+"""
+Token Bucket Rate Limiter
+
+This module provides a token-bucket limiter shared by synchronous and asyncio callers.
+
+Tokens refill continuously at `rate_per_minute / 60` per second up to `burst`. Each call reserves one
+token up front and then waits until that token becomes available, so waiting callers are served in
+arrival order and the long-run request rate never exceeds the configured quota.
+
+Classes:
+    - TokenBucket: Thread-safe limiter usable from threads (`acquire`) and coroutines (`aacquire`).
+
+Usage:
+    limiter = TokenBucket(rate_per_minute=60, burst=5)
+    limiter.acquire()          # blocking
+    await limiter.aacquire()   # non-blocking for the event loop
+"""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: Optional[int] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, int(self.rate)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Takes one token (possibly going into debt) and returns how long the
+        caller must wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+__all__ = ["TokenBucket"]
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from utils.config import GEMINI_CACHE_MAX_ENTRIES, GEMINI_CACHE_PATH, GEMINI_CACHE_TTL
+
+"""
+LLM Response Cache
+
+This module provides a persistent, SQLite-backed cache for text responses returned by the Gemini API.
+
+Entries are keyed by (model, SHA-256 of the prompt, generation config), expire after a TTL and are
+evicted least-recently-used once the cache grows past `max_entries`.
+
+Classes:
+    - ResponseCache: Thread-safe response cache with TTL, bounded size and hit-rate statistics.
+
+Functions:
+    - make_key(model, prompt, config): Builds the cache key for a request.
+    - get(key): Returns the cached response text, or None on a miss or expired entry.
+    - set(key, model, response): Stores a response and evicts expired / excess entries.
+    - clear(): Removes all entries.
+    - stats(): Returns hit/miss counters, hit rate and the number of stored entries.
+
+Usage:
+    cache = ResponseCache()
+    key = cache.make_key("gemini-2.0-flash", prompt)
+    reply = cache.get(key)
+"""
+
+
+def _config_fingerprint(config: Any) -> Any:
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):  # pydantic config objects from google-genai
+        return config.model_dump(exclude_none=True, mode="json")
+    return config
+
+
+class ResponseCache:
+    def __init__(
+            self,
+            db_path: str = GEMINI_CACHE_PATH,
+            ttl_seconds: int = GEMINI_CACHE_TTL,
+            max_entries: int = GEMINI_CACHE_MAX_ENTRIES
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, config: Any = None) -> str:
+        payload = json.dumps(
+            {
+                "model": model,
+                "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+                "config": _config_fingerprint(config)
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+__all__ = ["ResponseCache"]
@@ -0,0 +1,117 @@
+import importlib
+import threading
+from typing import Any, Callable, Dict, Union
+
+"""
+Lazy Service Registry
+
+This module builds the shared service clients (Gemini, Cloudinary, python-pptx, Wikimedia image search,
+the exam database) on first use instead of at import time.
+
+Factories can be given as a callable or as a "package.module:attribute" string. String factories are
+imported only when the service is first requested, so importing an agent does not pull in google-genai,
+cloudinary, python-pptx, Pillow or requests until the tool that needs them actually runs.
+
+Classes:
+    - ServiceRegistry: Thread-safe, build-once registry of named services.
+    - LazyService: Class-attribute descriptor that resolves a registry entry on first access.
+
+Functions:
+    - register(name, factory): Registers (or replaces) the factory for a service.
+    - get(name): Returns the service, building it on the first call.
+    - override(name, instance): Installs a ready-made instance (e.g. a fake client in tests or benchmarks).
+    - is_built(name): Whether the service has been built yet.
+    - reset(name=None): Drops built instances so the next `get` rebuilds them.
+
+Usage:
+    from utils.common.service_registry import services
+
+    gemini = services.get("gemini")
+    services.override("cloudinary", FakeUploader())
+
+Notes:
+    - Each service is built exactly once even when several threads request it concurrently.
+    - Credentials are validated by the services themselves when they are built (see `utils.config.require`).
+"""
+
+Factory = Union[str, Callable[[], Any]]
+
+
+class ServiceRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Factory] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, factory: Factory) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._build_locks.setdefault(name, threading.Lock())
+
+    @staticmethod
+    def _resolve(factory: Factory) -> Callable[[], Any]:
+        if callable(factory):
+            return factory
+        module_name, _, attribute = factory.partition(":")
+        return getattr(importlib.import_module(module_name), attribute)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"No service registered under '{name}'")
+            build_lock = self._build_locks[name]
+
+        # Per-service lock: building one slow client does not block lookups of others
+        with build_lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                instance = self._resolve(self._factories[name])()
+                self._instances[name] = instance
+        return instance
+
+    def override(self, name: str, instance: Any) -> None:
+        with self._lock:
+            self._factories.setdefault(name, lambda: instance)
+            self._build_locks.setdefault(name, threading.Lock())
+            self._instances[name] = instance
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def reset(self, name: str = None) -> None:
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+class LazyService:
+    """
+    Descriptor exposing a registry service as a class attribute, e.g.
+    `gemini = LazyService("gemini")`. Nothing is built until the attribute is read.
+    """
+    def __init__(self, name: str, registry: ServiceRegistry = None):
+        self.name = name
+        self.registry = registry
+
+    def __get__(self, instance, owner):
+        return (self.registry or services).get(self.name)
+
+
+services = ServiceRegistry()
+services.register("gemini", "utils.common.gemini_service:GeminiService")
+services.register("cloudinary", "utils.common.cloudinary_service:CloudinaryService")
+services.register("pptx", "utils.presentation.presentation_service:PPTXService")
+services.register("image_search", "utils.presentation.image_search_service:ImageSearchService")
+services.register("deck_cache", "utils.presentation.deck_cache:SemanticDeckCache")
+services.register("exam_database", "utils.common.db:ExamDataBaseService")
+services.register("note_database", "utils.common.db:NoteDataBaseService")
+
+__all__ = ["LazyService", "ServiceRegistry", "services"]
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+from typing import Callable, Optional
+
+"""
+Versioned Snapshot Directories
+
+This module publishes mutable on-disk indexes (the corpus RAG index, the local image library) as
+immutable snapshot directories plus a `CURRENT` pointer file.
+
+A save writes a complete new `snapshot-*` directory, then atomically replaces `CURRENT` (os.replace of a
+temp file) to point at it. There is never a moment without a loadable index: a reader either resolves the
+old pointer (whose snapshot is kept for one more save) or the new one, and a crash before the pointer
+switch leaves the previous snapshot current.
+
+Functions:
+    - current_snapshot(root, legacy_marker): Returns the directory of the current snapshot, or None.
+    - write_snapshot(root, write): Writes a new snapshot with `write(directory)` and makes it current.
+
+Notes:
+    - Indexes saved before this layout (files directly in `root`) are still loaded when `legacy_marker`
+      exists in `root`; they are removed once the first snapshot has been published.
+    - Besides the current snapshot only the previous one is kept; orphans of interrupted saves are
+      removed by the next save.
+"""
+
+POINTER_FILE = "CURRENT"
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+def _read_pointer(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, POINTER_FILE)) as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name or None
+
+
+def current_snapshot(root: str, legacy_marker: Optional[str] = None) -> Optional[str]:
+    name = _read_pointer(root)
+    if name is not None:
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            return path
+    if legacy_marker and os.path.exists(os.path.join(root, legacy_marker)):
+        return root
+    return None
+
+
+def write_snapshot(root: str, write: Callable[[str], None]) -> str:
+    """
+    Calls `write(directory)` on a fresh snapshot directory, publishes it as
+    current and returns its path. A failing `write` leaves the current snapshot untouched.
+    """
+    os.makedirs(root, exist_ok=True)
+    previous = _read_pointer(root)
+    legacy_files = [] if previous else [
+        name for name in os.listdir(root)
+        if not name.startswith((SNAPSHOT_PREFIX, ".")) and os.path.isfile(os.path.join(root, name))
+    ]
+
+    path = tempfile.mkdtemp(dir=root, prefix=SNAPSHOT_PREFIX)
+    try:
+        write(path)
+        fd, tmp_pointer = tempfile.mkstemp(dir=root, prefix=".pointer-")
+        with os.fdopen(fd, "w") as f:
+            f.write(os.path.basename(path))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_pointer, os.path.join(root, POINTER_FILE))
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+
+    keep = {os.path.basename(path), previous}
+    for name in os.listdir(root):
+        if name.startswith(SNAPSHOT_PREFIX) and name not in keep:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    for name in legacy_files:
+        try:
+            os.remove(os.path.join(root, name))
+        except OSError:
+            pass
+    return path
+
+
+__all__ = ["current_snapshot", "write_snapshot"]
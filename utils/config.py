@@ -8,8 +8,96 @@ CLOUDINARY_CLOUD_NAME=os.getenv("CLOUDINARY_CLOUD_NAME")
 CLOUDINARY_API_KEY=os.getenv("CLOUDINARY_API_KEY")
 CLOUDINARY_API_SECRET=os.getenv("CLOUDINARY_API_SECRET")
 
-if not GEMINI_API_KEY:
-    raise Exception("GEMINI_API_KEY is not set")
+# Image fetch stage
+WIKIMEDIA_API_URL=os.getenv("WIKIMEDIA_API_URL", "https://commons.wikimedia.org/w/api.php")
+IMAGE_FETCH_WORKERS=int(os.getenv("IMAGE_FETCH_WORKERS", "6"))
+IMAGE_FETCH_PER_HOST=int(os.getenv("IMAGE_FETCH_PER_HOST", "4"))
+IMAGE_TITLE_CACHE_SIZE=int(os.getenv("IMAGE_TITLE_CACHE_SIZE", "4096"))  # remembered query -> Commons title pairs
 
-if not CLOUDINARY_CLOUD_NAME or not CLOUDINARY_API_KEY or not CLOUDINARY_API_SECRET:
-    raise Exception("CLOUDINARY_CLOUD_NAME, CLOUDINARY_API_KEY or CLOUDINARY_API_SECRET is not set")
+# Size-targeted image downloads (slides place images 4.5in wide; 900px ~ 200 DPI)
+IMAGE_TARGET_WIDTH_PX=int(os.getenv("IMAGE_TARGET_WIDTH_PX", "900"))
+IMAGE_MAX_DOWNLOAD_BYTES=int(os.getenv("IMAGE_MAX_DOWNLOAD_BYTES", str(8 * 1024 * 1024)))
+IMAGE_JPEG_QUALITY=int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+# Stream slide JSON from Gemini and start image fetches per slide
+PRESENTATION_STREAMING=os.getenv("PRESENTATION_STREAMING", "1") == "1"
+PRESENTATION_IMAGE_BATCH=int(os.getenv("PRESENTATION_IMAGE_BATCH", "3"))  # streamed slides per batched image fetch
+
+# Presentation pipelines run at once by generate_presentations / agenerate_presentations
+PRESENTATION_WORKERS=int(os.getenv("PRESENTATION_WORKERS", "4"))
+
+# On-disk image cache
+DATA_DIR=os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+IMAGE_CACHE_ENABLED=os.getenv("IMAGE_CACHE_ENABLED", "1") == "1"
+IMAGE_CACHE_DIR=os.getenv("IMAGE_CACHE_DIR", os.path.join(DATA_DIR, "image_cache"))
+IMAGE_CACHE_MAX_BYTES=int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Shared embedding models for the RAG layer
+EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE=int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_NUM_THREADS=int(os.getenv("EMBEDDING_NUM_THREADS", "0"))
+
+# Batch exam evaluation
+EXAM_EXTRACT_WORKERS=int(os.getenv("EXAM_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+EXAM_STORE_BATCH_SIZE=int(os.getenv("EXAM_STORE_BATCH_SIZE", "20"))  # evaluations stored per transaction
+EXAM_STORE_INTERVAL=float(os.getenv("EXAM_STORE_INTERVAL", "5"))  # seconds before a partial batch is stored
+
+# Per-question (map-reduce) evaluation of long scripts
+EXAM_PER_QUESTION_THRESHOLD=int(os.getenv("EXAM_PER_QUESTION_THRESHOLD", "12000"))  # characters
+EXAM_SECTION_MAX_CHARS=int(os.getenv("EXAM_SECTION_MAX_CHARS", "6000"))
+
+# Exam text extraction
+EXTRACTION_CACHE_SIZE=int(os.getenv("EXTRACTION_CACHE_SIZE", "128"))
+PDF_PARALLEL_PAGE_THRESHOLD=int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "40"))
+PDF_PARALLEL_WORKERS=int(os.getenv("PDF_PARALLEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Batch note extraction (documents indexed at once; LLM calls are bounded by GEMINI_MAX_CONCURRENCY)
+NOTE_INDEX_WORKERS=int(os.getenv("NOTE_INDEX_WORKERS", "4"))
+
+# Semantic deck cache (opt-in): reuse decks generated for near-identical topics
+DECK_CACHE_ENABLED=os.getenv("DECK_CACHE_ENABLED", "0") == "1"
+DECK_CACHE_PATH=os.getenv("DECK_CACHE_PATH", os.path.join(DATA_DIR, "deck_cache.db"))
+DECK_CACHE_THRESHOLD=float(os.getenv("DECK_CACHE_THRESHOLD", "0.9"))  # cosine similarity of topic embeddings
+DECK_CACHE_TTL=int(os.getenv("DECK_CACHE_TTL", str(7 * 24 * 60 * 60)))
+DECK_CACHE_MAX_ENTRIES=int(os.getenv("DECK_CACHE_MAX_ENTRIES", "1000"))
+
+# Local image library: captioned images searched before Wikimedia Commons (used once an index is ingested)
+IMAGE_LIBRARY_ENABLED=os.getenv("IMAGE_LIBRARY_ENABLED", "1") == "1"
+IMAGE_LIBRARY_DIR=os.getenv("IMAGE_LIBRARY_DIR", os.path.join(DATA_DIR, "image_library"))
+IMAGE_LIBRARY_THRESHOLD=float(os.getenv("IMAGE_LIBRARY_THRESHOLD", "0.6"))  # cosine similarity of prompt vs caption
+
+# Persisted FAISS indexes for the RAG layer
+FAISS_INDEX_DIR=os.getenv("FAISS_INDEX_DIR", os.path.join(DATA_DIR, "faiss_indexes"))
+FAISS_INDEX_MAX_ENTRIES=int(os.getenv("FAISS_INDEX_MAX_ENTRIES", "50"))
+CORPUS_INDEX_DIR=os.getenv("CORPUS_INDEX_DIR", os.path.join(DATA_DIR, "corpus_index"))
+
+# Gemini response cache (opt-in)
+GEMINI_CACHE_ENABLED=os.getenv("GEMINI_CACHE_ENABLED", "0") == "1"
+GEMINI_CACHE_PATH=os.getenv("GEMINI_CACHE_PATH", os.path.join(DATA_DIR, "gemini_cache.db"))
+GEMINI_CACHE_TTL=int(os.getenv("GEMINI_CACHE_TTL", str(24 * 60 * 60)))
+GEMINI_CACHE_MAX_ENTRIES=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "5000"))
+
+# Gemini quota, concurrency and retry policy
+GEMINI_REQUESTS_PER_MINUTE=float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_MAX_CONCURRENCY=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_MAX_RETRIES=int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_BACKOFF_BASE=float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))
+
+# Metrics export: Prometheus text endpoint on METRICS_PORT (0 = off), JSON span logs on stderr
+METRICS_PORT=int(os.getenv("METRICS_PORT", "0"))
+METRICS_JSON_LOGS=os.getenv("METRICS_JSON_LOGS", "0") == "1"
+
+# Cold-start import budget checked by utils/common/import_budget.py
+IMPORT_BUDGET_MS=float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+
+
+def require(*names):
+    """
+    Returns the value of each named setting, raising when any of them is not set.
+    Credentials are checked here, when a client is first built, rather than at import.
+    """
+    missing = [name for name in names if not globals().get(name)]
+    if missing:
+        raise Exception(f"{', '.join(missing)} is not set")
+    values = tuple(globals()[name] for name in names)
+    return values[0] if len(values) == 1 else values
@@ -1,11 +1,21 @@
 import os
 import json
 import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
-import PyPDF2
-from docx import Document
-from utils.common.gemini_service import GeminiService
-from utils.common.db import ExamDataBaseService
+from utils.common.metrics import metrics
+from utils.common.service_registry import LazyService
+from utils.evaluation.text_extraction import text_extractor
+from utils.config import (
+    EXAM_EXTRACT_WORKERS,
+    EXAM_PER_QUESTION_THRESHOLD,
+    EXAM_SECTION_MAX_CHARS,
+    EXAM_STORE_BATCH_SIZE,
+    EXAM_STORE_INTERVAL,
+    GEMINI_MAX_CONCURRENCY
+)
 
 """
 AI-Powered Exam Evaluation Service
@@ -16,7 +26,7 @@ This module automates end-to-end exam evaluation using:
 - Database storage for evaluated results
 
 The module includes utilities for:
-    - Extracting text from uploaded exam files (PDF/DOCX)
+    - Extracting text from uploaded exam files (PDF/DOCX/TXT, via the cached `text_extractor`)
     - Generating structured evaluation prompt using Gemini API
     - Parsing and cleaning AI response
     - Persisting evaluation results to database
@@ -28,38 +38,53 @@ Dependencies:
 Functions:
     - build_evaluation_prompt(exam_content): Constructs a formatted evaluation prompt.
     - clean_gemini_response(response): Cleans and parses Gemini output.
+    - split_into_sections(exam_content): Splits a script into questions (or size-bounded sections).
+    - evaluate_exam_sections(exam_content): Map-reduce evaluation; scores all sections concurrently and
+      aggregates them into {"evaluation", "score", "questions"}.
     - evaluate_exam_from_file(file_path): Full pipeline to extract, evaluate, and store exam result.
+    - iter_evaluate_exams(source, extract_workers, max_concurrency): Batch pipeline over a directory or list
+      of files; yields each file's result as soon as it finishes.
+    - evaluate_exams(source, extract_workers, max_concurrency): Runs the batch pipeline and returns all results
+      together with throughput and failure counts.
 """
 
 
+# Explicit question headings at the start of a line: "Q1", "Q.2", "Question 3" (bare "4." / "5)" are
+# too often numbered lists or decimals inside an answer)
+QUESTION_HEADING = re.compile(r"^[ \t]*Q(?:uestion)?[ \t]*\.?[ \t]*(\d+)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def _pack(pieces: Iterable[str], separator: str, max_chars: int) -> List[str]:
+    """
+    Joins consecutive pieces (each at most `max_chars` long) into parts of at most
+    `max_chars` characters, separators included.
+    """
+    parts, current, size = [], [], 0
+    for piece in pieces:
+        added = len(piece) + (len(separator) if current else 0)
+        if current and size + added > max_chars:
+            parts.append(separator.join(current))
+            current, size, added = [], 0, len(piece)
+        current.append(piece)
+        size += added
+    if current:
+        parts.append(separator.join(current))
+    return parts
+
 
 class ExamEvaluationService:
-    gemini = GeminiService()
-    database = ExamDataBaseService()
+    # Built on first use, so importing this module does not create any clients
+    gemini = LazyService("gemini")
+    database = LazyService("exam_database")
 
     @staticmethod
-    def extract_text(file_path: str) -> str:
+    @metrics.timed_stage("extract")
+    def extract_text(file_path: str, parallel: bool = True) -> str:
         """
-        Extracts text from a PDF or DOCX exam file.
+        Extracts text from an exam file (any format registered with `text_extractor`).
+        Unchanged files are served from the extraction cache.
         """
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == '.pdf':
-            with open(file_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
-
-        elif ext == '.docx':
-            doc = Document(file_path)
-            text = ""
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-            return text
-
-        else:
-            raise ValueError("Unsupported file type. Only PDF and DOCX supported.")
+        return text_extractor.extract(file_path, parallel=parallel)
 
     @staticmethod
     def build_evaluation_prompt(exam_content: str) -> str:
@@ -86,8 +111,133 @@ class ExamEvaluationService:
         cleaned = re.sub(r"^```(?:json)?|```$", "", response, flags=re.IGNORECASE).strip()
         return json.loads(cleaned)
 
+    @staticmethod
+    def build_section_prompt(label: str, section: str) -> str:
+        """
+        Builds the Gemini prompt for scoring a single question / section.
+        """
+        return f"""
+        Evaluate the answer to {label} of an exam using ADK criteria. Provide a short evaluation and a score out of 100.
+
+        {label}:
+        {section}
+
+        Output JSON only with:
+        - "evaluation": string (performance summary for this question)
+        - "score": integer (0-100)
+        No extra text, no ```json or markdown formatting.
+        """
+
+    @staticmethod
+    def split_into_sections(exam_content: str, max_chars: int = EXAM_SECTION_MAX_CHARS) -> List[Tuple[str, str]]:
+        """
+        Splits exam text into (label, text) sections at explicit question headings
+        ("Q1", "Question 2"). Only headings whose number is higher than the previous
+        question's start a new section; a repeated or lower number (e.g. "Q1" quoted
+        inside an answer) stays part of the current one. Text before the first heading
+        is kept with the first question. Scripts without at least two such headings are
+        split into parts of at most `max_chars` characters, at paragraph breaks where
+        possible, else at line breaks, else mid-line.
+        """
+        headings = []
+        for match in QUESTION_HEADING.finditer(exam_content):
+            number = int(match.group(1))
+            if not headings or number > headings[-1][0]:
+                headings.append((number, match.start()))
+
+        if len(headings) >= 2:
+            sections = []
+            for i, (number, position) in enumerate(headings):
+                start = 0 if i == 0 else position
+                end = headings[i + 1][1] if i + 1 < len(headings) else len(exam_content)
+                sections.append((f"Question {number}", exam_content[start:end].strip()))
+            return sections
+
+        # Extracted PDF text often has no blank lines at all, so oversized paragraphs are cut further
+        max_chars = max(1, max_chars)
+        pieces = []
+        for paragraph in re.split(r"\n\s*\n", exam_content):
+            if len(paragraph) <= max_chars:
+                pieces.append(paragraph)
+                continue
+            lines = [
+                line[start:start + max_chars]
+                for line in paragraph.split("\n")
+                for start in range(0, len(line), max_chars)
+            ]
+            pieces.extend(_pack(lines, "\n", max_chars))
+        parts = _pack(pieces, "\n\n", max_chars)
+        return [(f"Section {i + 1}", part.strip()) for i, part in enumerate(parts) if part.strip()]
+
     @classmethod
-    def evaluate_exam_from_file(cls, file_path: str) -> dict:
+    def evaluate_exam_sections(cls, exam_content: str) -> dict:
+        """
+        Map-reduce evaluation:
+        - Split the script into questions / sections
+        - Score every section concurrently with its own small prompt
+        - Aggregate into {"evaluation", "score"} plus a per-question breakdown
+        """
+        sections = cls.split_into_sections(exam_content)
+        prompts = [cls.build_section_prompt(label, text) for label, text in sections]
+        responses = cls.gemini.batch_get_responses(prompts, return_exceptions=True)
+        return cls.aggregate_sections(sections, responses)
+
+    @classmethod
+    def aggregate_sections(cls, sections: List[Tuple[str, str]], responses: List[Union[str, Exception]]) -> dict:
+        """
+        Parses the per-section responses (an Exception where a call failed) and
+        aggregates them into {"evaluation", "score", "questions"}.
+        """
+        questions = []
+        for (label, _), response in zip(sections, responses):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                parsed = cls.clean_gemini_response(response)
+                questions.append({
+                    "question": label,
+                    "evaluation": parsed.get("evaluation", ""),
+                    "score": int(parsed.get("score", 0))
+                })
+            except Exception as e:
+                questions.append({"question": label, "evaluation": "", "score": None, "error": str(e)})
+
+        scored = [q for q in questions if q["score"] is not None]
+        if not scored:
+            raise RuntimeError("Evaluation failed for every section of the exam.")
+
+        summary = "\n".join(
+            f"{q['question']} ({q['score']}/100): {q['evaluation']}" for q in scored
+        )
+        failed = len(questions) - len(scored)
+        if failed:
+            summary += f"\n{failed} section(s) could not be evaluated and were excluded from the score."
+
+        return {
+            "evaluation": summary,
+            "score": round(sum(q["score"] for q in scored) / len(scored)),
+            "questions": questions
+        }
+
+    @classmethod
+    def evaluate_exam_content(cls, exam_content: str, per_question: Optional[bool] = None) -> dict:
+        """
+        Generates and parses the Gemini evaluation for already extracted exam text.
+        `per_question=None` switches to the map-reduce evaluation for scripts longer
+        than EXAM_PER_QUESTION_THRESHOLD characters.
+        """
+        if per_question is None:
+            per_question = len(exam_content) > EXAM_PER_QUESTION_THRESHOLD
+        if per_question:
+            return cls.evaluate_exam_sections(exam_content)
+
+        prompt = cls.build_evaluation_prompt(exam_content)
+        response = cls.gemini.get_response(prompt)
+        return cls.clean_gemini_response(response)
+
+    @classmethod
+    @metrics.timed_stage("exam_evaluation")
+    def evaluate_exam_from_file(cls, file_path: str, per_question: Optional[bool] = None) -> dict:
         """
         Full evaluation pipeline:
         - Extract exam text
@@ -100,12 +250,11 @@ class ExamEvaluationService:
 
         try:
             exam_content = cls.extract_text(file_path)
-            prompt = cls.build_evaluation_prompt(exam_content)
-            response = cls.gemini.get_response(prompt)
-            result = cls.clean_gemini_response(response)
+            result = cls.evaluate_exam_content(exam_content, per_question)
 
             cls.database.store_exam_values(file_path, result)
 
+            metrics.inc("exam_evaluations_total", status="success")
             return {
                 "status": "success",
                 "file": file_path,
@@ -113,6 +262,146 @@ class ExamEvaluationService:
             }
 
         except Exception as e:
+            metrics.inc("exam_evaluations_total", status="error")
             return {"status": "error", "error": str(e)}
 
+    @classmethod
+    def collect_exam_paths(cls, source: Union[str, Iterable[str]]) -> List[str]:
+        """
+        Expands a directory into its supported exam files (sorted), or returns the given paths.
+        """
+        if isinstance(source, str):
+            if not os.path.isdir(source):
+                return [source]
+            return sorted(
+                os.path.join(source, name)
+                for name in os.listdir(source)
+                if os.path.splitext(name)[1].lower() in text_extractor.supported_extensions()
+            )
+        return list(source)
+
+    @classmethod
+    def iter_evaluate_exams(
+            cls,
+            source: Union[str, Iterable[str]],
+            extract_workers: int = EXAM_EXTRACT_WORKERS,
+            max_concurrency: int = GEMINI_MAX_CONCURRENCY
+    ) -> Iterator[dict]:
+        """
+        Batch evaluation pipeline:
+        - Extract text for all files in a process pool
+        - Send each extracted script to Gemini as soon as it is ready (bounded concurrency)
+        - Store successful evaluations in bulk, every EXAM_STORE_BATCH_SIZE results or
+          EXAM_STORE_INTERVAL seconds, and yield a success only after it has been stored
+          (errors are yielded immediately)
+
+        Long scripts are split into sections whose Gemini calls are submitted to the same
+        pool, so `max_concurrency` bounds all in-flight calls, whole-script and per-section alike.
+        """
+        paths = cls.collect_exam_paths(source)
+        evaluated = []  # successes not stored (and not yielded) yet
+        last_flush = time.monotonic()
+
+        def flush() -> Iterator[dict]:
+            nonlocal evaluated, last_flush
+            batch = evaluated
+            if batch:
+                cls.database.store_exam_values_bulk(batch)
+            # Only dropped once stored; on failure the finally block retries them
+            evaluated = []
+            last_flush = time.monotonic()
+            for file_path, outcome in batch:
+                yield {"status": "success", "file": file_path, "evaluation": outcome}
+
+        try:
+            with ProcessPoolExecutor(max_workers=max(1, extract_workers)) as extract_pool, \
+                    ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as llm_pool:
+                pending = {}
+
+                def submit_evaluation(file_path: str, exam_content: str):
+                    sections = []
+                    if len(exam_content) > EXAM_PER_QUESTION_THRESHOLD:
+                        sections = cls.split_into_sections(exam_content)
+                    if not sections:
+                        future = llm_pool.submit(cls.evaluate_exam_content, exam_content, False)
+                        pending[future] = ("evaluate", file_path, None)
+                        return
+                    # Shared by the section calls of one script; aggregated when the last one finishes
+                    state = {"sections": sections, "responses": [None] * len(sections), "remaining": len(sections)}
+                    for index, (label, text) in enumerate(sections):
+                        future = llm_pool.submit(cls.gemini.get_response, cls.build_section_prompt(label, text))
+                        pending[future] = ("section", file_path, (state, index))
+
+                for file_path in paths:
+                    if not file_path or not os.path.exists(file_path):
+                        yield {"status": "error", "file": file_path, "error": "Invalid or missing file path."}
+                        continue
+                    cached = text_extractor.get_cached(file_path)
+                    if cached is not None:
+                        submit_evaluation(file_path, cached)
+                    else:
+                        # One process per file already; no nested page-level pools
+                        pending[extract_pool.submit(cls.extract_text, file_path, False)] = ("extract", file_path, None)
+
+                while pending:
+                    done, _ = wait(pending, timeout=EXAM_STORE_INTERVAL, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, file_path, section = pending.pop(future)
+                        if stage == "section":
+                            state, index = section
+                            try:
+                                state["responses"][index] = future.result()
+                            except Exception as e:
+                                state["responses"][index] = e
+                            state["remaining"] -= 1
+                            if state["remaining"]:
+                                continue
+
+                        try:
+                            if stage == "section":
+                                outcome = cls.aggregate_sections(state["sections"], state["responses"])
+                            else:
+                                outcome = future.result()
+                        except Exception as e:
+                            yield {"status": "error", "file": file_path, "error": str(e)}
+                            continue
+
+                        if stage == "extract":
+                            text_extractor.store(file_path, outcome)
+                            submit_evaluation(file_path, outcome)
+                        else:
+                            evaluated.append((file_path, outcome))
+
+                    if len(evaluated) >= EXAM_STORE_BATCH_SIZE or (
+                            evaluated and time.monotonic() - last_flush >= EXAM_STORE_INTERVAL):
+                        yield from flush()
+                yield from flush()
+        finally:
+            # Interrupted by the caller: store what finished but was not yielded yet
+            if evaluated:
+                cls.database.store_exam_values_bulk(evaluated)
+
+    @classmethod
+    def evaluate_exams(
+            cls,
+            source: Union[str, Iterable[str]],
+            extract_workers: int = EXAM_EXTRACT_WORKERS,
+            max_concurrency: int = GEMINI_MAX_CONCURRENCY
+    ) -> dict:
+        """
+        Runs `iter_evaluate_exams` to completion and reports throughput and failure counts.
+        """
+        started = time.perf_counter()
+        results = list(cls.iter_evaluate_exams(source, extract_workers, max_concurrency))
+        elapsed = time.perf_counter() - started
 
+        failed = sum(1 for r in results if r["status"] != "success")
+        return {
+            "status": "success",
+            "total": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_second": round(len(results) / elapsed, 3) if elapsed > 0 else 0.0,
+            "results": results
+        }
@@ -0,0 +1,169 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from utils.config import EXTRACTION_CACHE_SIZE, PDF_PARALLEL_PAGE_THRESHOLD, PDF_PARALLEL_WORKERS
+
+"""
+Exam Text Extraction
+
+This module turns exam files into plain text through a pluggable, cached extraction layer.
+
+Extractors are registered per file extension and always build their output with a single join over
+pages / paragraphs (linear in the document size). Small PDFs are parsed once, in process; large PDFs are
+split into page ranges that are parsed in a shared pool of worker processes. Results are cached in memory
+keyed by (absolute path, size, mtime), so re-evaluating an unchanged file does not parse it again.
+
+Classes:
+    - TextExtractor: Registry of per-extension extractors with an LRU extraction cache.
+
+Functions:
+    - register(*extensions): Decorator registering an extractor `fn(file_path, parallel) -> str`.
+    - extract(file_path, parallel): Returns the text of a file, from the cache when unchanged.
+    - get_cached(file_path) / store(file_path, text): Direct cache access (used by batch evaluation).
+    - supported_extensions(): Extensions that currently have an extractor.
+    - shutdown(): Stops the worker processes used for large PDFs.
+
+Built-in formats:
+    - .pdf (PyPDF2), .docx (python-docx), .txt / .md (UTF-8 text)
+    - Parser libraries are imported inside the extractors, on the first file of that format.
+
+Usage:
+    text = text_extractor.extract("/path/to/exam.pdf")
+
+    @text_extractor.register(".rtf")
+    def extract_rtf(file_path, parallel):
+        ...
+"""
+
+
+def _pages_text(pages) -> str:
+    return "".join(f"{page.extract_text() or ''}\n" for page in pages)
+
+
+def _pdf_page_range_text(file_path: str, start: int, stop: int) -> str:
+    import PyPDF2
+
+    with open(file_path, 'rb') as f:
+        return _pages_text(PyPDF2.PdfReader(f).pages[start:stop])
+
+
+class TextExtractor:
+    def __init__(
+            self,
+            cache_size: int = EXTRACTION_CACHE_SIZE,
+            parallel_page_threshold: int = PDF_PARALLEL_PAGE_THRESHOLD,
+            max_workers: int = PDF_PARALLEL_WORKERS
+    ):
+        self.cache_size = cache_size
+        self.parallel_page_threshold = parallel_page_threshold
+        self.max_workers = max(1, max_workers)
+
+        self._extractors: Dict[str, Callable[[str, bool], str]] = {}
+        self._cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+        self.register('.pdf')(self._extract_pdf)
+        self.register('.docx')(self._extract_docx)
+        self.register('.txt', '.md')(self._extract_plain_text)
+
+    def register(self, *extensions: str):
+        def decorator(extractor: Callable[[str, bool], str]):
+            for ext in extensions:
+                self._extractors[ext.lower()] = extractor
+            return extractor
+        return decorator
+
+    def supported_extensions(self) -> Tuple[str, ...]:
+        return tuple(self._extractors)
+
+    @staticmethod
+    def _cache_key(file_path: str) -> Tuple[str, int, int]:
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    def get_cached(self, file_path: str) -> Optional[str]:
+        key = self._cache_key(file_path)
+        with self._lock:
+            text = self._cache.get(key)
+            if text is not None:
+                self._cache.move_to_end(key)
+            return text
+
+    def store(self, file_path: str, text: str) -> None:
+        key = self._cache_key(file_path)
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def extract(self, file_path: str, parallel: bool = True) -> str:
+        ext = os.path.splitext(file_path)[1].lower()
+        extractor = self._extractors.get(ext)
+        if extractor is None:
+            supported = ", ".join(self._extractors)
+            raise ValueError(f"Unsupported file type. Supported: {supported}.")
+
+        text = self.get_cached(file_path)
+        if text is None:
+            text = extractor(file_path, parallel)
+            self.store(file_path, text)
+        return text
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """
+        Worker processes for large PDFs, started on the first one and reused afterwards.
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _extract_pdf(self, file_path: str, parallel: bool) -> str:
+        import PyPDF2
+
+        with open(file_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            page_count = len(reader.pages)
+            if not parallel or page_count < self.parallel_page_threshold or self.max_workers == 1:
+                # Small PDFs are parsed once, by the reader that counted the pages
+                return _pages_text(reader.pages)
+
+        step = -(-page_count // self.max_workers)  # ceil division
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        parts = self.pool.map(
+            _pdf_page_range_text,
+            [file_path] * len(ranges),
+            [start for start, _ in ranges],
+            [stop for _, stop in ranges]
+        )
+        return "".join(parts)
+
+    @staticmethod
+    def _extract_docx(file_path: str, parallel: bool) -> str:
+        from docx import Document
+
+        doc = Document(file_path)
+        return "".join(f"{para.text}\n" for para in doc.paragraphs)
+
+    @staticmethod
+    def _extract_plain_text(file_path: str, parallel: bool) -> str:
+        with open(file_path, encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+
+text_extractor = TextExtractor()
+
+__all__ = ["TextExtractor", "text_extractor"]
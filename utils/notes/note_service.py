@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Union
+
+from utils.common.metrics import metrics
+from utils.common.service_registry import LazyService
+from utils.config import GEMINI_MAX_CONCURRENCY, NOTE_INDEX_WORKERS
+
+"""
+Note Extraction Service
+
+This module turns documents into concise bullet-point notes using:
+- GeminiRAGService (FAISS retrieval over the document + Gemini) for note generation
+- JSON parsing and validation of the returned bullet array
+- NoteDataBaseService for storing the points per topic, with resumable checkpoints
+
+The module includes utilities for:
+    - Building the notes prompt and parsing the JSON array of bullet points
+    - Extracting notes for one document
+    - Batch-extracting notes for many documents: documents are indexed on a worker pool while the Gemini
+      calls run on a separate, smaller pool (bounded LLM parallelism)
+    - Checkpointing every finished document, so an interrupted backfill restarts where it stopped
+
+Dependencies:
+    - GeminiRAGService (for document retrieval and generation)
+    - NoteDataBaseService (for storing bullet points and checkpoints)
+
+Functions:
+    - build_notes_prompt(count): Constructs the bullet-point prompt.
+    - parse_bullet_points(response): Cleans Gemini output and returns the list of points.
+    - topic_for(file_path): Default topic of a document (its file name without extension).
+    - extract_notes(file_path): Generates the bullet points for one document (nothing is stored).
+    - collect_note_paths(source): Expands directories (recursively) into their text documents.
+    - iter_extract_notes(source, index_workers, max_concurrency, retry_failed): Batch pipeline; yields each
+      document's result as soon as it finishes.
+    - extract_notes_batch(...): Runs the batch pipeline and returns counts and throughput.
+
+Notes:
+    - A document is skipped when its checkpoint is "done" for the same content hash; a changed document is
+      re-extracted and replaces its own earlier points (points are stored with their source `file_path`, so
+      documents sharing a topic label never overwrite each other). Failed documents are retried only with
+      `retry_failed=True`.
+    - Points and the checkpoint are written in one transaction per document.
+    - Paths are consumed lazily and at most a few documents per worker are in flight, so a 10k-document
+      backfill does not queue everything up front.
+"""
+
+
+class NoteExtractionService:
+    # Built on first use, so importing this module does not create any clients
+    database = LazyService("note_database")
+
+    SUPPORTED_EXTENSIONS = (".txt", ".md")  # loaded with LangChain's TextLoader
+
+    @staticmethod
+    def build_notes_prompt(count: int = 10) -> str:
+        return f"""
+        Create a list of {count} concise bullet points about the topic in the above text.
+        Respond in JSON format as a simple array of strings.
+        Example:
+        [
+          "Bullet point 1",
+          "Bullet point 2",
+          ...
+          "Bullet point {count}"
+        ]
+        Only return the JSON array. No extra explanations or markdown.
+        """
+
+    @staticmethod
+    def parse_bullet_points(response: str) -> List[str]:
+        """
+        Cleans Gemini's raw response and returns its bullet points (stripped, de-duplicated, in order).
+        """
+        cleaned = re.sub(r"^```(?:json)?|```$", "", response.strip(), flags=re.IGNORECASE).strip()
+        try:
+            points = json.loads(cleaned)
+        except json.JSONDecodeError:
+            # Tolerate text around the array
+            match = re.search(r"\[.*\]", cleaned, flags=re.DOTALL)
+            if match is None:
+                raise ValueError("Response does not contain a JSON array")
+            points = json.loads(match.group(0))
+
+        if not isinstance(points, list):
+            raise ValueError("Response is not a JSON array")
+        points = [str(point).strip() for point in points if isinstance(point, (str, int, float))]
+        points = list(dict.fromkeys(point for point in points if point))
+        if not points:
+            raise ValueError("Response contains no bullet points")
+        return points
+
+    @staticmethod
+    def topic_for(file_path: str) -> str:
+        return os.path.splitext(os.path.basename(file_path))[0]
+
+    @staticmethod
+    def content_hash(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    @metrics.timed_stage("notes_index")
+    def build_rag(file_path: str):
+        from utils.common.rag_service import GeminiRAGService
+
+        return GeminiRAGService(file_path=file_path)
+
+    @classmethod
+    @metrics.timed_stage("llm", call="notes")
+    def generate_points(cls, rag) -> List[str]:
+        return cls.parse_bullet_points(rag.get_answer(cls.build_notes_prompt()))
+
+    @classmethod
+    def extract_notes(cls, file_path: str) -> List[str]:
+        """
+        Generates the bullet points for one document without storing them.
+        """
+        return cls.generate_points(cls.build_rag(file_path))
+
+    @classmethod
+    def collect_note_paths(cls, source: Union[str, Iterable[str]]) -> Iterator[str]:
+        """
+        Yields the supported documents under a directory (recursively, sorted per
+        directory), or the given paths.
+        """
+        if isinstance(source, str):
+            source = [source]
+        for path in source:
+            if not os.path.isdir(path):
+                yield path
+                continue
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in cls.SUPPORTED_EXTENSIONS:
+                        yield os.path.join(root, name)
+
+    @classmethod
+    def iter_extract_notes(
+            cls,
+            source: Union[str, Iterable[str]],
+            index_workers: int = NOTE_INDEX_WORKERS,
+            max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+            retry_failed: bool = False
+    ) -> Iterator[dict]:
+        """
+        Batch note pipeline:
+        - Skip documents whose checkpoint is already done for their current content
+        - Index each remaining document on the index pool
+        - Send each indexed document to Gemini as soon as it is ready (bounded concurrency)
+        - Store every document's points together with its checkpoint as soon as it finishes
+        """
+        database = cls.database
+        checkpoints = database.get_checkpoints()
+        paths = cls.collect_note_paths(source)
+        window = 2 * (max(1, index_workers) + max(1, max_concurrency))
+
+        index_pool = ThreadPoolExecutor(max_workers=max(1, index_workers), thread_name_prefix="notes-index")
+        llm_pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="notes-llm")
+        pending = {}
+
+        def fill() -> Iterator[dict]:
+            while len(pending) < window:
+                file_path = next(paths, None)
+                if file_path is None:
+                    return
+                if not os.path.isfile(file_path):
+                    yield {"status": "error", "file": file_path, "error": "Invalid or missing file path."}
+                    continue
+
+                file_path = os.path.abspath(file_path)
+                content_hash = cls.content_hash(file_path)
+                previous = checkpoints.get(file_path)
+                if previous and previous[0] == content_hash and (previous[1] == "done" or not retry_failed):
+                    metrics.inc("notes_documents_total", status="skipped")
+                    yield {"status": "skipped", "file": file_path, "checkpoint": previous[1]}
+                    continue
+
+                job = (file_path, content_hash, cls.topic_for(file_path))
+                pending[index_pool.submit(cls.build_rag, file_path)] = ("index", job)
+
+        try:
+            yield from fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, job = pending.pop(future)
+                    file_path, content_hash, topic = job
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        database.mark_note_failed(file_path, content_hash, topic, str(e))
+                        metrics.inc("notes_documents_total", status="error")
+                        yield {"status": "error", "file": file_path, "error": str(e)}
+                        continue
+
+                    if stage == "index":
+                        pending[llm_pool.submit(cls.generate_points, outcome)] = ("generate", job)
+                    else:
+                        database.store_notes_checkpointed(file_path, content_hash, topic, outcome)
+                        metrics.inc("notes_documents_total", status="success")
+                        yield {"status": "success", "file": file_path, "topic": topic, "points": len(outcome)}
+                yield from fill()
+        finally:
+            # On interruption, queued documents are dropped; finished ones are already checkpointed
+            index_pool.shutdown(wait=False, cancel_futures=True)
+            llm_pool.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def extract_notes_batch(
+            cls,
+            source: Union[str, Iterable[str]],
+            index_workers: int = NOTE_INDEX_WORKERS,
+            max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+            retry_failed: bool = False,
+            limit: Optional[int] = None
+    ) -> dict:
+        """
+        Runs `iter_extract_notes` to completion (or for `limit` results) and reports counts and throughput.
+        """
+        started = time.perf_counter()
+        counts = {"success": 0, "skipped": 0, "error": 0}
+        points = 0
+        errors = []
+        results = cls.iter_extract_notes(source, index_workers, max_concurrency, retry_failed)
+        for result in islice(results, limit):
+            counts[result["status"]] += 1
+            points += result.get("points", 0)
+            if result["status"] == "error":
+                errors.append(result)
+        results.close()
+        elapsed = time.perf_counter() - started
+
+        processed = counts["success"] + counts["error"]
+        return {
+            "status": "success",
+            "succeeded": counts["success"],
+            "skipped": counts["skipped"],
+            "failed": counts["error"],
+            "points": points,
+            "elapsed_seconds": round(elapsed, 3),
+            "documents_per_second": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+            "errors": errors
+        }
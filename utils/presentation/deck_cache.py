@@ -0,0 +1,239 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+
+from utils.common.metrics import metrics
+from utils.config import (
+    DECK_CACHE_MAX_ENTRIES,
+    DECK_CACHE_PATH,
+    DECK_CACHE_THRESHOLD,
+    DECK_CACHE_TTL,
+    EMBEDDING_MODEL
+)
+
+"""
+Semantic Deck Cache
+
+This module stores generated slide decks together with an embedding of their topic, so a request for a
+near-identical topic ("Photosynthesis" vs. "photosynthesis in plants") can reuse an earlier deck instead of
+paying for a new Gemini generation and image round.
+
+Only the slide JSON is stored (title, bullet points, image prompt and the simplified `image_query`); the
+images themselves are re-fetched by query, which the on-disk ImageCache answers without network calls.
+
+Classes:
+    - SemanticDeckCache: SQLite-backed store of decks with cosine-similarity lookup over topic embeddings.
+
+Functions:
+    - normalize_topic(topic): Lower-cases the topic and collapses punctuation / whitespace.
+    - lookup(topic, threshold=None): Returns the most similar cached deck at or above `threshold`, or None.
+    - store(topic, slides): Embeds the topic and stores the deck (image bytes are never stored).
+    - clear(): Removes all entries.
+    - stats(): Returns hit/miss counters and the number of stored decks.
+
+Usage:
+    cache = SemanticDeckCache()
+    match = cache.lookup("photosynthesis in plants")
+    if match:
+        slides = match["slides"]       # plus match["topic"], match["similarity"]
+
+Notes:
+    - An exact (normalized) topic match is answered from SQLite without computing an embedding.
+    - Embeddings are unit-normalized when stored, so cosine similarity is a dot product. The vectors of
+      all live entries are kept in one in-memory matrix that is rebuilt after writes.
+    - Entries expire after `ttl_seconds` (checked on every hit; the matrix is rebuilt once its oldest entry
+      expires); beyond `max_entries` the least recently used decks are evicted.
+"""
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+class SemanticDeckCache:
+    def __init__(
+            self,
+            db_path: str = DECK_CACHE_PATH,
+            threshold: float = DECK_CACHE_THRESHOLD,
+            ttl_seconds: int = DECK_CACHE_TTL,
+            max_entries: int = DECK_CACHE_MAX_ENTRIES,
+            embedding_model: str = EMBEDDING_MODEL,
+            embed: Optional[Callable[[str], List[float]]] = None
+    ):
+        """
+        `embed` maps a topic to its embedding; by default the shared
+        `EmbeddingRegistry` model `embedding_model` is used.
+        """
+        self.db_path = db_path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embedding_model = embedding_model
+        self._embed = embed
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None  # (ids, matrix) of live entries, rebuilt lazily after writes
+        self._index_expires = 0.0  # when the oldest entry in the matrix expires
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS decks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                topic TEXT NOT NULL,
+                normalized_topic TEXT NOT NULL,
+                model TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                slides TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_decks_model_topic ON decks (model, normalized_topic)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_decks_last_access ON decks (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_topic(topic: str) -> str:
+        return _NON_WORD.sub(" ", topic.lower()).strip()
+
+    def _embed_topic(self, topic: str):
+        import numpy as np
+
+        if self._embed is None:
+            from utils.common.embedding_registry import EmbeddingRegistry
+            self._embed = EmbeddingRegistry.get(self.embedding_model).embed_query
+
+        with metrics.span("deck_cache_embed"):
+            vector = np.asarray(self._embed(topic), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _public_slides(slides: List[dict]) -> List[dict]:
+        return [
+            {key: value for key, value in slide.items() if key not in ("image_data", "image_path")}
+            if isinstance(slide, dict) else slide
+            for slide in slides
+        ]
+
+    def _load_index(self, now: float):
+        import numpy as np
+
+        if self._index is None or now >= self._index_expires:
+            rows = self._conn.execute(
+                "SELECT id, embedding, created_at FROM decks WHERE model = ? AND created_at >= ?",
+                (self.embedding_model, now - self.ttl_seconds)
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            self._index_expires = min((row[2] for row in rows), default=now) + self.ttl_seconds
+            matrix = (
+                np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                if rows else np.empty((0, 0), dtype=np.float32)
+            )
+            self._index = (ids, matrix)
+        return self._index
+
+    def _hit(self, deck_id: int, similarity: float, now: float) -> Optional[dict]:
+        row = self._conn.execute(
+            "SELECT topic, slides FROM decks WHERE id = ? AND created_at >= ?",
+            (deck_id, now - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE decks SET last_access = ? WHERE id = ?", (now, deck_id))
+        self._conn.commit()
+        self.hits += 1
+        metrics.inc("deck_cache_total", result="hit")
+        return {"topic": row[0], "slides": json.loads(row[1]), "similarity": round(similarity, 4)}
+
+    def lookup(self, topic: str, threshold: Optional[float] = None) -> Optional[dict]:
+        """
+        Returns {"topic", "slides", "similarity"} for the closest cached deck whose
+        topic similarity is at least `threshold` (the instance default when None).
+        """
+        threshold = self.threshold if threshold is None else threshold
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM decks WHERE model = ? AND normalized_topic = ? AND created_at >= ?",
+                (self.embedding_model, self.normalize_topic(topic), now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                return self._hit(row[0], 1.0, now)
+
+        vector = self._embed_topic(topic)
+
+        with self._lock:
+            ids, matrix = self._load_index(now)
+            if ids and matrix.shape[1] == vector.shape[0]:
+                similarities = matrix @ vector
+                best = int(similarities.argmax())
+                if similarities[best] >= threshold:
+                    match = self._hit(ids[best], float(similarities[best]), now)
+                    if match is not None:
+                        return match
+
+            self.misses += 1
+            metrics.inc("deck_cache_total", result="miss")
+            return None
+
+    def store(self, topic: str, slides: List[dict]) -> None:
+        vector = self._embed_topic(topic)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO decks "
+                "(topic, normalized_topic, model, embedding, slides, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    topic,
+                    self.normalize_topic(topic),
+                    self.embedding_model,
+                    vector.tobytes(),
+                    json.dumps(self._public_slides(slides)),
+                    now,
+                    now
+                )
+            )
+            self._evict(now)
+            self._conn.commit()
+            self._index = None
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM decks WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM decks WHERE id IN ("
+            "SELECT id FROM decks ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM decks")
+            self._conn.commit()
+            self._index = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM decks").fetchone()[0]
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold
+        }
+
+
+__all__ = ["SemanticDeckCache"]
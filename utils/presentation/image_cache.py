@@ -0,0 +1,189 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from utils.common.metrics import metrics
+from utils.config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES
+
+"""
+Persistent Image Cache
+
+This module provides a content-addressed, on-disk cache for slide images fetched by `ImageSearchService`.
+
+Entries are keyed by the SHA-256 of the normalized search query, so every query that simplifies to the
+same keywords (in any order or case) resolves to the same cached JPEG.
+
+Classes:
+    - ImageCache: Size-capped LRU cache of processed slide images.
+
+Functions:
+    - normalize_query(query): Lower-cases, de-duplicates and sorts the query keywords.
+    - get(query, dest_path): Hard-links (or copies) a cached image to `dest_path`; returns True on a hit.
+    - get_bytes(query): Returns the cached image bytes, or None on a miss.
+    - put(query, src_path) / put_bytes(query, data): Atomically stores an image and evicts
+      least-recently-used entries over the cap.
+    - stats(): Returns hit/miss counters and the current cache footprint.
+
+Notes:
+    - Writes go to a temp file in the cache directory followed by `os.replace`, so concurrent
+      processes never observe a partially written entry.
+    - Recency is tracked with the file mtime, which is refreshed on every hit; eviction removes
+      the oldest entries first and tolerates entries vanishing underneath it.
+"""
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class ImageCache:
+    ENTRY_SUFFIX = ".jpg"
+    STALE_TEMP_SECONDS = 3600
+
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        words = sorted(set(_WORD_PATTERN.findall(query.lower())))
+        return " ".join(words)
+
+    def key_for(self, query: str) -> str:
+        return hashlib.sha256(self.normalize_query(query).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.ENTRY_SUFFIX}")
+
+    def _count(self, hit: bool) -> None:
+        metrics.inc("image_cache_total", result="hit" if hit else "miss")
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _link_or_copy(src: str, dest: str) -> None:
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+
+    def get(self, query: str, dest_path: str) -> bool:
+        """
+        Materializes the cached image for `query` at `dest_path`.
+        Returns False (and counts a miss) when there is no entry.
+        """
+        entry = self._entry_path(self.key_for(query))
+        try:
+            os.utime(entry)  # refresh recency for LRU eviction
+            self._link_or_copy(entry, dest_path)
+        except FileNotFoundError:
+            self._count(hit=False)
+            return False
+
+        self._count(hit=True)
+        return True
+
+    def get_bytes(self, query: str) -> Optional[bytes]:
+        """
+        Returns the cached image for `query`, or None (counting a miss).
+        """
+        entry = self._entry_path(self.key_for(query))
+        try:
+            os.utime(entry)  # refresh recency for LRU eviction
+            with open(entry, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        return data
+
+    def put(self, query: str, src_path: str) -> str:
+        """
+        Stores the image at `src_path` under `query` and returns the entry path.
+        """
+        with open(src_path, "rb") as src:
+            return self.put_bytes(query, src.read())
+
+    def put_bytes(self, query: str, data: bytes) -> str:
+        """
+        Stores the image `data` under `query` and returns the entry path.
+        """
+        entry = self._entry_path(self.key_for(query))
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, entry)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._evict()
+        return entry
+
+    def _scan(self):
+        entries = []
+        now = time.time()
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                if item.name.endswith(self.ENTRY_SUFFIX):
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+                elif item.name.endswith(".tmp") and now - stat.st_mtime > self.STALE_TEMP_SECONDS:
+                    # Left behind by a writer that died mid-copy
+                    try:
+                        os.remove(item.path)
+                    except FileNotFoundError:
+                        pass
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # already evicted by another process
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        entries = self._scan()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
+
+
+__all__ = ["ImageCache"]
@@ -0,0 +1,316 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from io import BytesIO
+from typing import Iterable, List, Optional, Tuple
+
+from utils.common.metrics import metrics
+from utils.common.snapshots import current_snapshot, write_snapshot
+from utils.config import (
+    EMBEDDING_MODEL,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_LIBRARY_DIR,
+    IMAGE_LIBRARY_THRESHOLD,
+    IMAGE_TARGET_WIDTH_PX
+)
+
+"""
+Local Image Library
+
+This module provides an offline-ingestible library of slide images searchable by meaning. Image captions are
+embedded with the shared MiniLM model (the same `EmbeddingRegistry` model used by `GeminiRAGService`) and stored
+in a FAISS index; `ImageSearchService` consults the library first and only falls back to Wikimedia Commons when
+the best caption is not similar enough to the slide's image prompt.
+
+Library layout (`IMAGE_LIBRARY_DIR`):
+    - images/<sha256>.jpg: ingested images, re-encoded at the slide target width
+    - index/: versioned snapshots (FAISS index of captions, cosine similarity, plus manifest.json) behind a
+      CURRENT pointer
+
+Classes:
+    - LocalImageLibrary: Ingests captioned images and answers nearest-neighbour caption queries.
+
+Functions:
+    - exists(library_dir): Whether a library index has been built in `library_dir`.
+    - ingest(entries): Adds (image_path, caption) pairs and saves the index.
+    - ingest_directory(directory, captions_file): Ingests a folder of images (captions from a JSONL file,
+      `<image>.txt` sidecars, or the file name).
+    - search(text, k): Returns up to k (image_path, caption, score) tuples, best first.
+    - match_many(texts, threshold): Returns the best image path per text, or None below the threshold.
+    - get_bytes(text, threshold): Returns the best image's JPEG bytes, or None.
+    - main(argv): CLI (`ingest`, `query`, `stats`).
+
+Usage:
+    python -m utils.presentation.image_library ingest ./my_images --captions ./my_images/captions.jsonl
+    python -m utils.presentation.image_library query "a volcano erupting at night"
+
+Notes:
+    - Scores are cosine similarities in [-1, 1]; `IMAGE_LIBRARY_THRESHOLD` is the minimum for a library hit.
+    - Each save publishes a new snapshot and then switches the CURRENT pointer (see `utils.common.snapshots`),
+      so a running service never reads a half-written index and `exists()` never flips to False mid-save.
+"""
+
+
+class LocalImageLibrary:
+    IMAGE_DIR = "images"
+    INDEX_DIR = "index"
+    MANIFEST_FILE = "manifest.json"
+    IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+
+    def __init__(
+            self,
+            library_dir: str = IMAGE_LIBRARY_DIR,
+            embedding_model: str = EMBEDDING_MODEL,
+            threshold: float = IMAGE_LIBRARY_THRESHOLD,
+            target_width: int = IMAGE_TARGET_WIDTH_PX
+    ):
+        from utils.common.embedding_registry import EmbeddingRegistry
+
+        self.library_dir = library_dir
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.target_width = target_width
+        self.image_dir = os.path.join(library_dir, self.IMAGE_DIR)
+        self.index_dir = os.path.join(library_dir, self.INDEX_DIR)
+        os.makedirs(self.image_dir, exist_ok=True)
+
+        self.embeddings = EmbeddingRegistry.get(embedding_model)
+        self._lock = threading.RLock()
+        self.db = None
+        self.entries = {}  # entry id -> {"image", "caption"}
+        self._load()
+
+    @classmethod
+    def exists(cls, library_dir: str = IMAGE_LIBRARY_DIR) -> bool:
+        return current_snapshot(os.path.join(library_dir, cls.INDEX_DIR), cls.MANIFEST_FILE) is not None
+
+    @staticmethod
+    def _faiss_options() -> dict:
+        from langchain_community.vectorstores.utils import DistanceStrategy
+
+        # Inner product over L2-normalized vectors = cosine similarity
+        return {"normalize_L2": True, "distance_strategy": DistanceStrategy.MAX_INNER_PRODUCT}
+
+    def _load(self) -> None:
+        snapshot = current_snapshot(self.index_dir, self.MANIFEST_FILE)
+        if snapshot is None:
+            return
+        manifest_path = os.path.join(snapshot, self.MANIFEST_FILE)
+
+        from langchain_community.vectorstores import FAISS
+
+        with open(manifest_path) as f:
+            stored = json.load(f)
+        if stored.get("embedding_model") != self.embedding_model:
+            raise ValueError(
+                f"Image library at {self.library_dir} was built with {stored.get('embedding_model')}, "
+                f"not {self.embedding_model}"
+            )
+
+        self.entries = stored.get("entries", {})
+        if self.entries:
+            self.db = FAISS.load_local(
+                snapshot,
+                self.embeddings,
+                allow_dangerous_deserialization=True,
+                **self._faiss_options()
+            )
+
+    def _store_image(self, image_path: str) -> str:
+        """
+        Re-encodes an image at the slide target width into the library and
+        returns its file name (content-addressed, so duplicates are stored once).
+        """
+        from PIL import Image
+
+        with Image.open(image_path) as image:
+            if self.target_width:
+                image.draft("RGB", (self.target_width, self.target_width))
+            image = image.convert("RGB")
+            if self.target_width and image.width > self.target_width:
+                image.thumbnail((self.target_width, image.height), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+
+        data = buffer.getvalue()
+        name = f"{hashlib.sha256(data).hexdigest()}.jpg"
+        target = os.path.join(self.image_dir, name)
+        if not os.path.exists(target):
+            fd, tmp_path = tempfile.mkstemp(dir=self.image_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, target)
+        return name
+
+    def ingest(self, entries: Iterable[Tuple[str, str]], save: bool = True) -> int:
+        """
+        Adds (image_path, caption) pairs to the library. Returns the number of new entries;
+        an image already stored with the same caption is skipped.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        texts, metadatas, ids = [], [], []
+        for image_path, caption in entries:
+            caption = (caption or "").strip()
+            if not caption:
+                print(f"Skipping {image_path}: no caption")
+                continue
+            try:
+                name = self._store_image(image_path)
+            except Exception as e:
+                print(f"Skipping {image_path}: {e}")
+                continue
+
+            entry_id = hashlib.sha1(f"{name}\n{caption}".encode("utf-8")).hexdigest()
+            with self._lock:
+                if entry_id in self.entries or entry_id in ids:
+                    continue
+            texts.append(caption)
+            metadatas.append({"image": name, "source": os.path.abspath(image_path)})
+            ids.append(entry_id)
+
+        if not texts:
+            return 0
+
+        with self._lock:
+            if self.db is None:
+                self.db = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas, ids=ids, **self._faiss_options())
+            else:
+                self.db.add_texts(texts, metadatas=metadatas, ids=ids)
+            for entry_id, text, metadata in zip(ids, texts, metadatas):
+                self.entries[entry_id] = {"image": metadata["image"], "caption": text}
+            if save:
+                self.save()
+        return len(texts)
+
+    def ingest_directory(self, directory: str, captions_file: Optional[str] = None) -> int:
+        """
+        Ingests every image in `directory`. Captions come from `captions_file` (JSON lines with
+        "image" relative to `directory` and "caption"), else from a `<image>.txt` sidecar,
+        else from the file name.
+        """
+        captions = {}
+        if captions_file:
+            with open(captions_file, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        captions[os.path.normpath(record["image"])] = record["caption"]
+
+        entries = []
+        for root, _, files in os.walk(directory):
+            for file_name in sorted(files):
+                if os.path.splitext(file_name)[1].lower() not in self.IMAGE_EXTENSIONS:
+                    continue
+                path = os.path.join(root, file_name)
+                relative = os.path.normpath(os.path.relpath(path, directory))
+                caption = captions.get(relative)
+                sidecar = os.path.splitext(path)[0] + ".txt"
+                if caption is None and os.path.exists(sidecar):
+                    with open(sidecar, encoding="utf-8") as f:
+                        caption = f.read()
+                if caption is None:
+                    caption = os.path.splitext(file_name)[0].replace("_", " ").replace("-", " ")
+                entries.append((path, caption))
+        return self.ingest(entries)
+
+    def save(self) -> None:
+        def write(directory: str) -> None:
+            if self.db is not None:
+                self.db.save_local(directory)
+            with open(os.path.join(directory, self.MANIFEST_FILE), "w") as f:
+                json.dump({"embedding_model": self.embedding_model, "entries": self.entries}, f)
+
+        with self._lock:
+            write_snapshot(self.index_dir, write)
+
+    def _image_path(self, metadata: dict) -> str:
+        return os.path.join(self.image_dir, metadata["image"])
+
+    def search(self, text: str, k: int = 1) -> List[Tuple[str, str, float]]:
+        if self.db is None:
+            return []
+        with metrics.span("image_library_search"):
+            results = self.db.similarity_search_with_score(text, k=k)
+        return [(self._image_path(doc.metadata), doc.page_content, float(score)) for doc, score in results]
+
+    def match_many(self, texts: List[str], threshold: Optional[float] = None) -> List[Optional[str]]:
+        """
+        Returns the best matching image path for each text (None when the best
+        score is below `threshold`). All texts are embedded in one batch.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if self.db is None or not texts:
+            return [None] * len(texts)
+
+        with metrics.span("image_library_search", batch=True):
+            vectors = self.embeddings.embed_documents(texts)
+            matches = []
+            for vector in vectors:
+                results = self.db.similarity_search_with_score_by_vector(vector, k=1)
+                if results and results[0][1] >= threshold:
+                    matches.append(self._image_path(results[0][0].metadata))
+                else:
+                    matches.append(None)
+
+        hits = sum(match is not None for match in matches)
+        metrics.inc("image_library_total", hits, result="hit")
+        metrics.inc("image_library_total", len(matches) - hits, result="miss")
+        return matches
+
+    def get_bytes(self, text: str, threshold: Optional[float] = None) -> Optional[bytes]:
+        match = self.match_many([text], threshold)[0]
+        if match is None:
+            return None
+        with open(match, "rb") as f:
+            return f.read()
+
+    def stats(self) -> dict:
+        with self._lock:
+            images = {entry["image"] for entry in self.entries.values()}
+        return {
+            "entries": len(self.entries),
+            "images": len(images),
+            "embedding_model": self.embedding_model,
+            "threshold": self.threshold
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the local slide image library.")
+    parser.add_argument("--library-dir", default=IMAGE_LIBRARY_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="add a directory of captioned images")
+    ingest.add_argument("directory")
+    ingest.add_argument("--captions", help='JSON lines file of {"image": <relative path>, "caption": <text>}')
+
+    query = commands.add_parser("query", help="show the closest library images for a prompt")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=3)
+
+    commands.add_parser("stats", help="show library size")
+    args = parser.parse_args(argv)
+
+    library = LocalImageLibrary(library_dir=args.library_dir)
+    if args.command == "ingest":
+        added = library.ingest_directory(args.directory, args.captions)
+        print(f"Added {added} image(s); library now has {library.stats()['entries']} entries.")
+    elif args.command == "query":
+        for image_path, caption, score in library.search(args.text, k=args.k):
+            hit = "hit " if score >= library.threshold else "miss"
+            print(f"{score:6.3f} {hit} {image_path}  {caption}")
+    else:
+        print(json.dumps(library.stats(), indent=2))
+    return 0
+
+
+__all__ = ["LocalImageLibrary"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,112 +1,556 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
 import requests
 from PIL import Image
-from io import BytesIO
-import time
+from requests.adapters import HTTPAdapter
+
+from utils.common.metrics import metrics
+from utils.config import (
+    IMAGE_CACHE_ENABLED,
+    IMAGE_FETCH_PER_HOST,
+    IMAGE_FETCH_WORKERS,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_LIBRARY_ENABLED,
+    IMAGE_MAX_DOWNLOAD_BYTES,
+    IMAGE_TITLE_CACHE_SIZE,
+    IMAGE_TARGET_WIDTH_PX,
+    WIKIMEDIA_API_URL
+)
+from utils.presentation.image_cache import ImageCache
+from utils.presentation.image_library import LocalImageLibrary
+
+
+class ImageTooLargeError(Exception):
+    pass
+
 
 class ImageSearchService:
     HEADERS = {
         "User-Agent": "BrainBoxBot/1.0 (https://sugardevs.in/)"
     }
+    SEARCH_URL = WIKIMEDIA_API_URL
+    TITLE_BATCH_SIZE = 50  # MediaWiki limit for titles per query
+
+    def __init__(
+            self,
+            max_workers: int = IMAGE_FETCH_WORKERS,
+            per_host_limit: int = IMAGE_FETCH_PER_HOST,
+            cache: Optional[ImageCache] = None,
+            target_width: int = IMAGE_TARGET_WIDTH_PX,
+            max_bytes: int = IMAGE_MAX_DOWNLOAD_BYTES,
+            search_url: Optional[str] = None,
+            library: Optional[LocalImageLibrary] = None
+    ):
+        """
+        Creates a service with a pooled HTTP session shared by all fetches.
+        `max_workers` bounds the image stage, `per_host_limit` bounds the
+        number of in-flight requests against any single host. Results are
+        served from `cache` (the on-disk ImageCache by default) when possible.
+
+        Images are requested as server-side thumbnails `target_width` pixels
+        wide and downscaled on decode to that width (0 keeps full resolution);
+        downloads larger than `max_bytes` are aborted.
+
+        `search_url` overrides the MediaWiki API endpoint (WIKIMEDIA_API_URL),
+        e.g. to point the service at a local stand-in.
+
+        `library` is searched (by the slide's image prompt) before Commons; by
+        default the LocalImageLibrary in IMAGE_LIBRARY_DIR is loaded on first
+        use if one has been ingested.
+        """
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.target_width = max(0, target_width)
+        self.max_bytes = max_bytes
+        self.search_url = search_url or self.SEARCH_URL
+        if cache is None and IMAGE_CACHE_ENABLED:
+            cache = ImageCache()
+        self.cache = cache
+        self._library = library
+        self._library_loaded = library is not None or not IMAGE_LIBRARY_ENABLED
+        self._library_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update(self.HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+        # normalized query -> Commons file title, least recently used first
+        self._titles: "OrderedDict[str, str]" = OrderedDict()
+        self._titles_lock = threading.Lock()
+        self.max_titles = max(0, IMAGE_TITLE_CACHE_SIZE)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._group_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._worker = threading.local()  # marks threads of `executor`
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+            return slot
+
+    def _imageinfo_params(self) -> dict:
+        params = {"prop": "imageinfo", "iiprop": "url"}
+        if self.target_width:
+            params["iiurlwidth"] = self.target_width
+        return params
 
     @staticmethod
-    def fetch_image(query: str, save_path: str):
+    def _imageinfo_url(imageinfo: List[dict]) -> Optional[str]:
+        # `thumburl` is only present when a width was requested
+        if not imageinfo:
+            return None
+        return imageinfo[0].get("thumburl") or imageinfo[0].get("url")
+
+    def _get_json(self, url: str, params: dict) -> dict:
+        with self._host_slot(url):
+            response = self.session.get(url, params=params, timeout=10)
+            response.raise_for_status()
+            return response.json()
+
+    def _mark_worker(self) -> None:
+        self._worker.active = True
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="image-fetch",
+                    initializer=self._mark_worker
+                )
+            return self._executor
+
+    @property
+    def group_executor(self) -> ThreadPoolExecutor:
         """
-        Fetches the first Wikimedia Commons image for the given query,
-        validates it's an image, retries if needed, and saves it to disk.
+        Runs `submit_images_bytes` groups. A group mostly waits on its lookups and
+        downloads, which run on `executor`; keeping the waiting off `executor` means
+        groups can never occupy the workers their own tasks need.
         """
-        search_url = "https://commons.wikimedia.org/w/api.php"
+        with self._executor_lock:
+            if self._group_executor is None:
+                self._group_executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="image-group"
+                )
+            return self._group_executor
 
-        # Step 1: Search for file title
-        search_params = {
-            "action": "query",
-            "format": "json",
-            "list": "search",
-            "srsearch": f"{query} filetype:bitmap",
-            "srlimit": 1,
-            "srnamespace": 6  # File namespace
-        }
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shuts down the worker pools that have been started.
+        """
+        with self._executor_lock:
+            pools = [pool for pool in (self._group_executor, self._executor) if pool is not None]
+            self._executor = self._group_executor = None
+        for pool in pools:
+            pool.shutdown(wait=wait)
+
+    def _submit(self, fn, *args) -> Future:
+        """
+        Schedules a lookup or download on `executor`, or runs it inline when already
+        on one of its workers: a worker blocking on tasks queued behind it could
+        otherwise deadlock the pool.
+        """
+        if not getattr(self._worker, "active", False):
+            return self.executor.submit(fn, *args)
 
+        future: Future = Future()
         try:
-            search_response = requests.get(
-                search_url,
-                params=search_params,
-                headers=ImageSearchService.HEADERS,
-                timeout=10
-            )
-            search_response.raise_for_status()
-        except requests.RequestException as e:
-            raise Exception(f"Search request failed: {e}")
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
 
-        search_data = search_response.json()
-        search_results = search_data.get("query", {}).get("search", [])
-        if not search_results:
-            raise Exception(f"No image found for query: {query}")
+    @property
+    def library(self) -> Optional[LocalImageLibrary]:
+        if not self._library_loaded:
+            with self._library_lock:
+                if not self._library_loaded:
+                    if LocalImageLibrary.exists():
+                        try:
+                            self._library = LocalImageLibrary()
+                        except Exception as e:
+                            print(f"Local image library unavailable: {e}")
+                    self._library_loaded = True
+        return self._library
+
+    def _library_images(self, prompts: List[str]) -> List[Optional[bytes]]:
+        """
+        Looks every prompt up in the local library in one embedding batch and
+        returns the matching image bytes, or None below the library threshold.
+        """
+        library = self.library
+        if library is None or not prompts:
+            return [None] * len(prompts)
+
+        try:
+            matches = library.match_many(prompts)
+        except Exception as e:
+            print(f"Local image library lookup failed: {e}")
+            return [None] * len(prompts)
 
-        image_title = search_results[0]["title"]
+        images: List[Optional[bytes]] = []
+        for match in matches:
+            data = None
+            if match is not None:
+                try:
+                    with open(match, "rb") as f:
+                        data = f.read()
+                except OSError as e:
+                    print(f"Could not read library image {match}: {e}")
+            images.append(data)
+        return images
 
-        # Step 2: Get image URL
-        info_params = {
+    @metrics.timed_stage("image_lookup", call="search")
+    def _search_image_url(self, query: str) -> Tuple[str, str]:
+        """
+        Resolves the first matching Commons file for `query` and its URL in a
+        single API call (search generator + imageinfo).
+        """
+        params = {
             "action": "query",
             "format": "json",
-            "prop": "imageinfo",
-            "titles": image_title,
-            "iiprop": "url"
+            "generator": "search",
+            "gsrsearch": f"{query} filetype:bitmap",
+            "gsrlimit": 1,
+            "gsrnamespace": 6,  # File namespace
+            **self._imageinfo_params()
         }
 
         try:
-            info_response = requests.get(
-                search_url,
-                params=info_params,
-                headers=ImageSearchService.HEADERS,
-                timeout=10
-            )
-            info_response.raise_for_status()
+            data = self._get_json(self.search_url, params)
         except requests.RequestException as e:
-            raise Exception(f"Image info request failed: {e}")
+            raise Exception(f"Search request failed: {e}")
 
-        pages = info_response.json().get("query", {}).get("pages", {})
+        pages = data.get("query", {}).get("pages", {})
         if not pages:
-            raise Exception(f"No image info found for: {image_title}")
+            raise Exception(f"No image found for query: {query}")
 
-        imageinfo = next(iter(pages.values())).get("imageinfo", [])
-        if not imageinfo:
-            raise Exception(f"No image URL found for: {image_title}")
+        page = min(pages.values(), key=lambda p: p.get("index", 0))
+        image_title = page.get("title", query)
 
-        image_url = imageinfo[0].get("url")
+        image_url = self._imageinfo_url(page.get("imageinfo", []))
         if not image_url:
-            raise Exception(f"No URL found in image info for: {image_title}")
+            raise Exception(f"No image URL found for: {image_title}")
+
+        return image_title, image_url
+
+    @metrics.timed_stage("image_lookup", call="imageinfo")
+    def _title_image_urls(self, titles: List[str]) -> Dict[str, str]:
+        """
+        Resolves image URLs for already known file titles, up to
+        TITLE_BATCH_SIZE titles per API call.
+        """
+        urls: Dict[str, str] = {}
+        for start in range(0, len(titles), self.TITLE_BATCH_SIZE):
+            batch = titles[start:start + self.TITLE_BATCH_SIZE]
+            params = {
+                "action": "query",
+                "format": "json",
+                "titles": "|".join(batch),
+                **self._imageinfo_params()
+            }
+
+            try:
+                data = self._get_json(self.search_url, params)
+            except requests.RequestException as e:
+                print(f"Image info batch request failed: {e}")
+                continue
 
-        # Step 3: Download, verify and save image with retry
+            query_data = data.get("query", {})
+            # The API reports requested titles it rewrote (e.g. underscores)
+            aliases = {n["to"]: n["from"] for n in query_data.get("normalized", [])}
+            for page in query_data.get("pages", {}).values():
+                image_url = self._imageinfo_url(page.get("imageinfo", []))
+                if image_url:
+                    title = page.get("title", "")
+                    urls[aliases.get(title, title)] = image_url
+        return urls
+
+    def _remember_title(self, query: str, title: str) -> None:
+        key = ImageCache.normalize_query(query)
+        with self._titles_lock:
+            self._titles[key] = title
+            self._titles.move_to_end(key)
+            while len(self._titles) > self.max_titles:
+                self._titles.popitem(last=False)
+
+    def _known_titles(self, queries: List[str]) -> Dict[str, Optional[str]]:
+        known = {}
+        with self._titles_lock:
+            for query in queries:
+                key = ImageCache.normalize_query(query)
+                title = self._titles.get(key)
+                if title is not None:
+                    self._titles.move_to_end(key)
+                known[query] = title
+        return known
+
+    def _lookup_image_url(self, query: str) -> str:
+        image_title, image_url = self._search_image_url(query)
+        self._remember_title(query, image_title)
+        return image_url
+
+    def resolve_image_urls(self, queries: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Resolves image URLs for all of a deck's queries with as few API calls as possible:
+        duplicate queries are looked up once, queries whose file title is already known are
+        resolved together in batched imageinfo calls, and the rest use one combined
+        search + imageinfo call each, issued concurrently. Unresolvable queries map to None.
+        """
+        unique = list(dict.fromkeys(queries))
+        known = self._known_titles(unique)
+
+        resolved: Dict[str, Optional[str]] = {}
+        titled = {q: t for q, t in known.items() if t}
+        if titled:
+            title_urls = self._title_image_urls(list(dict.fromkeys(titled.values())))
+            for query, title in titled.items():
+                if title in title_urls:
+                    resolved[query] = title_urls[title]
+
+        pending = [q for q in unique if q not in resolved]
+        futures = {q: self._submit(self._lookup_image_url, q) for q in pending}
+        for query, future in futures.items():
+            try:
+                resolved[query] = future.result()
+            except Exception as e:
+                print(f"Image lookup failed for '{query}': {e}")
+                metrics.inc("image_fetch_failures_total")
+                resolved[query] = None
+        return resolved
+
+    def _read_capped(self, response) -> bytes:
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise ImageTooLargeError(f"Image too large: {declared} bytes")
+
+        buffer = bytearray()
+        for block in response.iter_content(chunk_size=64 * 1024):
+            buffer.extend(block)
+            if len(buffer) > self.max_bytes:
+                raise ImageTooLargeError(f"Image exceeds {self.max_bytes} bytes")
+        return bytes(buffer)
+
+    def _decode_to_target(self, image_bytes: bytes) -> Image.Image:
+        image = Image.open(BytesIO(image_bytes))
+        if self.target_width:
+            # For JPEGs this makes the decoder scale down by 1/2..1/8 while decoding
+            image.draft("RGB", (self.target_width, self.target_width))
+        image = image.convert("RGB")  # forces a full decode, raising on corrupt data
+        if self.target_width and image.width > self.target_width:
+            image.thumbnail((self.target_width, image.height), Image.Resampling.LANCZOS)
+        return image
+
+    @metrics.timed_stage("image_download")
+    def download_image_bytes(self, image_url: str, query: str) -> bytes:
+        """
+        Streams the image at `image_url` (up to `max_bytes`), decodes it straight to the
+        target slide width and re-encodes it as JPEG in memory, retrying on failure.
+        The result is stored in the image cache under `query`.
+        """
         for attempt in range(3):
             try:
-                img_response = requests.get(
-                    image_url,
-                    headers=ImageSearchService.HEADERS,
-                    timeout=15,
-                    stream=True
-                )
-                img_response.raise_for_status()
+                with self._host_slot(image_url):
+                    with self.session.get(image_url, timeout=15, stream=True) as img_response:
+                        img_response.raise_for_status()
 
-                content_type = img_response.headers.get("Content-Type", "")
-                if not content_type.startswith("image/"):
-                    raise Exception(f"Invalid content type: {content_type}")
-                if content_type in ["image/svg+xml", "image/gif"]:
-                    raise Exception(f"Unsupported image format: {content_type}")
+                        content_type = img_response.headers.get("Content-Type", "")
+                        if not content_type.startswith("image/"):
+                            raise Exception(f"Invalid content type: {content_type}")
+                        if content_type in ["image/svg+xml", "image/gif"]:
+                            raise Exception(f"Unsupported image format: {content_type}")
 
-                # Validate and convert image
-                image_bytes = img_response.content
-                image = Image.open(BytesIO(image_bytes))
-                image.verify()  # verify content
+                        image_bytes = self._read_capped(img_response)
 
-                # Reload for saving
-                image = Image.open(BytesIO(image_bytes)).convert("RGB")
-                image.save(save_path, format="JPEG", quality=95, optimize=True, progressive=True)
-                print(f"Image saved: {save_path}")
-                return  # success
+                with metrics.span("image_decode"):
+                    image = self._decode_to_target(image_bytes)
+                    buffer = BytesIO()
+                    image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True, progressive=True)
+                    data = buffer.getvalue()
 
+                if self.cache is not None:
+                    try:
+                        self.cache.put_bytes(query, data)
+                    except OSError as e:
+                        print(f"Could not cache image for '{query}': {e}")
+                return data  # success
+
+            except ImageTooLargeError:
+                raise  # retrying would download the same oversized file
             except Exception as e:
                 print(f"[Attempt {attempt + 1}/3] Download failed: {e}")
-                time.sleep(2 ** attempt)
+                if attempt < 2:
+                    metrics.inc("image_fetch_retries_total")
+                    time.sleep(2 ** attempt)
 
         # Final failure
         raise Exception(f"Failed to download and save image after 3 attempts: {query}")
+
+    def download_image(self, image_url: str, save_path: str, query: str):
+        """
+        Same as `download_image_bytes`, but saves the JPEG to `save_path`.
+        """
+        data = self.download_image_bytes(image_url, query)
+        with open(save_path, "wb") as f:
+            f.write(data)
+        print(f"Image saved: {save_path}")
+
+    @metrics.timed_stage("image_search")
+    def fetch_image_bytes(self, query: str, prompt: Optional[str] = None) -> bytes:
+        """
+        Fetches the first Wikimedia Commons image for the given query and returns
+        it as JPEG bytes, without touching the filesystem on a cache miss.
+        Repeat queries are served from the image cache, and images whose caption
+        matches `prompt` (or `query`) closely enough from the local library,
+        without any network call.
+        """
+        if self.cache is not None:
+            cached = self.cache.get_bytes(query)
+            if cached is not None:
+                print(f"Image cache hit: {query}")
+                return cached
+
+        local = self._library_images([prompt or query])[0]
+        if local is not None:
+            print(f"Image library hit: {query}")
+            return local
+
+        image_url = self._lookup_image_url(query)
+        return self.download_image_bytes(image_url, query)
+
+    def fetch_image(self, query: str, save_path: str, prompt: Optional[str] = None):
+        """
+        Fetches the first Wikimedia Commons image for the given query,
+        validates it's an image, retries if needed, and saves it to disk.
+        Repeat queries are served from the image cache or the local library
+        without any network call.
+        """
+        if self.cache is not None and self.cache.get(query, save_path):
+            print(f"Image cache hit: {query}")
+            return
+
+        local = self._library_images([prompt or query])[0]
+        if local is not None:
+            print(f"Image library hit: {query}")
+            with open(save_path, "wb") as f:
+                f.write(local)
+            return
+
+        image_url = self._lookup_image_url(query)
+        self.download_image(image_url, save_path, query)
+
+    def submit_image(self, query: str, save_path: str, prompt: Optional[str] = None) -> Future:
+        """
+        Schedules `fetch_image` on the shared worker pool and returns its future.
+        """
+        return self.executor.submit(self.fetch_image, query, save_path, prompt)
+
+    def submit_image_bytes(self, query: str, prompt: Optional[str] = None) -> Future:
+        """
+        Schedules `fetch_image_bytes` on the shared worker pool and returns its future.
+        """
+        return self.executor.submit(self.fetch_image_bytes, query, prompt)
+
+    def submit_images_bytes(self, queries: List[str], prompts: Optional[List[Optional[str]]] = None) -> Future:
+        """
+        Schedules `fetch_images_bytes` for a group of queries, so the group shares one
+        library embedding batch and one batched lookup. The group waits on
+        `group_executor`; its lookups and downloads still fan out on the shared pool.
+        """
+        return self.group_executor.submit(self.fetch_images_bytes, queries, prompts)
+
+    @metrics.timed_stage("image_search", batch=True)
+    def fetch_images_bytes(
+            self,
+            queries: List[str],
+            prompts: Optional[List[Optional[str]]] = None
+    ) -> List[Optional[bytes]]:
+        """
+        Fetches the images for several queries concurrently and returns their JPEG
+        bytes in input order, or None where that query failed; one failure never
+        affects the others. Cache hits are served first, then local library matches
+        for each query's prompt (`prompts[i]`, defaulting to the query), the remaining
+        queries are resolved in one batched lookup, and only the binary downloads
+        run per image (once per distinct query).
+        """
+        prompt_for: Dict[str, str] = {}
+        for index, query in enumerate(queries):
+            prompt = prompts[index] if prompts and index < len(prompts) else None
+            prompt_for.setdefault(query, prompt or query)
+
+        results: Dict[str, Optional[bytes]] = {}
+        uncached = []
+        for query in prompt_for:
+            cached = self.cache.get_bytes(query) if self.cache is not None else None
+            if cached is not None:
+                print(f"Image cache hit: {query}")
+                results[query] = cached
+            else:
+                uncached.append(query)
+
+        pending = []
+        local_images = self._library_images([prompt_for[query] for query in uncached])
+        for query, local in zip(uncached, local_images):
+            if local is not None:
+                print(f"Image library hit: {query}")
+                results[query] = local
+            else:
+                pending.append(query)
+
+        urls = self.resolve_image_urls(pending) if pending else {}
+
+        futures = {}
+        for query in pending:
+            image_url = urls.get(query)
+            if image_url is None:
+                print(f"Image fetch failed for '{query}': no image URL resolved")
+                metrics.inc("image_fetch_failures_total")
+            else:
+                futures[query] = self._submit(self.download_image_bytes, image_url, query)
+
+        for query, future in futures.items():
+            try:
+                results[query] = future.result()
+            except Exception as e:
+                print(f"Image fetch failed for '{query}': {e}")
+                metrics.inc("image_fetch_failures_total")
+
+        return [results.get(query) for query in queries]
+
+    def fetch_images(
+            self,
+            jobs: List[Tuple[str, str]],
+            prompts: Optional[List[Optional[str]]] = None
+    ) -> List[Optional[str]]:
+        """
+        Fetches several (query, save_path) jobs concurrently (see `fetch_images_bytes`).
+        Returns the saved path for each job in input order, or None where
+        that job failed; one failure never affects the other jobs.
+        """
+        images = self.fetch_images_bytes([query for query, _ in jobs], prompts)
+
+        results: List[Optional[str]] = []
+        for (_, save_path), data in zip(jobs, images):
+            if data is None:
+                results.append(None)
+                continue
+            with open(save_path, "wb") as f:
+                f.write(data)
+            results.append(save_path)
+        return results
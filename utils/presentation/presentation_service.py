@@ -1,7 +1,12 @@
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
+from io import BytesIO
 import os
+import re
+import tempfile
+
+from utils.common.metrics import metrics
 
 """
 PPTX Presentation Generation Module
@@ -14,7 +19,9 @@ Classes:
     - PPTXService: Provides a utility method for creating presentations with slide titles and content.
 
 Functions:
-    - create_presentation(topic, slides, file_path=None): Generates and saves a .pptx file using the provided topic and slide data.
+    - create_presentation(topic, slides, file_path=None): Generates and saves a .pptx file using the provided topic and slide data
+      (to a new, uniquely named temp file when no path is given).
+    - create_presentation_bytes(topic, slides): Generates the .pptx entirely in memory and returns it as a `BytesIO`.
 
 Slide Data Format:
     - The `slides` parameter should be a list where each item is either:
@@ -22,6 +29,7 @@ Slide Data Format:
         2. A dictionary with:
             - "title": (str) Slide title
             - "bullet_points": (list of str) Content as bullet points
+            - "image_data" (bytes) or "image_path" (str), optional: Picture placed beside the bullet points
 
 Workflow:
     1. Create a new PowerPoint presentation using the default layout.
@@ -43,20 +51,19 @@ Parameters:
     - file_path (str, optional): Custom path to save the presentation.
 
 Returns:
-    - str: Full path to the saved `.pptx` file.
+    - str: Full path to the saved `.pptx` file (`create_presentation`).
+    - BytesIO: The `.pptx` content, rewound to the start (`create_presentation_bytes`).
 
 Note:
-    - Default file path is `/tmp/{topic}.pptx` if not specified.
+    - Without `file_path`, a new temp file named `{topic}_<random>.pptx` is created in the system temp
+      directory (`tempfile.mkstemp`), so decks on the same topic never overwrite each other.
     - Uses layout index 1 (Title and Content) from the PowerPoint template.
 """
 
 
 class PPTXService:
     @staticmethod
-    def create_presentation(topic, slides, file_path=None):
-        if file_path is None:
-            file_path = f"/tmp/{topic.replace(' ', '_')}.pptx"
-
+    def _build(slides):
         prs = Presentation()
         bullet_slide_layout = prs.slide_layouts[1]
 
@@ -94,12 +101,37 @@ class PPTXService:
                     p.level = 0
                     p.font.size = Pt(20)
 
-                image_path = slide_data.get("image_path")
-                if image_path and os.path.exists(image_path):
+                image = None
+                if slide_data.get("image_data"):
+                    image = BytesIO(slide_data["image_data"])
+                elif slide_data.get("image_path") and os.path.exists(slide_data["image_path"]):
+                    image = slide_data["image_path"]
+
+                if image is not None:
                     try:
-                        slide.shapes.add_picture(image_path, Inches(5.5), Inches(1.5), width=Inches(4.5))
+                        slide.shapes.add_picture(image, Inches(5.5), Inches(1.5), width=Inches(4.5))
                     except Exception as e:
                         print(f"Could not insert image: {e}")
 
+        return prs
+
+    @staticmethod
+    @metrics.timed_stage("render")
+    def create_presentation(topic, slides, file_path=None):
+        if file_path is None:
+            # A fresh file per call, so same-topic decks never overwrite each other
+            prefix = re.sub(r"\W+", "_", topic)
+            fd, file_path = tempfile.mkstemp(prefix=f"{prefix}_", suffix=".pptx")
+            os.close(fd)
+
+        prs = PPTXService._build(slides)
         prs.save(file_path)
         return file_path
+
+    @staticmethod
+    @metrics.timed_stage("render")
+    def create_presentation_bytes(topic, slides):
+        buffer = BytesIO()
+        PPTXService._build(slides).save(buffer)
+        buffer.seek(0)
+        return buffer